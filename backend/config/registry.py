@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+import yaml
+from backend.config.settings import get_settings
+from backend.utils.metrics import metrics_registry
+
+settings = get_settings()
+
+CONFIG_DIR = os.path.dirname(__file__)
+
+# 快照字段 -> YAML 文件名
+CONFIG_FILES = {
+    "prompts": "prompts.yaml",
+    "roles": "roles.yaml",
+    "assistants": "assistantes.yaml",
+    "models": "config.yaml",
+}
+
+
+class ConfigError(ValueError):
+    """配置文件格式错误"""
+
+
+def freeze(value: Any) -> Any:
+    """深度冻结 YAML 数据：映射转为只读的 MappingProxyType，列表转为元组"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ConfigSnapshot:
+    """
+    某一版本的全部 YAML 配置。
+    内容深度冻结（映射只读、列表为元组），读取方可以直接持有引用而无需加锁或复制，
+    也无法意外修改共享的快照；配置变更时整体替换为新快照。
+    """
+
+    __slots__ = ("version", "loaded_at", "prompts", "roles", "assistants", "models", "role_by_node")
+
+    def __init__(self, version: int, data: Mapping[str, Mapping[str, Any]]):
+        self.version = version
+        self.loaded_at = time.time()
+        self.prompts: Mapping[str, Any] = freeze(data["prompts"])
+        self.roles: Mapping[str, Any] = freeze(data["roles"])
+        self.assistants: Mapping[str, Any] = freeze(data["assistants"])
+        self.models: Mapping[str, Any] = freeze(data["models"])
+        # nodename -> 角色名称（同名 nodename 以首个定义为准）
+        self.role_by_node: Mapping[str, str] = MappingProxyType({
+            role["nodename"]: role["name"] for role in reversed(list(self.roles["roles"].values()))
+        })
+
+
+def _validate(data: Dict[str, Any]):
+    """校验配置结构，失败时抛出 ConfigError"""
+    for key, content in data.items():
+        if not isinstance(content, dict):
+            raise ConfigError(f"{CONFIG_FILES[key]}: top level must be a mapping")
+
+    for category, nodes in data["prompts"].items():
+        if not isinstance(nodes, dict):
+            raise ConfigError(f"prompts.yaml: category '{category}' must be a mapping")
+        for node, template in nodes.items():
+            if template is not None and not isinstance(template, str):
+                raise ConfigError(f"prompts.yaml: '{category}.{node}' must be a string")
+
+    roles = data["roles"].get("roles")
+    if not isinstance(roles, dict):
+        raise ConfigError("roles.yaml: missing 'roles' mapping")
+    for key, role in roles.items():
+        if not isinstance(role, dict) or "name" not in role or "nodename" not in role:
+            raise ConfigError(f"roles.yaml: role '{key}' requires 'name' and 'nodename'")
+
+    models = data["models"].get("models")
+    if not isinstance(models, dict):
+        raise ConfigError("config.yaml: missing 'models' mapping")
+    for manufacturer, config in models.items():
+        if not isinstance(config, dict) or not config.get("api_url"):
+            raise ConfigError(f"config.yaml: model '{manufacturer}' requires 'api_url'")
+        if not isinstance(config.get("models", []), list):
+            raise ConfigError(f"config.yaml: '{manufacturer}.models' must be a list")
+        if not isinstance(config.get("keep_alive", ""), (str, int, float, dict)):
+            raise ConfigError(f"config.yaml: '{manufacturer}.keep_alive' must be a duration or a mapping")
+    if not isinstance(data["models"].get("errors", {}), dict):
+        raise ConfigError("config.yaml: 'errors' must be a mapping")
+    context = data["models"].get("context", {})
+    if not isinstance(context, dict) or not isinstance(context.get("windows", {}), dict):
+        raise ConfigError("config.yaml: 'context' must be a mapping with a 'windows' mapping")
+    routes = data["models"].get("routes", {})
+    if not isinstance(routes, dict):
+        raise ConfigError("config.yaml: 'routes' must be a mapping")
+    for alias, route in routes.items():
+        chain = route.get("chain") if isinstance(route, dict) else None
+        if not isinstance(chain, list) or not chain:
+            raise ConfigError(f"config.yaml: route '{alias}' requires a non-empty 'chain' list")
+        for target in chain:
+            if not isinstance(target, dict) or target.get("manufacturer") not in models or "model" not in target:
+                raise ConfigError(f"config.yaml: route '{alias}' targets must name a configured manufacturer and a model")
+    for section in ("connection", "scheduler"):
+        options_by_name = data["models"].get(section, {})
+        if not isinstance(options_by_name, dict):
+            raise ConfigError(f"config.yaml: '{section}' must be a mapping")
+        for name, options in options_by_name.items():
+            if not isinstance(options, dict):
+                raise ConfigError(f"config.yaml: '{section}.{name}' must be a mapping")
+
+
+class ConfigRegistry:
+    """
+    版本化配置注册表。
+    一次性加载并校验 prompts / roles / assistantes / config 四个 YAML 文件；
+    读取时按 reload_interval 节流检查文件修改时间，有变化则重新加载并原子替换快照。
+    新配置校验失败时保留旧快照继续服务。
+    """
+
+    def __init__(self, config_dir: str = CONFIG_DIR, reload_interval: float = 2.0):
+        self.config_dir = config_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ConfigSnapshot], Any]] = []
+        self._reloads = 0
+        self._failures = 0
+        self._last_error: Optional[str] = None
+        self._mtimes = self._stat()
+        self._snapshot = ConfigSnapshot(1, self._load())
+        self._next_check = time.monotonic() + reload_interval
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.config_dir, CONFIG_FILES[key])
+
+    def _stat(self) -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for key in CONFIG_FILES:
+            try:
+                mtimes.append(os.stat(self._path(key)).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        data = {}
+        for key in CONFIG_FILES:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                data[key] = yaml.safe_load(f) or {}
+        _validate(data)
+        return data
+
+    @property
+    def version(self) -> int:
+        """当前已加载的版本号（不检查文件变化；需要感知热加载时使用 snapshot().version）"""
+        return self._snapshot.version
+
+    def snapshot(self) -> ConfigSnapshot:
+        """获取当前配置快照（到达检查间隔时顺带检查文件变化）"""
+        if self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self.check()
+        return self._snapshot
+
+    def check(self) -> bool:
+        """检查文件是否变化，变化则重新加载；返回是否切换了新版本"""
+        # 已有线程在检查时直接返回，读取方不会因重新加载而阻塞
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            mtimes = self._stat()
+            if mtimes == self._mtimes:
+                return False
+            self._mtimes = mtimes
+            return self._reload()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> bool:
+        """强制重新加载全部配置文件"""
+        with self._lock:
+            self._mtimes = self._stat()
+            return self._reload()
+
+    def _reload(self) -> bool:
+        try:
+            data = self._load()
+        except Exception as e:
+            self._failures += 1
+            self._last_error = str(e)
+            print(f"Error reloading config: {str(e)}")
+            return False
+
+        current = self._snapshot
+        if all(getattr(current, key) == freeze(data[key]) for key in CONFIG_FILES):
+            return False
+        snapshot = ConfigSnapshot(current.version + 1, data)
+        self._snapshot = snapshot
+        self._reloads += 1
+        self._last_error = None
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Error notifying config listener: {str(e)}")
+        return True
+
+    def subscribe(self, listener: Callable[[ConfigSnapshot], Any]):
+        """注册版本变更回调，回调在触发重新加载的线程中执行"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[ConfigSnapshot], Any]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        """配置注册表指标"""
+        return {
+            "version": self._snapshot.version,
+            "loaded_at": self._snapshot.loaded_at,
+            "reloads": self._reloads,
+            "failures": self._failures,
+            "last_error": self._last_error,
+        }
+
+
+@lru_cache()
+def get_config_registry() -> ConfigRegistry:
+    """获取配置注册表单例"""
+    registry = ConfigRegistry(reload_interval=settings.CONFIG_RELOAD_INTERVAL)
+    metrics_registry.register("config", registry.stats)
+    return registry
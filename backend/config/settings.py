@@ -22,6 +22,38 @@ class Settings(BaseSettings):
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    EXTRACTION_CACHE_DIR: str = "data/extractions"
+    PDF_EXTRACT_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    PDF_EXTRACT_PAGES_PER_TASK: int = 32
+    INGEST_JOB_DIR: str = "data/jobs"
+    INGEST_WORKERS_PER_STAGE: int = 2
+    INGEST_WAIT_TIMEOUT: float = 60.0  # 对话时等待同名文档入库完成的最长秒数
+
+    # 文档存储配置
+    DOCUMENT_STORE_BACKEND: str = "sqlite"  # sqlite 或 memory
+    DOCUMENT_STORE_PATH: str = "data/documents.db"
+    DOCUMENT_STORE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
+
+    # 文档翻译配置
+    TRANSLATION_JOB_DIR: str = "data/translations"  # 任务状态、已完成片段日志与译文文件
+    TRANSLATION_WORKERS: int = 4  # 每个任务并发翻译的片段数
+    TRANSLATION_SEGMENT_CHARS: int = 1500  # 单个片段的最大字符数
+    TRANSLATION_RETRIES: int = 2  # 单个片段失败后的重试次数
+    TRANSLATION_LEASE_TTL: float = 60.0  # 任务租约的有效秒数，持有者崩溃后其他 worker 在到期后接管
+    TRANSLATION_MAX_JOBS: int = 200  # 内存中保留的空闲任务数（已结束或由其他 worker 执行），超出后淘汰最早的
+    TRANSLATION_MEMORY_ENABLED: bool = True  # 精确命中复用既有译文，相似片段作为提示词参考
+    TRANSLATION_MEMORY_PATH: str = "data/translation_memory.jsonl"
+    TRANSLATION_MEMORY_FUZZY_THRESHOLD: float = 0.5  # 相似片段的最低估计 Jaccard 相似度
+    TRANSLATION_MEMORY_REFERENCES: int = 2  # 提示词中最多附带的相似片段数
+    BATCH_TRANSLATION_WINDOW_MS: int = 20  # 短文本微批量的聚合窗口
+    BATCH_TRANSLATION_MAX_ITEMS: int = 20  # 单次上游调用最多翻译的条数
+    BATCH_TRANSLATION_MAX_CHARS: int = 3000  # 单次上游调用的原文字符数上限
+
+    # 会话配置
+    SESSION_LOG_DIR: str = "data/sessions"  # 每个会话一个只追加的 JSON Lines 日志
+    SESSION_HOT_MAX: int = 1000  # 常驻内存的会话数
+    SESSION_MAX_TURNS: int = 200  # 每个会话加载到内存的最近消息数
     
     # 模型配置
     DEFAULT_MODEL: str = "gpt-3.5-turbo"
@@ -30,7 +62,40 @@ class Settings(BaseSettings):
     # 默认模型配置
     DEFAULT_MODEL_MANUFACTURER: str = "ollama"
     DEFAULT_MODEL_NAME: str = "qwen2.5:latest"
+    MODEL_CLIENTS_MAX: int = 64  # 注册表中保留的模型客户端数（按 LRU 淘汰）
+    OLLAMA_PRELOAD_DEFAULT: bool = True  # 启动时预加载默认模型（默认厂商为 ollama 时）
+    OLLAMA_DISCOVERY_TTL: float = 60.0  # /api/tags 发现结果的缓存秒数
+    OLLAMA_DISCOVERY_TIMEOUT: float = 5.0  # /api/tags 与 /api/ps 查询的超时（秒）
+    OLLAMA_LOAD_TIMEOUT: int = 120  # 预加载模型的超时（秒）
+    STREAM_COALESCE_MS: int = 30  # 流式输出合并窗口（毫秒），0 表示逐 token 输出
+    STREAM_COALESCE_BYTES: int = 512  # 单帧累计达到该字节数立即输出
+    QUEUE_STATUS_INTERVAL: float = 1.0  # 排队等待时向客户端推送排队状态的间隔（秒）
+    CONTEXT_BUDGET_ENABLED: bool = True  # 按模型上下文窗口裁剪历史与文档（窗口配置见 config.yaml 的 context 段）
+    TIKTOKEN_CACHE_DIR: str = ""  # 随部署分发的 tiktoken 分词表目录，设置后启动时从本地加载，不访问网络
+    CONFIG_RELOAD_INTERVAL: float = 2.0  # 检查 YAML 配置变化的最小间隔（秒），0 表示不热加载
+    CONFIG_RESPONSE_MAX_AGE: int = 60  # /models 与 /prompt/templates 的浏览器与 CDN 缓存秒数
     
+    # 响应缓存配置
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    RESPONSE_CACHE_TTL: float = 3600.0  # 秒，0 表示不过期
+    RESPONSE_CACHE_DIR: str = ""  # 磁盘层目录，为空时只使用内存
+    SINGLE_FLIGHT_ENABLED: bool = True  # 相同的并发请求共享一个上游流
+    SEMANTIC_CACHE_ENABLED: bool = False  # 语义近似命中会复用其他措辞的回答，按需开启
+    # 余弦相似度阈值。hashing 向量只反映字面重合（"翻译成英文"与"翻译成法文"约 0.86），
+    # 改写问题的语义命中需要 EMBEDDING_BACKEND=ollama 并按所用模型调整阈值
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+
+    # 文档检索配置
+    RETRIEVAL_TOP_K: int = 5
+    RETRIEVAL_CHUNK_SIZE: int = 800
+    RETRIEVAL_MAX_INDEXES: int = 32  # 内存中保留的文档向量索引数，超出后淘汰最久未使用的
+    EMBEDDING_BACKEND: str = "hashing"  # hashing 或 ollama
+    EMBEDDING_DIM: int = 512
+    EMBEDDING_MODEL: str = "nomic-embed-text"
+
     # API密钥
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     DEEPSEEK_API_KEY: str = os.getenv("DEEPSEEK_API_KEY", "")
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
+from ..config.settings import get_settings
 from ..models.chat import ChatRequest
-from ..services.chat_service import ChatService
+from ..services.chat_service import get_chat_service
+from ..services.session_store import SessionStore, get_session_store
+from ..utils.scheduler import SchedulerFullError
+from ..utils.metrics import metrics_registry
+from ..utils.stream_coalescer import CoalescerStats, StreamCoalescer
 import json
 
+settings = get_settings()
 router = APIRouter()
-chat_service = ChatService()
+coalescer_stats = CoalescerStats()
+metrics_registry.register("chat_stream", coalescer_stats.stats)
 
 @router.post("/chat/stream",
     summary="流式聊天",
-    description="与 AI 助手进行流式对话，支持PDF上下文"
+    description="与 AI 助手进行流式对话，支持PDF上下文。上游的细碎增量按 coalesce_ms / coalesce_bytes 合并后输出，coalesce_ms 为 0 时逐 token 输出"
 )
 async def chat_stream(request: ChatRequest):
     """流式聊天接口"""
@@ -17,29 +24,82 @@ async def chat_stream(request: ChatRequest):
         # 获取活跃的PDF上下文
         request.message = request.message
 
+        # 先完成上下文准备，预算决策随响应头返回
+        prepared = await get_chat_service().prepare_chat(
+            request.message,
+            request.model_choice,
+            request.history,
+            request.prompt_type,
+            request.pdf_context,
+            request.context_mode,
+            request.top_k,
+            request.use_cache,
+            request.replay_timing,
+            request.session_id,
+            request.first_token_timeout_ms,
+            request.priority,
+            request.queue_status,
+            request.regenerate
+        )
+        get_chat_service().check_capacity(prepared)
+
         # 创建一个异步生成器来处理流式响应
         async def generate_response():
-            async for chunk in chat_service.generate_chat_response(
-                request.message,
-                request.model_choice,
-                request.history,
-                request.prompt_type,
-                request.pdf_context
-            ):
+            async for chunk in get_chat_service().stream_prepared(prepared):
                 # 确保每个块都是完整的字符串
                 if isinstance(chunk, str):
                     yield chunk
                 else:
                     yield json.dumps(chunk, ensure_ascii=False)
 
+        coalescer = StreamCoalescer(
+            settings.STREAM_COALESCE_MS if request.coalesce_ms is None else request.coalesce_ms,
+            request.coalesce_bytes or settings.STREAM_COALESCE_BYTES,
+            coalescer_stats
+        )
+
+        headers = {
+            "X-Accel-Buffering": "no",
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+        if prepared.budget is not None:
+            headers["X-Context-Budget"] = json.dumps(prepared.budget, separators=(",", ":"))
+
         return StreamingResponse(
-            generate_response(),
+            coalescer.coalesce(generate_response()),
             media_type="text/json",
-            headers={
-                "X-Accel-Buffering": "no",
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-            }
+            headers=headers
         )
+    except SchedulerFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/chat/sessions", summary="创建会话")
+async def create_session():
+    """创建服务端会话，之后的 /chat/stream 请求只需携带 session_id 与本轮消息"""
+    return {"session_id": SessionStore.new_id()}
+
+@router.get("/chat/sessions/{session_id}", summary="查看会话历史")
+async def get_session(session_id: str):
+    """返回会话中已保存的消息"""
+    store = get_session_store()
+    try:
+        if not await store.exists(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        history = await store.get_history(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"session_id": session_id, "history": [message.model_dump() for message in history]}
+
+@router.delete("/chat/sessions/{session_id}", summary="删除会话")
+async def delete_session(session_id: str):
+    """删除会话及其日志"""
+    try:
+        if not await get_session_store().delete(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"session_id": session_id, "deleted": True}
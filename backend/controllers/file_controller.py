@@ -1,49 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
-from backend.services.file_service import FileService
-from backend.schemas.chat import FileResponse as FileResponseSchema
-import os
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from backend.services.file_service import FileService, InvalidUploadError, UploadTooLargeError
+from backend.services.document_store import get_document_store
+from backend.services.ingest_service import get_ingest_service
+from backend.schemas.chat import IngestJobResponse
+from backend.utils.page_range import parse_page_range
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import json
-from datetime import datetime
+import os
 
 router = APIRouter()
 
-# 存储PDF内容的字典
-pdf_contents = {}
+# 流式返回文档内容时每批读取的页数
+PAGE_BATCH_SIZE = 16
 
-@router.post("/upload")
+@router.post("/upload",
+    response_model=IngestJobResponse,
+    status_code=202,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                }
+            }
+        }
+    }
+)
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     file_service: FileService = Depends(lambda: FileService())
 ):
-    """文件上传接口"""
+    """文件上传接口（流式接收，超过大小限制立即拒绝）"""
     try:
-        # 验证文件类型
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are supported")
-        
-        # 提取文本
-        text = await file_service.extract_pdf_text(file)
-        if not text:
-            raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
-        
-        # 保存文件
-        file_path = await file_service.save_upload_file(file)
-        
-        # 存储PDF内容用于后续对话
-        pdf_contents[file.filename] = {
-            'text': text,
-            'file_path': file_path,
-            'timestamp': str(datetime.now())
-        }
-        
-        return FileResponseSchema(
-            text=text,
-            filename=file.filename
-        )
+        # 流式保存文件并计算内容哈希
+        try:
+            upload = await file_service.receive_upload(request)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidUploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # 提交后台入库任务（提取、清洗、分块建索引），立即返回任务ID
+        job = get_ingest_service().submit(upload)
+        return IngestJobResponse(**job.to_dict())
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/upload/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    """查询文档入库进度"""
+    job = get_ingest_service().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
+
 @router.get("/pdf/{filename}")
 async def get_pdf(
     filename: str,
@@ -64,8 +83,75 @@ async def get_pdf(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/pdf/content/{filename}")
-async def get_pdf_content(filename: str):
-    """获取PDF内容接口"""
-    if filename not in pdf_contents:
+async def get_pdf_content(
+    filename: str,
+    pages: Optional[str] = Query(None, description="页码范围，如 10-20 或 1-3,7"),
+    cursor: Optional[int] = Query(None, ge=1, description="游标分页的起始页码"),
+    limit: int = Query(20, ge=1, le=200, description="游标分页每页返回的页数")
+):
+    """
+    获取PDF内容接口。
+    不带参数时流式返回全文；指定 pages 或 cursor 时只返回对应页面。
+    """
+    store = get_document_store()
+    meta = await asyncio.to_thread(store.get_meta, filename)
+    if meta is None:
         raise HTTPException(status_code=404, detail="PDF content not found")
-    return pdf_contents[filename]
+    offsets = meta.pop('page_offsets', None) or []
+
+    if pages is None and cursor is None:
+        return StreamingResponse(_stream_full_text(store, meta), media_type="application/json")
+    if pages is not None and cursor is not None:
+        raise HTTPException(status_code=400, detail="Use either 'pages' or 'cursor', not both")
+
+    page_count = meta['page_count']
+    next_cursor = None
+    if pages is not None:
+        try:
+            ranges = parse_page_range(pages, page_count)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        end = min(cursor + limit - 1, page_count)
+        ranges = [(cursor, end)] if cursor <= page_count else []
+        if end < page_count:
+            next_cursor = end + 1
+
+    return StreamingResponse(
+        _stream_pages(store, meta, ranges, offsets, next_cursor),
+        media_type="application/json"
+    )
+
+def _json_prefix(meta: Dict[str, Any]) -> str:
+    """序列化元数据并去掉结尾的 }，以便继续追加字段"""
+    return json.dumps(meta, ensure_ascii=False)[:-1]
+
+async def _iter_page_batches(store, filename: str, ranges: List[Tuple[int, int]]):
+    """按批从文档存储读取页面，避免一次性加载大文档"""
+    for start, end in ranges:
+        for batch_start in range(start, end + 1, PAGE_BATCH_SIZE):
+            batch_end = min(batch_start + PAGE_BATCH_SIZE - 1, end)
+            yield await asyncio.to_thread(store.get_page_range, filename, batch_start, batch_end)
+
+async def _stream_full_text(store, meta: Dict[str, Any]):
+    yield _json_prefix(meta) + ', "text": "'
+    first = True
+    async for batch in _iter_page_batches(store, meta['filename'], [(1, meta['page_count'])]):
+        for _, text in batch:
+            yield ("" if first else "\\n") + json.dumps(text, ensure_ascii=False)[1:-1]
+            first = False
+    yield '"}'
+
+async def _stream_pages(store, meta: Dict[str, Any], ranges, offsets: List[int], next_cursor: Optional[int]):
+    yield _json_prefix(meta) + ', "pages": ['
+    first = True
+    async for batch in _iter_page_batches(store, meta['filename'], ranges):
+        for page_no, text in batch:
+            item = {
+                "page": page_no,
+                "offset": offsets[page_no - 1] if page_no <= len(offsets) else None,
+                "text": text
+            }
+            yield ("" if first else ", ") + json.dumps(item, ensure_ascii=False)
+            first = False
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
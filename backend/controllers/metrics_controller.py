@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from backend.utils.metrics import metrics_registry
+
+router = APIRouter()
+
+@router.get("/metrics",
+    summary="运行时指标",
+    description="返回各组件（进程池、连接池、缓存等）的运行时指标"
+)
+async def get_metrics():
+    """获取运行时指标"""
+    return metrics_registry.collect()
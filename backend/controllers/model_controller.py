@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
+from backend.config.registry import get_config_registry
+from backend.config.settings import get_settings
+from backend.models.ollama_manager import get_ollama_manager
 from backend.services.model_service import ModelService
 from backend.schemas.model import ModelsResponse
+from backend.utils.metrics import metrics_registry
+from backend.utils.precomputed_response import PrecomputedResponse
 
+settings = get_settings()
 router = APIRouter()
+models_response = PrecomputedResponse(settings.CONFIG_RESPONSE_MAX_AGE)
+metrics_registry.register("models_response", models_response.stats)
 
 @router.get("/models",
     response_model=ModelsResponse,
@@ -42,17 +50,27 @@ router = APIRouter()
         }
     }
     ```
+
+    响应在配置版本、已安装或已加载的 Ollama 模型变化时重新生成，带强 ETag；
+    If-None-Match 命中时返回 304。
     """
 )
-async def get_models(
-    model_service: ModelService = Depends(lambda: ModelService())
-) -> ModelsResponse:
+async def get_models(request: Request):
     """获取可用模型列表"""
-    models = model_service.get_models()
-    default_model = model_service.get_default_model()
-    
-    return ModelsResponse(
-        models=models,
-        total=len(models),
-        default_model=default_model
+    ollama = get_ollama_manager()
+    key = (
+        get_config_registry().snapshot().version,
+        tuple(await ollama.list_models()),
+        tuple(ollama.resident_models())
     )
+
+    async def build() -> bytes:
+        model_service = ModelService()
+        models = await model_service.get_models()
+        return ModelsResponse(
+            models=models,
+            total=len(models),
+            default_model=model_service.get_default_model()
+        ).model_dump_json().encode('utf-8')
+
+    return await models_response.respond(request, key, build)
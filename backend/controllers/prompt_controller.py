@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Request
+from typing import List, Mapping, Optional, Dict, Any
 from pydantic import BaseModel
+from ..config.registry import get_config_registry
+from ..config.settings import get_settings
 from ..models.CausalPromptFactory import CausalPromptFactory
+from ..utils.metrics import metrics_registry
+from ..utils.precomputed_response import PrecomputedResponse
 
+settings = get_settings()
 router = APIRouter()
 prompt_factory = CausalPromptFactory()
+templates_response = PrecomputedResponse(settings.CONFIG_RESPONSE_MAX_AGE)
+metrics_registry.register("templates_response", templates_response.stats)
 
 class PromptRequest(BaseModel):
     query: str
@@ -33,42 +40,46 @@ async def generate_prompt(request: PromptRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/prompt/templates")
-async def get_prompt_templates():
-    """获取预定义的prompt模板"""
+async def get_prompt_templates(request: Request):
+    """获取预定义的prompt模板（配置版本不变时返回预先序列化的响应，支持 If-None-Match）"""
     try:
-        prompts = prompt_factory.config._prompts
-        
-        # 返回大类型和子类型的结构
-        templates = []
-        for category, content in prompts.items():
-            if isinstance(content, dict):
-                subtypes = []
-                for subtype_key, subtype_content in content.items():
-                    subtypes.append({
-                        "name": subtype_key,
-                        "content": subtype_content
-                    })
-                    
-                templates.append({
-                    "type": category,
-                    "name": category.replace("_", " ").title(),
-                    "subtypes": subtypes
-                })
-        
-        return templates
+        return await templates_response.respond(request, get_config_registry().snapshot().version, _build_templates)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _build_templates() -> List[Dict[str, Any]]:
+    """构建模板树：大类型与子类型"""
+    prompts = prompt_factory.config.get_prompts()
+
+    # 返回大类型和子类型的结构
+    templates = []
+    for category, content in prompts.items():
+        if isinstance(content, Mapping):
+            subtypes = []
+            for subtype_key, subtype_content in content.items():
+                subtypes.append({
+                    "name": subtype_key,
+                    "content": subtype_content
+                })
+
+            templates.append({
+                "type": category,
+                "name": category.replace("_", " ").title(),
+                "subtypes": subtypes
+            })
+
+    return templates
+
 @router.get("/prompt/template/{category}")
 async def get_prompt_template_by_category(category: str):
     """获取指定类别的prompt模板"""
     try:
-        prompts = prompt_factory.config._prompts
+        prompts = prompt_factory.config.get_prompts()
         if category not in prompts:
             raise HTTPException(status_code=404, detail=f"Template category '{category}' not found")
             
         template = prompts[category]
-        if not isinstance(template, dict):
+        if not isinstance(template, Mapping):
             raise HTTPException(status_code=400, detail=f"Invalid template format for category '{category}'")
             
         return {
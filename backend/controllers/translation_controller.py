@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from ..config.settings import get_settings
+from ..models.chat import BatchTranslationRequest, TranslationMemoryImport, TranslationRequest
+from ..schemas.chat import TranslationJobResponse, TranslationMemoryImportResponse
+from ..services.batch_translation import get_batch_translator
+from ..services.translation_memory import get_translation_memory
+from ..services.translation_service import get_translation_service
+import asyncio
+import json
+import os
+
+router = APIRouter()
+settings = get_settings()
+
+def _get_job(job_id: str):
+    job = get_translation_service().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Translation job not found")
+    return job
+
+@router.post("/translate/jobs",
+    response_model=TranslationJobResponse,
+    status_code=202,
+    summary="创建文档翻译任务",
+    description="将已上传文档按段落与句子切分后并发翻译，立即返回任务ID；译文可通过 stream 接口按原文顺序流式读取"
+)
+async def create_translation_job(request: TranslationRequest):
+    """创建文档翻译任务"""
+    try:
+        job = await get_translation_service().submit(request)
+        return TranslationJobResponse(**job.to_dict())
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/translate/jobs/{job_id}", response_model=TranslationJobResponse)
+async def get_translation_job(job_id: str):
+    """查询翻译进度"""
+    return TranslationJobResponse(**_get_job(job_id).to_dict())
+
+@router.get("/translate/jobs/{job_id}/stream", summary="按原文顺序流式读取译文")
+async def stream_translation(job_id: str):
+    """从头输出译文，每个片段在其之前的片段全部完成后立即输出，直到任务结束"""
+    job = _get_job(job_id)
+    return StreamingResponse(
+        get_translation_service().stream(job),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "X-Accel-Buffering": "no",
+            "Cache-Control": "no-cache",
+        }
+    )
+
+@router.get("/translate/jobs/{job_id}/download", summary="下载译文文件")
+async def download_translation(job_id: str):
+    """下载完整译文（任务完成后可用）"""
+    service = get_translation_service()
+    job = _get_job(job_id)
+    path = service.output_path(job)
+    if job.state != "done" or not os.path.exists(path):
+        raise HTTPException(status_code=409, detail=f"Translation job is {job.state}")
+    name, _ = os.path.splitext(job.filename)
+    return FileResponse(path, media_type="text/plain; charset=utf-8",
+                        filename=f"{name}.{job.target_language}.txt")
+
+@router.post("/translate/jobs/{job_id}/resume",
+    response_model=TranslationJobResponse,
+    summary="继续失败或中断的翻译任务"
+)
+async def resume_translation_job(job_id: str):
+    """从最后完成的片段继续翻译"""
+    _get_job(job_id)
+    return TranslationJobResponse(**get_translation_service().resume(job_id).to_dict())
+
+@router.post("/translate/memory/import",
+    response_model=TranslationMemoryImportResponse,
+    summary="批量导入翻译记忆",
+    description="导入既有的原文 / 译文对，之后翻译任务中与原文相同的片段直接复用译文，相似片段作为参考"
+)
+async def import_translation_memory(request: TranslationMemoryImport):
+    """批量导入翻译记忆"""
+    if not settings.TRANSLATION_MEMORY_ENABLED:
+        raise HTTPException(status_code=409, detail="Translation memory is disabled")
+    memory = get_translation_memory()
+    try:
+        imported = await asyncio.to_thread(
+            memory.add_many,
+            [(entry.source, entry.target) for entry in request.entries],
+            request.target_language,
+            request.origin
+        )
+        return TranslationMemoryImportResponse(imported=imported, entries=len(memory))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/translate/batch",
+    summary="批量翻译短文本",
+    description="一次提交多条短文本（句子、提示文字等），服务端与并发请求一起微批量打包翻译；"
+                "以 NDJSON 按完成顺序返回，每行为 {\"index\": 序号, \"text\": 译文} 或 {\"index\": 序号, \"error\": 错误}"
+)
+async def translate_batch(request: BatchTranslationRequest):
+    """批量翻译短文本"""
+    async def generate():
+        async for index, text, error in get_batch_translator().translate(
+            request.segments, request.target_language, request.model_choice
+        ):
+            line = {"index": index, "text": text} if error is None else {"index": index, "error": error}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={
+            "X-Accel-Buffering": "no",
+            "Cache-Control": "no-cache",
+        }
+    )
@@ -1,8 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
+from backend.config.registry import get_config_registry
 from backend.config.settings import get_settings
-from backend.controllers import chat_router, file_router, model_router, prompt_router
+from backend.controllers import chat_router, file_router, model_router, prompt_router, metrics_router, translation_router
+from backend.models.model_registry import get_model_registry
+from backend.models.ollama_manager import get_ollama_manager
+from backend.services.chat_service import get_chat_service
+from backend.services.document_store import get_document_store
+from backend.services.file_service import get_extraction_pool
+from backend.utils.connection_pool import get_connection_pools
+from backend.utils.token_counter import preload_encoders
+from backend.services.ingest_service import get_ingest_service
+from backend.services.translation_memory import get_translation_memory
+from backend.services.translation_service import get_translation_service
 
 # 加载配置
 settings = get_settings()
@@ -10,6 +23,30 @@ settings = get_settings()
 # 创建上传目录
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时初始化资源，关闭时释放"""
+    get_config_registry()
+    # 文档存储与会话日志等运行时数据在启动时创建，导入模块不产生文件
+    await asyncio.to_thread(get_document_store)
+    get_chat_service()
+    if settings.CONTEXT_BUDGET_ENABLED:
+        # 分词表可能需要从磁盘读取或下载，放到线程中，避免首个 OpenAI 请求阻塞事件循环
+        await asyncio.to_thread(preload_encoders, settings.TIKTOKEN_CACHE_DIR)
+    get_model_registry().warm()
+    get_connection_pools().start_prewarm()
+    get_ollama_manager().start()
+    if settings.TRANSLATION_MEMORY_ENABLED:
+        # 重放记忆库文件并计算签名，放到线程中避免阻塞事件循环
+        await asyncio.to_thread(get_translation_memory)
+    get_translation_service().resume_all()
+    yield
+    await get_translation_service().shutdown()
+    await get_ollama_manager().shutdown()
+    await get_ingest_service().shutdown()
+    await get_model_registry().close()
+    get_extraction_pool().shutdown()
+
 # 创建应用
 app = FastAPI(
     title="Translation Assistant API",
@@ -28,6 +65,8 @@ app = FastAPI(
     * `/api/v1/models`: 获取可用模型列表
     * `/api/v1/chat/stream`: 流式聊天接口
     * `/api/v1/upload`: 文件上传接口
+    * `/api/v1/translate/jobs`: 整篇文档翻译任务
+    * `/api/v1/metrics`: 运行时指标
     
     ## 环境变量
     在使用 API 之前，请确保设置以下环境变量：
@@ -37,7 +76,8 @@ app = FastAPI(
     version="1.0.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
-    redoc_url=f"{settings.API_V1_STR}/redoc"
+    redoc_url=f"{settings.API_V1_STR}/redoc",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -54,6 +94,8 @@ app.include_router(model_router, prefix=settings.API_V1_STR, tags=["models"])
 app.include_router(chat_router, prefix=settings.API_V1_STR, tags=["chat"])
 app.include_router(file_router, prefix=settings.API_V1_STR, tags=["files"])
 app.include_router(prompt_router, prefix=settings.API_V1_STR, tags=["prompts"])
+app.include_router(metrics_router, prefix=settings.API_V1_STR, tags=["metrics"])
+app.include_router(translation_router, prefix=settings.API_V1_STR, tags=["translation"])
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,90 +1,136 @@
-import os
-import yaml
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Mapping, Tuple
+from backend.config.registry import ConfigSnapshot, get_config_registry
 from backend.models.chat import ChatMessage, Role
 import asyncio
 
 class RoleConfig:
     """提示词配置管理"""
-    
-    # 加载提示词配置
-    _prompt_path = os.path.join(os.path.dirname(__file__), "..", "config", "roles.yaml")
-    with open(_prompt_path, 'r', encoding='utf-8') as f:
-        _prompts = yaml.safe_load(f)
+
+    @staticmethod
+    def _get_prompts() -> Dict[str, Any]:
+        return get_config_registry().snapshot().roles
 
     @classmethod
     def get_prompt(cls, key: str, category: str = 'roles') -> str:
         """获取提示词"""
-        prompt = cls._prompts.get(category, {}).get(key, "")
+        prompt = cls._get_prompts().get(category, {}).get(key, "")
         return prompt
 
     @classmethod
     def get_prompt_nodes(cls, category: str = 'roles') -> List[str]:
         """获取提示词节点"""
-        return list(cls._prompts.get(category, {}).keys())
+        return list(cls._get_prompts().get(category, {}).keys())
 
     @classmethod
     def get_role_name(cls, node_name: str) -> str:
         """获取指定角色名称"""
-        role_info = cls._prompts['roles']
-
-        for key, value in role_info.items():
-            if value["nodename"] == node_name:
-                return value["name"]
-        return None  # 如果没有匹配的 nodename，则返回 N
+        # 如果没有匹配的 nodename，则返回 None
+        return get_config_registry().snapshot().role_by_node.get(node_name)
 
 class AssistanceConfig:
     """提示词配置管理"""
-    
-    # 加载提示词配置
-    _prompt_path = os.path.join(os.path.dirname(__file__), "..", "config", "assistantes.yaml")
-    with open(_prompt_path, 'r', encoding='utf-8') as f:
-        _prompts = yaml.safe_load(f)
+
+    @staticmethod
+    def _get_prompts() -> Dict[str, Any]:
+        return get_config_registry().snapshot().assistants
 
     @classmethod
     def get_prompt(cls, key: str, category: str = 'roles') -> str:
         """获取提示词"""
-        prompt = cls._prompts.get(category, {}).get(key, "")
+        prompt = cls._get_prompts().get(category, {}).get(key, "")
         return prompt
 
     @classmethod
     def get_prompt_nodes(cls, category: str = 'roles') -> List[str]:
         """获取提示词节点"""
-        return list(cls._prompts.get(category, {}).keys())
+        return list(cls._get_prompts().get(category, {}).keys())
 
 
 class PromptConfig:
     """提示词配置管理"""
-    
-    # 加载提示词配置
-    _prompt_path = os.path.join(os.path.dirname(__file__), "..", "config", "prompts.yaml")
-    with open(_prompt_path, 'r', encoding='utf-8') as f:
-        _prompts = yaml.safe_load(f)
+
+    @staticmethod
+    def _get_prompts() -> Mapping[str, Any]:
+        return get_config_registry().snapshot().prompts
+
+    @classmethod
+    def get_prompts(cls) -> Mapping[str, Any]:
+        """获取当前版本的全部提示词（只读映射，修改会抛出 TypeError）"""
+        return cls._get_prompts()
 
     @classmethod
     def get_prompt(cls, key: str, category: str = 'prompts') -> str:
         """获取提示词"""
-        prompt = cls._prompts.get(category, {}).get(key, "")
+        prompt = cls._get_prompts().get(category, {}).get(key, "")
         return prompt
 
     @classmethod
     def get_prompt_nodes(cls, category: str = 'prompts') -> List[str]:
         """获取提示词节点"""
-        return list(cls._prompts.get(category, {}).keys())
+        return list(cls._get_prompts().get(category, {}).keys())
 
 
 class CausalPromptFactory:
     """支持模型识别和消息顺序控制的提示词工厂"""
     
+    _KEY_PATTERN = re.compile(r'\{(.*?)\}')
+
     def __init__(self, model_name: str = "deepseek-reasoner"):
         self.config = PromptConfig()
         self.role = RoleConfig()
         self.model_name = model_name.lower()  # 统一转为小写
+        # prompt_type -> 渲染计划 [(角色, 模板片段)]，片段中偶数位为字面文本、奇数位为参数名
+        # 计划与配置版本绑定，配置热加载后整体失效
+        self._plans: Dict[str, List[Tuple[str, List[str]]]] = {}
+        self._plans_version = 0
 
     @staticmethod
     def extract_keys(template: str) -> List[str]:
-        return re.findall(r'\{(.*?)\}', template)
+        return CausalPromptFactory._KEY_PATTERN.findall(template)
+
+    def _compile(self, prompt_type: str, snapshot: ConfigSnapshot) -> List[Tuple[str, List[str]]]:
+        """将某类提示词编译为渲染计划：确定每个节点的角色，并把模板切分为字面文本与参数占位"""
+        plan = []
+        for node, template in snapshot.prompts.get(prompt_type, {}).items():
+            # 获取角色配置
+            role = snapshot.role_by_node.get(node) or "assistant"
+
+            # 模型特定角色覆盖
+            if self._is_deepseek_model() and node == "system":
+                role = "user"  # Deepseek 通常用 user 角色承载系统提示
+
+            if not template:
+                continue
+            plan.append((role, self._KEY_PATTERN.split(template)))
+        return plan
+
+    def _get_plan(self, prompt_type: str) -> List[Tuple[str, List[str]]]:
+        # 同一次编译只读取一个快照，保证角色与模板来自同一版本
+        snapshot = get_config_registry().snapshot()
+        if snapshot.version != self._plans_version:
+            self._plans = {}
+            self._plans_version = snapshot.version
+        plan = self._plans.get(prompt_type)
+        if plan is None:
+            plan = self._plans[prompt_type] = self._compile(prompt_type, snapshot)
+        return plan
+
+    @staticmethod
+    def _render(segments: List[str], values: Dict[str, str]) -> str:
+        """单次遍历渲染模板片段"""
+        if len(segments) == 1:
+            return segments[0]
+        parts = segments[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values.get(parts[i], "")
+        return "".join(parts)
+
+    @staticmethod
+    def _to_text(value: Any) -> str:
+        if isinstance(value, list):
+            return "\n".join(map(str, value))
+        return str(value)
     
     def _is_deepseek_model(self) -> bool:
         """判断是否为需要特殊处理的 Deepseek 模型"""
@@ -120,34 +166,16 @@ class CausalPromptFactory:
         return messages
 
     async def build_prompt(self, params: Dict[str, Any]) -> List[ChatMessage]:
-        messages = []
         prompt_type = params.get('prompt_type', 'prompts')
         self.need_prefix = False  # 重置标记
 
-        for node in self.config.get_prompt_nodes(prompt_type):
-            # 获取角色配置
-            role = self.role.get_role_name(node) or "assistant"
-            
-            # 模型特定角色覆盖
-            if self._is_deepseek_model() and node == "system":
-                role = "user"  # Deepseek 通常用 user 角色承载系统提示
-
-            # 获取并填充模板
-            template = self.config.get_prompt(node, prompt_type)
-            if not template:
-                continue
-
-            # 动态参数替换
-            keys = self.extract_keys(template)
-            content = template
-            for key in keys:
-                value = params.get(key, "")
-                if isinstance(value, list):
-                    value = "\n".join(map(str, value))
-                content = content.replace(f"{{{key}}}", str(value))
-
-            messages.append(ChatMessage(role=role, content=content, prefix=False))
+        # 动态参数只转换一次，各节点共享
+        values = {key: self._to_text(value) for key, value in params.items()}
+        messages = [
+            ChatMessage(role=role, content=self._render(segments, values), prefix=False)
+            for role, segments in self._get_plan(prompt_type)
+        ]
 
         # 后处理：消息顺序强制调整
         messages = self._enforce_message_order(messages)
-        return messages
\ No newline at end of file
+        return messages
@@ -18,4 +18,4 @@ class ModelFactory:
         model_class = cls._model_map.get(manufacturer)
         if not model_class:
             raise ValueError(f"Unsupported model manufacturer: {manufacturer}")
-        return model_class(model_name)
+        return model_class.from_config(model_name)
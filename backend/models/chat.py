@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel, Field
 import json
 
 class BaseModelWithJSON(BaseModel):
@@ -90,12 +90,53 @@ class ChatMessage(BaseModelWithJSON):
     prefix: bool
 
 
+class PdfContext(BaseModelWithJSON):
+    filename: str
+    pages: Optional[str] = None  # 页码范围，如 "10-20" 或 "1-3,7"
+
+
 class ChatRequest(BaseModelWithJSON):
     message: str
     model_choice: ModelChoice
-    history: Optional[List[ChatMessage]] = []
+    history: Optional[List[ChatMessage]] = []  # 无 session_id 时由客户端提供完整历史
+    session_id: Optional[str] = Field(None, pattern=r'^[A-Za-z0-9_-]{1,64}$')  # 服务端会话，提供时忽略 history
     prompt_type: Optional[str] = "prompts"
-    pdf_context: Optional[str] = None  # 添加PDF文件名字段
+    pdf_context: Optional[Union[str, PdfContext]] = None  # PDF文件名，或带页码范围的 PdfContext
+    context_mode: Literal["full", "retrieved"] = "full"  # full: 全文注入；retrieved: 仅注入检索到的文本块
+    top_k: Optional[int] = None  # retrieved 模式下注入的文本块数量
+    coalesce_ms: Optional[int] = Field(None, ge=0, le=1000)  # 输出合并窗口（毫秒），0 为逐 token 输出，缺省用服务端配置
+    coalesce_bytes: Optional[int] = Field(None, ge=1, le=65536)  # 单帧字节上限，缺省用服务端配置
+    use_cache: bool = False  # 为 True 时读取并写入响应缓存；默认关闭，相同请求（如重新提问）会重新生成
+    replay_timing: bool = False  # 缓存命中时按原始节奏回放
+    regenerate: bool = False  # 重新生成：不读取缓存，也不与相同的并发请求共享上游流
+    priority: Literal["interactive", "batch"] = "interactive"  # 上游并发槽的排队优先级
+    queue_status: bool = False  # 排队时在流中输出以 \x1e 开头的排队状态帧
+    first_token_timeout_ms: Optional[int] = Field(None, ge=0, le=120000)  # 路由模式下首个 token 的对冲期限，缺省用路由配置
+
+
+class TranslationRequest(BaseModelWithJSON):
+    filename: str  # 已上传的文档
+    target_language: str = "English"
+    model_choice: ModelChoice
+    pages: Optional[str] = None  # 页码范围，如 "10-20" 或 "1-3,7"，缺省翻译全文
+    workers: Optional[int] = Field(None, ge=1, le=16)  # 并发翻译的片段数，缺省用服务端配置
+
+
+class TranslationMemoryEntry(BaseModelWithJSON):
+    source: str
+    target: str
+
+
+class TranslationMemoryImport(BaseModelWithJSON):
+    target_language: str
+    entries: List[TranslationMemoryEntry] = Field(..., min_length=1)
+    origin: Optional[str] = None  # 来源说明，如术语表或历史译稿名称
+
+
+class BatchTranslationRequest(BaseModelWithJSON):
+    segments: List[str] = Field(..., min_length=1, max_length=200)  # 短文本，如句子或提示文字
+    target_language: str = "English"
+    model_choice: ModelChoice
 
 
 class Assistant(BaseModelWithJSON):
@@ -1,106 +1,221 @@
 import os
-from ..utils.async_api_client import AsyncAPIClient
-import yaml
-from typing import Dict, List, AsyncGenerator
+from ..config.registry import get_config_registry
+from ..utils.async_api_client import APIError, AsyncAPIClient
+from ..utils.scheduler import THROTTLE_STATUS, QueueTicket, get_schedulers
+from .ollama_manager import get_ollama_manager
+from ..utils.stream_parser import CONTENT, FINISH, USAGE
+from typing import Dict, List, AsyncGenerator, Optional
 from .chat import ChatMessage
-import json
+
+
 class ModelConfig:
     """模型配置管理类"""
-    
-    # 加载配置
-    _config_path = os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml")
-    with open(_config_path, 'r', encoding='utf-8') as f:
-        _config = yaml.safe_load(f)
+
+    @staticmethod
+    def _get_config() -> Dict:
+        return get_config_registry().snapshot().models
 
     @classmethod
     def get_error(cls, key: str, **kwargs) -> str:
         """获取错误消息"""
-        return cls._config['errors'].get(key, "Unknown error.").format(**kwargs)
+        return cls._get_config().get('errors', {}).get(key, "Unknown error.").format(**kwargs)
 
     @classmethod
     def get_model_config(cls, model_type: str) -> Dict:
         """获取模型配置"""
-        return cls._config['models'].get(model_type, {})
+        return cls._get_config()['models'].get(model_type, {})
 
-class ChatModel(AsyncAPIClient):
-    """通用聊天模型基类"""
+    @classmethod
+    def get_connection_config(cls, model_type: str) -> Dict:
+        """获取某厂商的连接池配置（connection.default 与厂商覆盖项合并）"""
+        connection = cls._get_config().get('connection', {})
+        return {**connection.get('default', {}), **connection.get(model_type, {})}
 
-    def __init__(self, base_url: str, model_name: str):
-        super().__init__(base_url)
-        self.model_name = model_name
+    @classmethod
+    def get_scheduler_config(cls, model_type: str) -> Dict:
+        """获取某厂商的并发调度配置（scheduler.default 与厂商覆盖项合并）"""
+        scheduler = cls._get_config().get('scheduler', {})
+        return {**scheduler.get('default', {}), **scheduler.get(model_type, {})}
 
-    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncGenerator[str, None]:
-        """流式请求聊天消息"""
-        raise NotImplementedError()
+    @classmethod
+    def get_context_config(cls) -> Dict:
+        """获取上下文预算配置"""
+        return cls._get_config().get('context', {})
 
+    @classmethod
+    def get_context_window(cls, model_name: str) -> int:
+        """获取模型的上下文窗口（token），未配置时使用 default_window"""
+        config = cls.get_context_config()
+        return config.get('windows', {}).get(model_name, config.get('default_window', 8192))
 
-class OpenAIModel(ChatModel):
-    """OpenAI Chat Model"""
-    
-    def __init__(self, model_name: str):
-        base_url =  ModelConfig.get_model_config('openai')['api_url']
-        super().__init__(base_url, model_name)
-
-    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncGenerator[str, None]:
-        """调用 OpenAI API 进行流式聊天"""
-        headers = {
-            "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
-            "Content-Type": "application/json"
-        }
+    @classmethod
+    def get_routes(cls) -> Dict[str, Dict]:
+        """获取路由别名配置"""
+        return cls._get_config().get('routes', {})
+
+    @classmethod
+    def get_models(cls) -> Dict[str, Dict]:
+        """获取全部厂商配置"""
+        return cls._get_config()['models']
 
-        data = {
+class ChatModel(AsyncAPIClient):
+    """
+    通用聊天模型基类。
+    实例长期复用：请求头、端点 URL 在构造时一次性确定，并记录活跃流、请求数和错误数。
+    子类只需提供 endpoint 与请求体构造。
+    """
+
+    manufacturer = ""
+    endpoint = ""
+    api_key_env: Optional[str] = None
+
+    def __init__(self, base_url: str, model_name: str, timeout: int = 30, pool_options: Optional[Dict] = None):
+        super().__init__(base_url, timeout, pool_options)
+        self.model_name = model_name
+        self.headers = self._build_headers()
+        self.chat_url = self.build_url(self.endpoint)
+        self.active_streams = 0
+        self.total_requests = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.truncated = 0  # 未收到结束事件就关闭的流
+
+    @classmethod
+    def from_config(cls, model_name: str) -> "ChatModel":
+        """按当前配置快照中的厂商配置创建实例"""
+        config = ModelConfig.get_model_config(cls.manufacturer)
+        return cls(
+            config['api_url'], model_name, config.get('timeout', 30),
+            ModelConfig.get_connection_config(cls.manufacturer)
+        )
+
+    def _build_headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key_env:
+            headers["Authorization"] = f"Bearer {os.getenv(self.api_key_env)}"
+        return headers
+
+    def _build_payload(self, messages: List[ChatMessage]) -> Dict:
+        return {
             "model": self.model_name,
             "messages": [msg.dict() for msg in messages],
             "stream": True
-        }        
-        async for chunk in self.async_stream_request("/chat/completions", headers=headers, json=data):
-            yield chunk
-
-class OllamaModel(ChatModel):
-    """Ollama Chat Model"""
-    
-    def __init__(self, model_name: str):
-        base_url = ModelConfig.get_model_config('ollama')['api_url']
-        super().__init__(base_url, model_name)
-
-    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncGenerator[str, None]:
-        """调用 Ollama API 进行流式聊天"""
-        headers = {
-            "Content-Type": "application/json"
         }
-        
-        data = {
-            "model": self.model_name,
-            "messages": [msg.dict() for msg in messages],  # ✅ 确保是 Python 字典
-            "stream": True
+
+    async def stream_chat(
+        self,
+        messages: List[ChatMessage],
+        ticket: Optional[QueueTicket] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式请求聊天消息。
+        请求先在厂商调度器中获取并发槽；首个 token 之前遇到 429/503 时收缩并发并按配置重试。
+        """
+        ticket = ticket or QueueTicket()
+        ticket.model = self.model_name
+        scheduler = get_schedulers().get(self.manufacturer, ModelConfig.get_scheduler_config(self.manufacturer))
+        attempt = 0
+        self.total_requests += 1
+        while True:
+            await scheduler.acquire(ticket)
+            self.active_streams += 1
+            started = False
+            finished = False
+            try:
+                async for event in self.async_stream_events(
+                    self.chat_url, headers=self.headers, json=self._build_payload(messages)
+                ):
+                    if event.type == CONTENT:
+                        started = True
+                        yield event.text
+                    elif event.type == USAGE:
+                        self.prompt_tokens += event.data.get("prompt_tokens") or 0
+                        self.completion_tokens += event.data.get("completion_tokens") or 0
+                    elif event.type == FINISH:
+                        finished = True
+                ticket.completed = finished
+                if not finished:
+                    self.truncated += 1
+                scheduler.on_success()
+                return
+            except APIError as e:
+                if e.status_code in THROTTLE_STATUS:
+                    scheduler.on_throttle(e.retry_after)
+                    if not started and attempt < scheduler.options["retries"]:
+                        attempt += 1
+                        continue
+                self.errors += 1
+                self.last_error = str(e)
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                raise
+            finally:
+                self.active_streams -= 1
+                scheduler.release()
+
+    def stats(self) -> Dict:
+        """客户端指标"""
+        return {
+            "base_url": self.base_url,
+            "http2": self.pool.http2,
+            "active_streams": self.active_streams,
+            "total_requests": self.total_requests,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "truncated": self.truncated,
         }
-        async for chunk in self.async_stream_request("/chat", headers=headers, json=data):  # ✅ 直接传字典
+
+
+class OpenAIModel(ChatModel):
+    """OpenAI Chat Model"""
+
+    manufacturer = "openai"
+    endpoint = "/chat/completions"
+    api_key_env = "OPENAI_API_KEY"
+
+
+class OllamaModel(ChatModel):
+    """Ollama Chat Model，按模型设置 keep_alive 并记录模型驻留状态"""
+
+    manufacturer = "ollama"
+    endpoint = "/chat"
+
+    def _build_payload(self, messages: List[ChatMessage]) -> Dict:
+        payload = super()._build_payload(messages)
+        keep_alive = get_ollama_manager().keep_alive_for(self.model_name)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+
+    async def stream_chat(
+        self,
+        messages: List[ChatMessage],
+        ticket: Optional[QueueTicket] = None
+    ) -> AsyncGenerator[str, None]:
+        async for chunk in super().stream_chat(messages, ticket):
             yield chunk
+        get_ollama_manager().mark_resident(self.model_name)
 
 
 class DeepSeekModel(ChatModel):
     """DeepSeek Chat Model"""
-    
-    def __init__(self, model_name: str):
-        base_url = ModelConfig.get_model_config('deepseek')['api_url']
-        super().__init__(base_url, model_name)
-
-    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncGenerator[str, None]:
-        """调用 DeepSeek API 进行流式聊天"""
-        headers = {
-            "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-            "Content-Type": "application/json"
-        }
 
-        data = {
+    manufacturer = "deepseek"
+    endpoint = "/beta/chat/completions"
+    api_key_env = "DEEPSEEK_API_KEY"
+
+    def _build_payload(self, messages: List[ChatMessage]) -> Dict:
+        return {
             "model": self.model_name,
             "messages": [
-            {**msg.dict(), "prefix": msg.role == "assistant" and msg == messages[-1]}
-            for msg in messages
-        ],
-        "stream": True
+                {**msg.dict(), "prefix": msg.role == "assistant" and msg == messages[-1]}
+                for msg in messages
+            ],
+            "stream": True
         }
-
-        
-        async for chunk in self.async_stream_request("/beta/chat/completions", headers=headers, json=data):
-            yield chunk
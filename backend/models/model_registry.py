@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+from .ModelFactory import ModelFactory
+from .chat_models import ChatModel, ModelConfig
+from ..config.settings import get_settings
+from ..utils.async_api_client import AsyncAPIClient
+from ..utils.metrics import metrics_registry
+
+
+class ModelRegistry:
+    """
+    长期复用的模型客户端注册表，按 (厂商, 模型) 缓存 ChatModel 实例。
+    配置热加载后若厂商的 api_url、超时或连接池配置发生变化，下次获取时重建客户端；
+    已在进行中的流继续使用旧实例直至结束。
+    模型名来自客户端请求（Ollama 模型不限于配置列表），注册表按 LRU 最多保留 max_clients 个客户端，
+    被淘汰的客户端下次使用时重建。
+    """
+
+    def __init__(self, max_clients: int = 64):
+        self.max_clients = max(1, max_clients)
+        self._clients: "OrderedDict[Tuple[str, str], ChatModel]" = OrderedDict()
+
+    def get(self, manufacturer: str, model_name: str) -> ChatModel:
+        """获取模型客户端，不存在时创建"""
+        key = (manufacturer.lower(), model_name)
+        client = self._clients.get(key)
+        if client is None or self._is_stale(client):
+            client = self._clients[key] = ModelFactory.create_model(*key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        self._clients.move_to_end(key)
+        return client
+
+    @staticmethod
+    def _is_stale(client: ChatModel) -> bool:
+        config = ModelConfig.get_model_config(client.manufacturer)
+        return (config.get('api_url') != client.base_url
+                or config.get('timeout', 30) != client.timeout
+                or ModelConfig.get_connection_config(client.manufacturer) != client.pool_options)
+
+    def warm(self):
+        """为配置中列出的全部模型预先创建客户端"""
+        for manufacturer, config in ModelConfig.get_models().items():
+            for model_name in config.get('models', []):
+                try:
+                    self.get(manufacturer, model_name)
+                except ValueError as e:
+                    print(f"Error warming model client: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """各客户端指标"""
+        return {
+            f"{manufacturer}/{model_name}": client.stats()
+            for (manufacturer, model_name), client in self._clients.items()
+        }
+
+    async def close(self):
+        """清空客户端并关闭共享连接池"""
+        self._clients.clear()
+        await AsyncAPIClient.close_shared()
+
+
+@lru_cache()
+def get_model_registry() -> ModelRegistry:
+    """获取模型客户端注册表单例"""
+    registry = ModelRegistry(get_settings().MODEL_CLIENTS_MAX)
+    metrics_registry.register("models", registry.stats)
+    return registry
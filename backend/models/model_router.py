@@ -0,0 +1,155 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+from .chat import ChatMessage
+from .chat_models import ModelConfig
+from .model_registry import ModelRegistry, get_model_registry
+from ..utils.metrics import metrics_registry
+from ..utils.scheduler import QueueTicket
+
+# ModelChoice.manufacturer 为该值时，model 是 config.yaml 中 routes 下的路由别名
+ROUTE_MANUFACTURER = "route"
+
+
+class ModelRouter:
+    """
+    按路由别名在有序的后备链上请求模型，以首个 token 的到达时间为准：
+    当前请求在 hedge_after_ms 内没有产出首个 token 时，并行向链上的下一个上游发起对冲请求；
+    某个上游在首个 token 之前出错时立即切换到下一个。
+    最先产出内容的流胜出，其余流被取消并释放连接。首个 token 之后不再切换。
+    """
+
+    def __init__(self, models: ModelRegistry):
+        self.models = models
+        self._requests = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._failovers = 0
+        self._exhausted = 0
+        self._wins: Dict[str, int] = {}
+
+    @staticmethod
+    def get_route(alias: str) -> Dict[str, Any]:
+        route = ModelConfig.get_routes().get(alias)
+        if route is None:
+            raise ValueError(ModelConfig.get_error('model_not_found', model=alias))
+        return route
+
+    @classmethod
+    def budget_target(cls, alias: str) -> Tuple[str, str]:
+        """用于上下文预算的上游：链上上下文窗口最小的模型，保证提示词对任一上游都放得下"""
+        chain = cls.get_route(alias)['chain']
+        target = min(chain, key=lambda target: ModelConfig.get_context_window(target['model']))
+        return target['manufacturer'], target['model']
+
+    async def stream(
+        self,
+        alias: str,
+        messages: List[ChatMessage],
+        hedge_after_ms: Optional[int] = None,
+        ticket: Optional[QueueTicket] = None
+    ) -> AsyncGenerator[str, None]:
+        """按路由流式请求，hedge_after_ms 缺省时使用路由配置"""
+        route = self.get_route(alias)
+        chain = route['chain']
+        if hedge_after_ms is None:
+            hedge_after_ms = route.get('hedge_after_ms', 3000)
+        hedge_after = hedge_after_ms / 1000 if hedge_after_ms > 0 else None
+        self._requests += 1
+
+        # 每个尝试：等待首个 token 的任务 -> (链上序号, 流, 票据)
+        ticket = ticket or QueueTicket()
+        pending: Dict[asyncio.Future, Tuple[int, AsyncIterator[str], QueueTicket]] = {}
+        next_index = 0
+        hedged = set()  # 因首个 token 超时而发起的尝试
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal next_index
+            target = chain[next_index]
+            model = self.models.get(target['manufacturer'], target['model'])
+            # 每次尝试使用独立票据：各自记录模型、厂商与排队位置，互不覆盖
+            attempt = ticket.for_attempt()
+            stream = model.stream_chat(messages, attempt)
+            pending[asyncio.ensure_future(stream.__anext__())] = (next_index, stream, attempt)
+            next_index += 1
+
+        winner = None
+        try:
+            launch()
+            while winner is None and pending:
+                timeout = hedge_after if next_index < len(chain) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 首个 token 超时，对冲到链上的下一个上游
+                    self._hedges += 1
+                    hedged.add(next_index)
+                    launch()
+                    continue
+                for task in done:
+                    index, stream, attempt = pending.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        last_error = ValueError(ModelConfig.get_error('invalid_response'))
+                        continue
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if winner is None:
+                        winner = (index, stream, attempt, first)
+                    else:
+                        await stream.aclose()
+                if winner is None and not pending and next_index < len(chain):
+                    # 全部进行中的上游都已失败，立即切换到下一个
+                    self._failovers += 1
+                    launch()
+        finally:
+            await self._cancel(pending)
+
+        if winner is None:
+            self._exhausted += 1
+            raise last_error or ValueError(ModelConfig.get_error('invalid_response'))
+
+        index, stream, attempt, first = winner
+        target = chain[index]
+        name = f"{target['manufacturer']}/{target['model']}"
+        self._wins[name] = self._wins.get(name, 0) + 1
+        if index in hedged:
+            self._hedge_wins += 1
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+            ticket.completed = attempt.completed
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    async def _cancel(pending: Dict[asyncio.Future, Tuple[int, AsyncIterator[str], QueueTicket]]):
+        """取消落败的尝试：先取消等待中的读取，再关闭流以释放连接"""
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for _, stream, _ in pending.values():
+            await stream.aclose()
+        pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """路由指标"""
+        return {
+            "requests": self._requests,
+            "hedges_fired": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "failovers": self._failovers,
+            "exhausted": self._exhausted,
+            "wins": dict(self._wins),
+        }
+
+
+@lru_cache()
+def get_model_router() -> ModelRouter:
+    """获取模型路由单例"""
+    router = ModelRouter(get_model_registry())
+    metrics_registry.register("model_router", router.stats)
+    return router
@@ -0,0 +1,186 @@
+import asyncio
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Union
+from ..config.registry import get_config_registry
+from ..config.settings import get_settings
+from ..utils.async_api_client import AsyncAPIClient
+from ..utils.metrics import metrics_registry
+from ..utils.scheduler import get_schedulers
+
+settings = get_settings()
+
+_DURATION_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*$')
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def parse_keep_alive(value: Union[str, int, float, None]) -> Optional[float]:
+    """把 Ollama 的 keep_alive（如 "10m"、"1h"、300、-1）换算为秒；负数表示常驻，返回 None"""
+    if value is None:
+        return 300.0  # Ollama 默认保留 5 分钟
+    match = _DURATION_RE.match(str(value))
+    if match is None:
+        return 300.0
+    seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    return None if seconds < 0 else seconds
+
+
+class OllamaManager(AsyncAPIClient):
+    """
+    Ollama 模型生命周期管理。
+    通过 /api/tags 发现已安装的模型（按 TTL 缓存），通过 /api/ps 与本地记录跟踪已加载到内存的模型，
+    启动时预加载默认模型，并按 config.yaml 中 ollama.keep_alive 为每个模型设置驻留时间。
+    调度器在同优先级的等待请求中优先放行已驻留模型的请求，减少模型换入换出。
+    """
+
+    def __init__(self, base_url: str, pool_options: Optional[Dict] = None,
+                 discovery_ttl: float = 60.0, resident_ttl: float = 5.0,
+                 discovery_timeout: float = 5.0, load_timeout: int = 120):
+        # /api/tags、/api/ps 等查询使用较短的超时，只有预加载模型使用 load_timeout
+        super().__init__(base_url, discovery_timeout, pool_options)
+        self.load_timeout = load_timeout
+        self.discovery_ttl = discovery_ttl
+        self.resident_ttl = resident_ttl
+        self._installed: List[str] = []
+        self._discovered_at = 0.0
+        self._discovery_error: Optional[str] = None
+        # 模型 -> 驻留到期时间（time.time()），None 表示常驻
+        self._resident: Dict[str, Optional[float]] = {}
+        self._resident_checked_at = 0.0
+        self._loads = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _config() -> Dict[str, Any]:
+        return get_config_registry().snapshot().models['models'].get('ollama', {})
+
+    def keep_alive_for(self, model_name: str) -> Union[str, int, None]:
+        """模型的 keep_alive 配置：可为统一的值，或 {default: ..., 模型名: ...} 映射"""
+        keep_alive = self._config().get('keep_alive')
+        if isinstance(keep_alive, Mapping):
+            return keep_alive.get(model_name, keep_alive.get('default'))
+        return keep_alive
+
+    async def list_models(self, force: bool = False) -> List[str]:
+        """已安装的模型；发现失败时返回上次结果，从未成功时返回 config.yaml 中列出的模型"""
+        # 成功与失败都在一个 TTL 内复用结果；从未成功（Ollama 不可达或未安装模型）时同样不重复探测
+        if not force and self._discovered_at and time.monotonic() - self._discovered_at < self.discovery_ttl:
+            return self._installed or list(self._config().get('models', []))
+        try:
+            data = await self.async_request("GET", "/tags")
+            self._installed = [model['name'] for model in data.get('models', [])]
+            self._discovered_at = time.monotonic()
+            self._discovery_error = None
+        except Exception as e:
+            print(f"Error discovering Ollama models: {str(e)}")
+            self._discovery_error = str(e)
+            # 失败后同样等待一个 TTL 再重试，避免每次列出模型都等待连接超时
+            self._discovered_at = time.monotonic()
+        return self._installed or list(self._config().get('models', []))
+
+    async def refresh_resident(self, force: bool = False) -> List[str]:
+        """通过 /api/ps 同步已加载到内存的模型"""
+        if force or time.monotonic() - self._resident_checked_at >= self.resident_ttl:
+            self._resident_checked_at = time.monotonic()
+            try:
+                data = await self.async_request("GET", "/ps")
+                self._resident = {
+                    model['name']: self._parse_expires(model.get('expires_at'))
+                    for model in data.get('models', [])
+                }
+            except Exception as e:
+                print(f"Error listing resident Ollama models: {str(e)}")
+        return self.resident_models()
+
+    @staticmethod
+    def _parse_expires(expires_at: Optional[str]) -> Optional[float]:
+        if not expires_at:
+            return None
+        try:
+            timestamp = datetime.fromisoformat(re.sub(r'(\.\d{6})\d+', r'\1', expires_at.replace('Z', '+00:00')))
+            # Ollama 对常驻模型返回很远的到期时间
+            return timestamp.timestamp()
+        except ValueError:
+            return None
+
+    def is_resident(self, model_name: str) -> bool:
+        """模型当前是否已加载（不触发请求，使用最近一次同步与本地记录）"""
+        if model_name not in self._resident:
+            return False
+        expires = self._resident[model_name]
+        return expires is None or expires > time.time()
+
+    def resident_models(self) -> List[str]:
+        return [name for name in self._resident if self.is_resident(name)]
+
+    def mark_resident(self, model_name: str):
+        """一次请求完成后记录模型驻留到 keep_alive 到期"""
+        seconds = parse_keep_alive(self.keep_alive_for(model_name))
+        if seconds == 0:
+            self._resident.pop(model_name, None)
+        else:
+            self._resident[model_name] = None if seconds is None else time.time() + seconds
+
+    async def preload(self, model_name: str):
+        """加载模型到内存（不生成内容）"""
+        await self.async_request("POST", "/generate", timeout=self.load_timeout, json={
+            "model": model_name,
+            "keep_alive": self.keep_alive_for(model_name),
+        })
+        self._loads += 1
+        self.mark_resident(model_name)
+
+    async def unload(self, model_name: str):
+        """立即从内存卸载模型"""
+        await self.async_request("POST", "/generate", json={"model": model_name, "keep_alive": 0})
+        self._resident.pop(model_name, None)
+
+    def start(self):
+        """后台发现模型并预加载默认模型，不阻塞应用启动；调度器优先放行已驻留模型的请求"""
+        get_schedulers().set_preference("ollama", lambda ticket: self.is_resident(ticket.model))
+        if self._task is None:
+            self._task = asyncio.create_task(self._startup())
+
+    async def _startup(self):
+        await self.list_models(force=True)
+        await self.refresh_resident(force=True)
+        if settings.OLLAMA_PRELOAD_DEFAULT and settings.DEFAULT_MODEL_MANUFACTURER == "ollama":
+            model_name = settings.DEFAULT_MODEL_NAME
+            if not self.is_resident(model_name):
+                try:
+                    await self.preload(model_name)
+                except Exception as e:
+                    print(f"Error preloading Ollama model {model_name}: {str(e)}")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Ollama 模型指标"""
+        return {
+            "installed": list(self._installed),
+            "resident": self.resident_models(),
+            "discovery_error": self._discovery_error,
+            "preloads": self._loads,
+        }
+
+
+@lru_cache()
+def get_ollama_manager() -> OllamaManager:
+    """获取 Ollama 管理器单例"""
+    config = get_config_registry().snapshot().models
+    connection = config.get('connection', {})
+    manager = OllamaManager(
+        config['models']['ollama']['api_url'],
+        {**connection.get('default', {}), **connection.get('ollama', {})},
+        settings.OLLAMA_DISCOVERY_TTL,
+        discovery_timeout=settings.OLLAMA_DISCOVERY_TIMEOUT,
+        load_timeout=settings.OLLAMA_LOAD_TIMEOUT
+    )
+    metrics_registry.register("ollama", manager.stats)
+    return manager
@@ -75,23 +75,69 @@ class ChatRequest(BaseModel):
             }
         }
 
-class FileResponse(BaseModel):
-    """文件上传响应"""
-    text: str = Field(
-        ...,
-        description="提取的文本内容",
-        example="这是从PDF文件中提取的文本内容..."
-    )
-    filename: str = Field(
-        ...,
-        description="文件名",
-        example="document.pdf"
-    )
+class IngestJobResponse(BaseModel):
+    """文档入库任务状态"""
+    job_id: str = Field(..., description="入库任务ID")
+    document_id: str = Field(..., description="文档ID（内容SHA-256）")
+    filename: str = Field(..., description="文件名", example="document.pdf")
+    state: str = Field(..., description="任务状态：queued/extracting/cleaning/indexing/done/failed")
+    cached: bool = Field(False, description="是否命中提取缓存")
+    pages_total: int = Field(0, description="总页数")
+    pages_extracted: int = Field(0, description="已提取页数")
+    chunks_total: int = Field(0, description="文本块总数")
+    chunks_embedded: int = Field(0, description="已向量化文本块数")
+    error: Optional[str] = Field(None, description="失败原因")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "3f2b9c0e4d5a4f7e9a1b2c3d4e5f6a7b",
+                "document_id": "a5dcb822ab24efdc1e994619b1195a40d46cf094c9e3412cc3635aa15a74b265",
+                "filename": "document.pdf",
+                "state": "extracting",
+                "cached": False,
+                "pages_total": 200,
+                "pages_extracted": 64,
+                "chunks_total": 0,
+                "chunks_embedded": 0,
+                "error": None
+            }
+        }
+
+class TranslationJobResponse(BaseModel):
+    """文档翻译任务状态"""
+    job_id: str = Field(..., description="翻译任务ID")
+    filename: str = Field(..., description="文件名", example="document.pdf")
+    target_language: str = Field(..., description="目标语言", example="English")
+    model_choice: Dict[str, str] = Field(..., description="翻译使用的模型")
+    pages: Optional[str] = Field(None, description="页码范围")
+    workers: int = Field(..., description="并发翻译的片段数")
+    state: str = Field(..., description="任务状态：queued/translating/done/failed")
+    segments_total: int = Field(0, description="片段总数")
+    segments_done: int = Field(0, description="已翻译片段数")
+    prefix_done: int = Field(0, description="已按原文顺序连续完成的片段数")
+    memory_hits: Dict[str, int] = Field(default_factory=dict, description="翻译记忆库查询结果：exact/fuzzy/miss")
+    error: Optional[str] = Field(None, description="失败原因")
 
     class Config:
         json_schema_extra = {
             "example": {
-                "text": "这是从PDF文件中提取的文本内容...",
-                "filename": "document.pdf"
+                "job_id": "9c1e7a5b3d2f4e6a8b0c1d2e3f4a5b6c",
+                "filename": "document.pdf",
+                "target_language": "English",
+                "model_choice": {"manufacturer": "ollama", "model": "qwen2.5:7b"},
+                "pages": None,
+                "workers": 4,
+                "state": "translating",
+                "segments_total": 180,
+                "segments_done": 57,
+                "prefix_done": 52,
+                "memory_hits": {"exact": 12, "fuzzy": 9, "miss": 36},
+                "error": None
             }
         }
+
+class TranslationMemoryImportResponse(BaseModel):
+    """翻译记忆库导入结果"""
+    imported: int = Field(..., description="本次导入的条目数")
+    entries: int = Field(..., description="记忆库条目总数")
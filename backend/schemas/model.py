@@ -7,6 +7,7 @@ class ModelInfo(BaseModel):
     manufacturer: str = Field(..., description="模型厂商")
     description: Optional[str] = Field(None, description="模型描述")
     default: bool = Field(False, description="是否为默认模型")
+    loaded: Optional[bool] = Field(None, description="本地模型是否已加载到内存（仅 Ollama）")
 
 class ModelsResponse(BaseModel):
     """模型列表响应"""
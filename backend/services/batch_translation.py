@@ -0,0 +1,218 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from backend.config.settings import get_settings
+from backend.models.CausalPromptFactory import CausalPromptFactory
+from backend.models.chat import ChatMessage, ModelChoice
+from backend.models.model_registry import get_model_registry
+from backend.models.model_router import ROUTE_MANUFACTURER, get_model_router
+from backend.services.translation_memory import get_translation_memory, normalize_segment
+from backend.utils.metrics import metrics_registry
+from backend.utils.scheduler import QueueTicket
+from backend.utils.text_processor import TextProcessor
+
+settings = get_settings()
+
+class BatchItem:
+    """等待翻译的短文本；相同文本在同一批次中只翻译一次，结果分发给所有等待者"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.futures: List[asyncio.Future] = []
+
+
+class BatchTranslator:
+    """
+    短文本微批量翻译。
+    同一 (模型, 目标语言) 下的请求先在 window 秒内聚合（跨并发客户端），
+    再按条数与字符数上限打包为带编号的提示词，一次上游调用翻译多条，按编号把输出拆回各条。
+    输出无法解析或条数不符时，缺失的条目退回逐条翻译。
+    启用翻译记忆库时，精确命中的文本直接返回，新译文写回记忆库。
+    """
+
+    def __init__(self, window: float = 0.02, max_items: int = 20, max_chars: int = 3000, retries: int = 1):
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.retries = retries
+        self.prompt_factory = CausalPromptFactory()
+        self.models = get_model_registry()
+        self.router = get_model_router()
+        self.memory = get_translation_memory() if settings.TRANSLATION_MEMORY_ENABLED else None
+        # (厂商, 模型, 目标语言) -> 规范化文本 -> 条目
+        self._pending: Dict[Tuple[str, str, str], Dict[str, BatchItem]] = {}
+        self._timers: Dict[Tuple[str, str, str], asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        self._requests = 0
+        self._segments = 0
+        self._memory_hits = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._parse_failures = 0
+        self._fallback_items = 0
+        self._upstream_calls = 0
+
+    async def translate(
+        self,
+        segments: List[str],
+        target_language: str,
+        model_choice: ModelChoice
+    ) -> AsyncGenerator[Tuple[int, Optional[str], Optional[str]], None]:
+        """按完成顺序产出 (序号, 译文, 错误)"""
+        self._requests += 1
+        self._segments += len(segments)
+        waiting: Dict[asyncio.Future, int] = {}
+        key = (model_choice.manufacturer, model_choice.model, target_language)
+        for index, segment in enumerate(segments):
+            if not segment.strip():
+                yield index, segment, None
+                continue
+            remembered = self.memory.lookup(segment, target_language) if self.memory else None
+            if remembered is not None:
+                self._memory_hits += 1
+                yield index, remembered, None
+                continue
+            waiting[self._enqueue(key, segment)] = index
+
+        try:
+            while waiting:
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = waiting.pop(future)
+                    if future.exception() is not None:
+                        yield index, None, str(future.exception())
+                    else:
+                        yield index, future.result(), None
+        finally:
+            # 客户端断开时放弃尚未完成的条目（批次仍会为其他等待者完成）
+            for future in waiting:
+                future.cancel()
+
+    def _enqueue(self, key: Tuple[str, str, str], segment: str) -> asyncio.Future:
+        bucket = self._pending.setdefault(key, {})
+        normalized = normalize_segment(segment)
+        item = bucket.get(normalized)
+        if item is None:
+            item = bucket[normalized] = BatchItem(segment.strip())
+        future = asyncio.get_running_loop().create_future()
+        item.futures.append(future)
+        if len(bucket) >= self.max_items:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        return future
+
+    def _flush(self, key: Tuple[str, str, str]):
+        """窗口到期或条数达到上限：把聚合的条目打包成批次并发送"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = list(self._pending.pop(key, {}).values())
+        batch: List[BatchItem] = []
+        chars = 0
+        for item in items:
+            if batch and (len(batch) >= self.max_items or chars + len(item.text) > self.max_chars):
+                self._spawn(self._run_batch(key, batch))
+                batch, chars = [], 0
+            batch.append(item)
+            chars += len(item.text)
+        if batch:
+            self._spawn(self._run_batch(key, batch))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key: Tuple[str, str, str], batch: List[BatchItem]):
+        manufacturer, model_name, target_language = key
+        model_choice = ModelChoice(manufacturer=manufacturer, model=model_name)
+        results: List[Optional[str]] = [None] * len(batch)
+        if len(batch) > 1:
+            self._batches += 1
+            self._batched_items += len(batch)
+            try:
+                output = await self._complete(model_choice, await self.prompt_factory.build_prompt({
+                    'prompt_type': 'batch_translation',
+                    'items': TextProcessor.number_lines([item.text for item in batch]),
+                    'count': len(batch),
+                    'target_language': target_language,
+                }))
+                results = TextProcessor.parse_numbered(output, len(batch))
+                if None in results:
+                    self._parse_failures += 1
+            except Exception as e:
+                print(f"Error translating batch of {len(batch)}: {str(e)}")
+                self._parse_failures += 1
+
+        # 批量结果无法使用的条目逐条翻译
+        missing = [index for index, result in enumerate(results) if result is None]
+        self._fallback_items += len(missing) if len(batch) > 1 else 0
+        fallbacks = await asyncio.gather(
+            *(self._translate_one(model_choice, target_language, batch[index].text) for index in missing),
+            return_exceptions=True
+        )
+        for index, result in zip(missing, fallbacks):
+            results[index] = result
+
+        remembered = []
+        for item, result in zip(batch, results):
+            for future in item.futures:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            if isinstance(result, str):
+                remembered.append((item.text, result))
+        if self.memory is not None and remembered:
+            await asyncio.to_thread(self.memory.add_many, remembered, target_language, "batch")
+
+    async def _translate_one(self, model_choice: ModelChoice, target_language: str, text: str) -> str:
+        return await self._complete(model_choice, await self.prompt_factory.build_prompt({
+            'prompt_type': 'translation',
+            'text': text,
+            'target_language': target_language,
+        }))
+
+    async def _complete(self, model_choice: ModelChoice, messages: List[ChatMessage]) -> str:
+        """调用模型（交互优先级），失败时重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                self._upstream_calls += 1
+                if model_choice.manufacturer == ROUTE_MANUFACTURER:
+                    stream = self.router.stream(model_choice.model, messages, ticket=QueueTicket())
+                else:
+                    model = self.models.get(model_choice.manufacturer, model_choice.model)
+                    stream = model.stream_chat(messages, QueueTicket())
+                return "".join([chunk async for chunk in stream]).strip()
+            except Exception:
+                if attempt == self.retries:
+                    raise
+
+    def stats(self) -> Dict[str, Any]:
+        """微批量翻译指标"""
+        return {
+            "requests": self._requests,
+            "segments": self._segments,
+            "memory_hits": self._memory_hits,
+            "batches": self._batches,
+            "avg_batch_size": round(self._batched_items / self._batches, 2) if self._batches else 0.0,
+            "parse_failures": self._parse_failures,
+            "fallback_items": self._fallback_items,
+            "upstream_calls": self._upstream_calls,
+            "pending": sum(len(bucket) for bucket in self._pending.values()),
+        }
+
+
+@lru_cache()
+def get_batch_translator() -> BatchTranslator:
+    """获取微批量翻译单例"""
+    translator = BatchTranslator(
+        settings.BATCH_TRANSLATION_WINDOW_MS / 1000,
+        settings.BATCH_TRANSLATION_MAX_ITEMS,
+        settings.BATCH_TRANSLATION_MAX_CHARS
+    )
+    metrics_registry.register("batch_translation", translator.stats)
+    return translator
@@ -1,14 +1,86 @@
-from typing import List, Dict, AsyncGenerator
+from typing import List, Dict, AsyncGenerator, AsyncIterator, Optional, Tuple, Union
 import asyncio
-from ..models.chat import ModelChoice, ChatMessage
+import json
+from functools import lru_cache
+from ..models.chat import ModelChoice, ChatMessage, PdfContext
 from ..models.CausalPromptFactory import CausalPromptFactory
-from ..models.ModelFactory import ModelFactory
-#from ..services.file_service import file_contents
-from  backend.controllers.file_controller import pdf_contents
+from ..models.model_registry import get_model_registry
+from ..models.model_router import ROUTE_MANUFACTURER, ModelRouter, get_model_router
+from ..config.settings import get_settings
+from .context_budget import ContextBudgeter
+from .document_store import get_document_store
+from .ingest_service import get_ingest_service
+from .response_cache import CachedResponse, ResponseCache, ResponseRecorder, get_response_cache
+from .retrieval_service import get_retrieval_service
+from .semantic_cache import SemanticCache, get_semantic_cache
+from .session_store import get_session_store
+from .single_flight import get_single_flight
+from ..utils.page_range import parse_page_range
+from ..utils.token_counter import get_token_counter
+from ..models.chat_models import ModelConfig
+from ..utils.scheduler import QueueTicket, SchedulerFullError, get_schedulers
+
+settings = get_settings()
+
+# 排队状态帧的起始字符（ASCII RS），客户端据此区分状态帧与回答内容
+QUEUE_STATUS_PREFIX = "\x1e"
+
+
+class PreparedChat:
+    """已完成上下文准备、可直接输出的一次对话"""
+
+    def __init__(
+        self,
+        message: str,
+        model_choice: ModelChoice,
+        history: List[ChatMessage],
+        prompt_type: str,
+        pdf_context: Union[str, PdfContext, None],
+        context_mode: str,
+        top_k: Optional[int],
+        use_cache: bool,
+        replay_timing: bool,
+        session_id: Optional[str] = None,
+        hedge_after_ms: Optional[int] = None,
+        priority: str = "interactive",
+        queue_status: bool = False,
+        regenerate: bool = False
+    ):
+        self.message = message
+        self.model_choice = model_choice
+        self.history = history
+        self.prompt_type = prompt_type
+        self.pdf_context = pdf_context
+        self.context_mode = context_mode
+        self.top_k = top_k
+        self.use_cache = use_cache
+        self.replay_timing = replay_timing
+        self.session_id = session_id
+        self.hedge_after_ms = hedge_after_ms
+        self.ticket = QueueTicket(priority)
+        self.queue_status = queue_status
+        self.regenerate = regenerate
+        self.document: Optional[Dict] = None
+        self.messages: List[ChatMessage] = []
+        self.cache_key: Optional[str] = None
+        self.budget: Optional[Dict] = None  # 上下文预算决策
+        self.error: Optional[Exception] = None
+
+
 class ChatService:
     """聊天服务"""
     def __init__(self):
         self.prompt_factory = CausalPromptFactory()
+        self.retrieval = get_retrieval_service()
+        self.documents = get_document_store()
+        self.ingest = get_ingest_service()
+        self.models = get_model_registry()
+        self.router = get_model_router()
+        self.cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
+        self.flights = get_single_flight()
+        self.budgeter = ContextBudgeter()
+        self.sessions = get_session_store()
         
     async def generate_chat_response(
         self,
@@ -16,28 +88,300 @@ class ChatService:
         model_choice: ModelChoice,
         history: List[ChatMessage],
         prompt_type: str = "query",
-        pdf_context: str = None
+        pdf_context: Union[str, PdfContext, None] = None,
+        context_mode: str = "full",
+        top_k: Optional[int] = None,
+        use_cache: bool = False,
+        replay_timing: bool = False,
+        session_id: Optional[str] = None,
+        hedge_after_ms: Optional[int] = None,
+        priority: str = "interactive",
+        queue_status: bool = False,
+        regenerate: bool = False
     ) -> AsyncGenerator[str, None]:
-        """生成聊天响应"""
+        """生成聊天响应；相同模型与相同渲染消息的完整响应会被缓存并回放"""
+        prepared = await self.prepare_chat(
+            message, model_choice, history, prompt_type, pdf_context,
+            context_mode, top_k, use_cache, replay_timing, session_id, hedge_after_ms, priority,
+            queue_status=queue_status, regenerate=regenerate
+        )
+        async for chunk in self.stream_prepared(prepared):
+            yield chunk
+
+    async def prepare_chat(
+        self,
+        message: str,
+        model_choice: ModelChoice,
+        history: List[ChatMessage],
+        prompt_type: str = "query",
+        pdf_context: Union[str, PdfContext, None] = None,
+        context_mode: str = "full",
+        top_k: Optional[int] = None,
+        use_cache: bool = False,
+        replay_timing: bool = False,
+        session_id: Optional[str] = None,
+        hedge_after_ms: Optional[int] = None,
+        priority: str = "interactive",
+        queue_status: bool = False,
+        regenerate: bool = False
+    ) -> "PreparedChat":
+        """
+        准备一次对话：读取会话历史与文档上下文、按上下文预算裁剪历史与文档并渲染提示词。
+        在开始流式输出之前完成，调用方可以把预算决策放进响应头；出错时记录在 error 中。
+        """
+        prepared = PreparedChat(message, model_choice, history, prompt_type, pdf_context,
+                                context_mode, top_k, use_cache, replay_timing, session_id, hedge_after_ms,
+                                priority, queue_status, regenerate)
         try:
+            manufacturer, model_name = model_choice.manufacturer, model_choice.model
+            if manufacturer == ROUTE_MANUFACTURER:
+                manufacturer, model_name = ModelRouter.budget_target(model_name)
+
+            history_costs = rendered = None
+            if session_id:
+                # 服务端会话：历史取自会话日志，每条消息的 token 数与渲染文本由会话缓存
+                counter = get_token_counter(manufacturer, model_name) if settings.CONTEXT_BUDGET_ENABLED else None
+                history, history_costs, rendered = await self.sessions.get_context(session_id, counter)
+                prepared.history = history
+
             pdf_content = ""
-            if pdf_context and pdf_context in pdf_contents:
-                  pdf_content = pdf_contents[pdf_context]['text']
+            if pdf_context:
+                pdf_content, prepared.document = await self._load_pdf_context(
+                    pdf_context, message, context_mode, top_k
+                )
+
+            params = {'query': message, 'prompt_type': prompt_type}
+            if settings.CONTEXT_BUDGET_ENABLED:
+                fixed_messages = await self.prompt_factory.build_prompt({**params, 'text': "", 'history': []})
+                history, pdf_content, prepared.budget = self.budgeter.apply(
+                    manufacturer, model_name, fixed_messages, history or [], pdf_content,
+                    separator="\n\n" if context_mode == "retrieved" else "\n",
+                    history_costs=history_costs
+                )
 
-            messages = await self.prompt_factory.build_prompt({
-                'query': message,
+            prepared.messages = await self.prompt_factory.build_prompt({
+                **params,
                 'text': pdf_content,
-                'prompt_type': prompt_type,
-                'history': history
+                # 预算只会丢弃最早的轮次，保留部分是渲染缓存的后缀
+                'history': rendered[len(rendered) - len(history or []):] if rendered is not None else history
             })
-            
-            model = ModelFactory.create_model(manufacturer= model_choice.manufacturer,
-                                              model_name= model_choice.model)
-            
-            # 生成流式响应
-            async for chunk in model.stream_chat(messages):
+            prepared.cache_key = ResponseCache.make_key(model_choice.manufacturer, model_choice.model,
+                                                        prepared.messages)
+        except Exception as e:
+            prepared.error = e
+        return prepared
+
+    def check_capacity(self, prepared: "PreparedChat"):
+        """
+        开始响应之前的准入检查：请求要用到的厂商等待队列都已满时抛出 SchedulerFullError，
+        由调用方返回 503；路由请求只要链上还有厂商能排队就放行。
+        """
+        if prepared.error is not None:
+            return
+        model_choice = prepared.model_choice
+        if model_choice.manufacturer == ROUTE_MANUFACTURER:
+            manufacturers = [target['manufacturer'] for target in ModelRouter.get_route(model_choice.model)['chain']]
+        else:
+            manufacturers = [model_choice.manufacturer]
+        schedulers = get_schedulers()
+        if all(schedulers.get(name, ModelConfig.get_scheduler_config(name)).is_full() for name in manufacturers):
+            raise SchedulerFullError(f"{', '.join(manufacturers)} queue is full")
+
+    async def stream_prepared(self, prepared: "PreparedChat") -> AsyncGenerator[str, None]:
+        """输出已准备好的对话；服务端会话在回答完整输出后追加本轮问答"""
+        answer = []
+        async for chunk in self._stream_answer(prepared):
+            if not chunk.startswith(QUEUE_STATUS_PREFIX):
+                answer.append(chunk)
+            yield chunk
+
+        if prepared.session_id and prepared.error is None:
+            try:
+                await self.sessions.append(prepared.session_id, [
+                    ChatMessage(role="user", content=prepared.message, prefix=False),
+                    ChatMessage(role="assistant", content="".join(answer), prefix=False),
+                ])
+            except Exception as e:
+                print(f"Error appending session {prepared.session_id}: {str(e)}")
+
+    async def _stream_answer(self, prepared: "PreparedChat") -> AsyncGenerator[str, None]:
+        """依次尝试精确缓存、语义缓存，最后请求上游模型"""
+        try:
+            if prepared.error is not None:
+                raise prepared.error
+
+            model_choice, messages, cache_key = prepared.model_choice, prepared.messages, prepared.cache_key
+            use_cache = prepared.use_cache and settings.RESPONSE_CACHE_ENABLED
+            semantic_scope = query_vector = None
+            if use_cache and not prepared.regenerate:
+                cached = await self.cache.lookup(cache_key)
+
+                # 精确匹配未命中时按问题语义查找（仅首轮提问，多轮对话的回答依赖历史）
+                if cached is None and settings.SEMANTIC_CACHE_ENABLED and not prepared.history:
+                    pdf_context = prepared.pdf_context
+                    semantic_scope = SemanticCache.make_scope(
+                        self._document_fingerprint(prepared.document),
+                        model_choice.manufacturer, model_choice.model,
+                        prompt_type=prepared.prompt_type, context_mode=prepared.context_mode,
+                        top_k=prepared.top_k,
+                        pages=pdf_context.pages if isinstance(pdf_context, PdfContext) else None
+                    )
+                    query_vector = await self.semantic_cache.embed(prepared.message)
+                    match = self.semantic_cache.lookup(semantic_scope, query_vector)
+                    if match is not None:
+                        cached = match[0]
+
+                if cached is not None:
+                    async for chunk in self.cache.replay(cached, prepared.replay_timing):
+                        yield chunk
+                    return
+
+            def upstream():
+                return self._stream_upstream(
+                    model_choice, messages, cache_key if use_cache else None,
+                    prepared.message, semantic_scope, query_vector, prepared.hedge_after_ms, prepared.ticket
+                )
+
+            # 相同模型与相同渲染消息的并发请求共享同一个上游流（与是否启用响应缓存无关）；
+            # 重新生成的请求单独请求上游
+            if settings.SINGLE_FLIGHT_ENABLED and not prepared.regenerate:
+                stream = self.flights.run(cache_key, upstream)
+            else:
+                stream = upstream()
+            if prepared.queue_status:
+                stream = self._with_queue_status(stream, prepared.ticket)
+            async for chunk in stream:
                 yield chunk
                 
         except Exception as e:
+            prepared.error = e
             print(f"Error in generate_chat_response: {str(e)}")
             yield f"对话生成出错: {str(e)}"
+
+    async def _stream_upstream(
+        self,
+        model_choice: ModelChoice,
+        messages: List[ChatMessage],
+        cache_key: Optional[str],
+        message: str,
+        semantic_scope: Optional[str],
+        query_vector,
+        hedge_after_ms: Optional[int] = None,
+        ticket: Optional[QueueTicket] = None
+    ) -> AsyncGenerator[str, None]:
+        """请求上游模型（或按路由别名对冲请求），上游发出结束事件后写入缓存"""
+        ticket = ticket or QueueTicket()
+        if model_choice.manufacturer == ROUTE_MANUFACTURER:
+            stream = self.router.stream(model_choice.model, messages, hedge_after_ms, ticket)
+        else:
+            model = self.models.get(manufacturer=model_choice.manufacturer,
+                                    model_name=model_choice.model)
+            stream = model.stream_chat(messages, ticket)
+
+        # 生成流式响应
+        recorder = ResponseRecorder()
+        async for chunk in stream:
+            recorder.record(chunk)
+            yield chunk
+
+        # 只缓存完整响应：连接在 [DONE] / finish 事件之前关闭时回答可能被截断
+        if not ticket.completed:
+            return
+        if cache_key is not None:
+            await self.cache.store(cache_key, recorder.chunks, recorder.offsets)
+        if semantic_scope is not None and recorder.chunks:
+            self.semantic_cache.store(
+                semantic_scope, message, query_vector,
+                CachedResponse(recorder.chunks, recorder.offsets)
+            )
+
+    @staticmethod
+    async def _with_queue_status(stream: AsyncIterator[str], ticket: QueueTicket) -> AsyncGenerator[str, None]:
+        """
+        在首个数据块到达之前，每隔 QUEUE_STATUS_INTERVAL 秒输出一帧排队状态。
+        状态帧为 RS 字符（\\x1e）开头、换行结尾的一行 JSON，不计入缓存和会话。
+        """
+        iterator = stream.__aiter__()
+        next_chunk = asyncio.ensure_future(iterator.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_chunk}, timeout=settings.QUEUE_STATUS_INTERVAL)
+                if done:
+                    break
+                if ticket.waiting:
+                    status = json.dumps({"queue": ticket.status()}, ensure_ascii=False)
+                    yield f"{QUEUE_STATUS_PREFIX}{status}\n"
+            try:
+                yield next_chunk.result()
+            except StopAsyncIteration:
+                return
+            async for chunk in iterator:
+                yield chunk
+        finally:
+            if not next_chunk.done():
+                next_chunk.cancel()
+                await asyncio.gather(next_chunk, return_exceptions=True)
+            await iterator.aclose()
+
+    async def _load_pdf_context(
+        self,
+        pdf_context: Union[str, PdfContext],
+        message: str,
+        context_mode: str,
+        top_k: Optional[int]
+    ) -> Tuple[str, Optional[Dict]]:
+        """读取PDF上下文：全文、指定页码范围，或检索到的文本块；同时返回文档元数据"""
+        if isinstance(pdf_context, str):
+            pdf_context = PdfContext(filename=pdf_context)
+        filename = pdf_context.filename
+
+        # SQLite 读取在线程中执行，不阻塞事件循环
+        document = await asyncio.to_thread(self.documents.get_meta, filename)
+        if await self.ingest.wait_for_document(filename, settings.INGEST_WAIT_TIMEOUT):
+            # 文档刚上传仍在入库，等待完成后读取最新版本
+            document = await asyncio.to_thread(self.documents.get_meta, filename)
+        if not document:
+            return "", None
+
+        page_ranges = None
+        if pdf_context.pages:
+            page_ranges = parse_page_range(pdf_context.pages, document['page_count'])
+
+        if context_mode == "retrieved":
+            return await self._retrieve_context(document, message, top_k, page_ranges), document
+        if page_ranges is None:
+            return await asyncio.to_thread(self.documents.get_text, filename) or "", document
+        pages = []
+        for start, end in page_ranges:
+            rows = await asyncio.to_thread(self.documents.get_page_range, filename, start, end)
+            pages.extend(text for _, text in rows)
+        return "\n".join(pages).strip(), document
+
+    @staticmethod
+    def _document_fingerprint(document: Optional[Dict]) -> str:
+        """文档内容指纹：优先使用文件 SHA-256，旧数据退回文件名与入库时间"""
+        if not document:
+            return ""
+        return document.get('sha256') or f"{document['filename']}:{document['timestamp']}"
+
+    async def _retrieve_context(
+        self,
+        document: Dict,
+        message: str,
+        top_k: Optional[int],
+        page_ranges: Optional[List[Tuple[int, int]]] = None
+    ) -> str:
+        """检索与问题相关的文本块作为上下文"""
+        name, version = document['filename'], document['timestamp']
+        if not self.retrieval.has_index(name, version):
+            # 文档可能由其他 worker 上传，按需从文档存储读取并建立索引
+            pages = await asyncio.to_thread(self.documents.get_pages, name) or []
+            await self.retrieval.index_document(name, pages, version)
+        chunks = await self.retrieval.retrieve(name, message, top_k, page_ranges)
+        return self.retrieval.format_chunks(chunks)
+
+
+@lru_cache()
+def get_chat_service() -> ChatService:
+    """获取聊天服务单例（在应用启动时创建，导入模块不会打开文档存储等资源）"""
+    return ChatService()
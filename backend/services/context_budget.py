@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional, Tuple
+from backend.models.chat import ChatMessage
+from backend.models.chat_models import ModelConfig
+from backend.utils.token_counter import TokenCounter, get_token_counter
+
+
+class ContextBudgeter:
+    """
+    上下文预算：按模型上下文窗口在系统提示、历史、文档与回答预留之间分配 token。
+    超出预算时历史从最早的轮次开始丢弃，文档在文本块（检索模式）或段落边界处截断。
+    """
+
+    def apply(
+        self,
+        manufacturer: str,
+        model_name: str,
+        fixed_messages: List[ChatMessage],
+        history: List[ChatMessage],
+        document: str,
+        separator: str = "\n",
+        history_costs: Optional[List[int]] = None
+    ) -> Tuple[List[ChatMessage], str, Dict[str, Any]]:
+        """
+        裁剪历史与文档使其落在预算内。
+
+        :param fixed_messages: 不含历史和文档时渲染出的消息（系统提示、问题模板等）
+        :param separator: 文档的分块分隔符，截断只发生在分隔符处
+        :param history_costs: 会话缓存的每条历史消息 token 数（与 history 对齐），省略时现场计数
+        :return: (保留的历史, 截断后的文档, 预算报告)
+        """
+        config = ModelConfig.get_context_config()
+        counter = get_token_counter(manufacturer, model_name)
+        window = ModelConfig.get_context_window(model_name)
+        reserve = min(config.get('answer_reserve', 1024), window // 4)
+        fixed = sum(counter.count_message(message.content) for message in fixed_messages)
+        available = max(0, window - reserve - fixed)
+
+        if history_costs is None or len(history_costs) != len(history):
+            history_costs = [counter.count_message(message.content) for message in history]
+        history_need = sum(history_costs)
+        document_need = counter.count(document)
+
+        if history_need + document_need <= available:
+            history_budget, document_budget = history_need, document_need
+        else:
+            # 两者都放不下时历史至少可用 history_share，文档较短时历史可使用剩余部分
+            share = config.get('history_share', 0.3)
+            history_budget = min(history_need, max(int(available * share), available - document_need))
+            document_budget = available - history_budget
+
+        kept_history, history_tokens = self._trim_history(history, history_costs, history_budget)
+        kept_document, document_tokens = self._truncate_document(counter, document, document_need,
+                                                                 document_budget, separator)
+        report = {
+            "counter": counter.name,
+            "window": window,
+            "answer_reserve": reserve,
+            "fixed": fixed,
+            "history": {
+                "tokens": history_tokens,
+                "turns": len(kept_history),
+                "dropped": len(history) - len(kept_history),
+            },
+            "document": {
+                "tokens": document_tokens,
+                "original": document_need,
+                "truncated": len(kept_document) < len(document),
+            },
+        }
+        return kept_history, kept_document, report
+
+    @staticmethod
+    def _trim_history(history: List[ChatMessage], costs: List[int], budget: int) -> Tuple[List[ChatMessage], int]:
+        """从最早的轮次开始丢弃，直到落在预算内"""
+        total, start = sum(costs), 0
+        while start < len(history) and total > budget:
+            total -= costs[start]
+            start += 1
+        return history[start:], total
+
+    @staticmethod
+    def _truncate_document(counter: TokenCounter, document: str, need: int, budget: int,
+                           separator: str) -> Tuple[str, int]:
+        """按分隔符逐块保留，直到预算用完"""
+        if need <= budget:
+            return document, need
+        pieces, total = [], 0
+        for piece in document.split(separator):
+            cost = counter.count(piece) + 1
+            if total + cost > budget:
+                if not pieces and budget > 0:
+                    # 首个块已超出预算时按比例截取，避免上下文为空
+                    piece = piece[:int(len(piece) * budget / cost)]
+                    pieces.append(piece)
+                    total = counter.count(piece)
+                break
+            pieces.append(piece)
+            total += cost
+        return separator.join(pieces), total
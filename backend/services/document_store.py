@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config.settings import get_settings
+
+settings = get_settings()
+
+
+def _pages_size(pages: List[str]) -> int:
+    """按 UTF-8 字节数估算文档大小"""
+    return sum(len(page.encode('utf-8')) for page in pages)
+
+
+class DocumentStore:
+    """
+    文档存储接口。
+    元数据与文本分开读取：`get_meta` 不加载文本，`get_text`/`get_pages` 仅在需要时读取。
+    """
+
+    def put(self, name: str, pages: List[str], file_path: str, **meta) -> Dict[str, Any]:
+        """保存文档，返回元数据"""
+        raise NotImplementedError()
+
+    def get_meta(self, name: str) -> Optional[Dict[str, Any]]:
+        """获取文档元数据（不含文本）"""
+        raise NotImplementedError()
+
+    def get_pages(self, name: str) -> Optional[List[str]]:
+        """获取文档分页文本"""
+        raise NotImplementedError()
+
+    def get_page_range(self, name: str, start: int, end: int) -> List[Tuple[int, str]]:
+        """读取 [start, end] 范围内的 (页码, 文本)，页码从 1 开始"""
+        pages = self.get_pages(name) or []
+        return [(page_no, pages[page_no - 1]) for page_no in range(max(1, start), min(end, len(pages)) + 1)]
+
+    def delete(self, name: str):
+        """删除文档"""
+        raise NotImplementedError()
+
+    def exists(self, name: str) -> bool:
+        """文档是否存在"""
+        return self.get_meta(name) is not None
+
+    def get_text(self, name: str) -> Optional[str]:
+        """获取文档全文"""
+        pages = self.get_pages(name)
+        if pages is None:
+            return None
+        return "\n".join(pages).strip()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """获取包含全文的完整文档记录"""
+        meta = self.get_meta(name)
+        if meta is None:
+            return None
+        pages = self.get_pages(name) or []
+        return {**meta, 'text': "\n".join(pages).strip(), 'pages': pages}
+
+    @staticmethod
+    def _build_meta(name: str, pages: List[str], file_path: str, **meta) -> Dict[str, Any]:
+        return {
+            **meta,
+            'filename': name,
+            'file_path': file_path,
+            'page_count': len(pages),
+            'size': _pages_size(pages),
+            'timestamp': str(datetime.now())
+        }
+
+
+class MemoryDocumentStore(DocumentStore):
+    """进程内 LRU 文档存储，超过容量时淘汰最久未访问的文档"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, name: str, pages: List[str], file_path: str, **meta) -> Dict[str, Any]:
+        meta = self._build_meta(name, pages, file_path, **meta)
+        with self._lock:
+            self._pop(name)
+            self._entries[name] = {'meta': meta, 'pages': list(pages)}
+            self._size += meta['size']
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._pop(next(iter(self._entries)))
+        return meta
+
+    def get_meta(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            self._entries.move_to_end(name)
+            return dict(entry['meta'])
+
+    def get_pages(self, name: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            self._entries.move_to_end(name)
+            return list(entry['pages'])
+
+    def get_page_range(self, name: str, start: int, end: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return []
+            self._entries.move_to_end(name)
+            pages = entry['pages']
+            return [(page_no, pages[page_no - 1]) for page_no in range(max(1, start), min(end, len(pages)) + 1)]
+
+    def delete(self, name: str):
+        with self._lock:
+            self._pop(name)
+
+    def _pop(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._size -= entry['meta']['size']
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """
+    基于 SQLite 的本地磁盘文档存储，可被同一主机上的多个 worker 共享。
+    使用 WAL 模式支持并发读，开启 mmap 读取；超过容量时淘汰最久未访问的文档。
+    """
+
+    def __init__(self, path: str, max_bytes: int, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    name TEXT PRIMARY KEY,
+                    meta TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    name TEXT NOT NULL,
+                    page_no INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (name, page_no)
+                );
+                CREATE INDEX IF NOT EXISTS idx_documents_access ON documents (last_access);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程复用一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def put(self, name: str, pages: List[str], file_path: str, **meta) -> Dict[str, Any]:
+        meta = self._build_meta(name, pages, file_path, **meta)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM pages WHERE name = ?", (name,))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (name, meta, size, last_access) VALUES (?, ?, ?, ?)",
+                (name, json.dumps(meta, ensure_ascii=False), meta['size'], time.time())
+            )
+            conn.executemany(
+                "INSERT INTO pages (name, page_no, text) VALUES (?, ?, ?)",
+                [(name, page_no, text) for page_no, text in enumerate(pages, start=1)]
+            )
+            self._evict(conn, keep=name)
+        return meta
+
+    def get_meta(self, name: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT meta, last_access FROM documents WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        # 降低写入频率：访问时间超过一分钟才更新
+        now = time.time()
+        if now - row[1] > 60:
+            with conn:
+                conn.execute("UPDATE documents SET last_access = ? WHERE name = ?", (now, name))
+        return json.loads(row[0])
+
+    def get_pages(self, name: str) -> Optional[List[str]]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT text FROM pages WHERE name = ? ORDER BY page_no", (name,)
+        ).fetchall()
+        if not rows and not self.exists(name):
+            return None
+        return [row[0] for row in rows]
+
+    def get_page_range(self, name: str, start: int, end: int) -> List[Tuple[int, str]]:
+        return self._connect().execute(
+            "SELECT page_no, text FROM pages WHERE name = ? AND page_no BETWEEN ? AND ? ORDER BY page_no",
+            (name, start, end)
+        ).fetchall()
+
+    def exists(self, name: str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM documents WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def delete(self, name: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM pages WHERE name = ?", (name,))
+            conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+
+    def _evict(self, conn: sqlite3.Connection, keep: str):
+        """淘汰最久未访问的文档，直到总大小不超过上限"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT name, size FROM documents WHERE name != ? ORDER BY last_access", (keep,)
+        ).fetchall()
+        for name, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE name = ?", (name,))
+            conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+            total -= size
+
+
+@lru_cache()
+def get_document_store() -> DocumentStore:
+    """根据配置获取文档存储单例"""
+    if settings.DOCUMENT_STORE_BACKEND == "memory":
+        return MemoryDocumentStore(settings.DOCUMENT_STORE_MAX_BYTES)
+    return SQLiteDocumentStore(settings.DOCUMENT_STORE_PATH, settings.DOCUMENT_STORE_MAX_BYTES)
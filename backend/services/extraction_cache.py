@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import List, Optional
+from backend.config.settings import get_settings
+
+settings = get_settings()
+
+
+class ExtractionCache:
+    """
+    以文件内容 SHA-256 为键的 PDF 文本提取缓存。
+    每个条目保存为一个 JSON 文件，重启后仍然有效，多个 worker 可共享同一目录。
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}.json")
+
+    def get(self, sha256: str) -> Optional[List[str]]:
+        """获取缓存的分页文本，未命中返回 None"""
+        try:
+            with open(self._path(sha256), 'r', encoding='utf-8') as f:
+                return json.load(f)['pages']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, sha256: str, pages: List[str]):
+        """写入缓存（先写临时文件再原子替换，避免读到半个文件）"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'pages': pages}, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(sha256))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+
+@lru_cache()
+def get_extraction_cache() -> ExtractionCache:
+    """获取提取缓存单例"""
+    return ExtractionCache(settings.EXTRACTION_CACHE_DIR)
@@ -1,56 +1,224 @@
+import asyncio
+import hashlib
 import os
-from typing import Optional
+import tempfile
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
 import PyPDF2
-from fastapi import UploadFile
+from fastapi import Request
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
 from backend.config.settings import get_settings
+from backend.services.extraction_cache import get_extraction_cache
+from backend.utils.metrics import metrics_registry
+from backend.utils.pdf_extractor import ExtractionResult, PdfExtractionPool
 
 settings = get_settings()
 
+
+@lru_cache()
+def get_extraction_pool() -> PdfExtractionPool:
+    """获取PDF提取进程池单例"""
+    pool = PdfExtractionPool(settings.PDF_EXTRACT_WORKERS, settings.PDF_EXTRACT_PAGES_PER_TASK)
+    metrics_registry.register("pdf_extraction", pool.stats)
+    return pool
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+
+class InvalidUploadError(Exception):
+    """上传请求格式错误或文件类型不受支持"""
+
+
+class UploadResult:
+    """流式上传结果"""
+
+    def __init__(self, filename: str, file_path: str, sha256: str, size: int):
+        self.filename = filename
+        self.file_path = file_path
+        self.sha256 = sha256
+        self.size = size
+
+
+class _MultipartEvents:
+    """收集 multipart 解析回调产生的事件，供异步循环逐个处理"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, Any]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        if filename is not None:
+            filename = filename.decode("utf-8", errors="replace")
+        self.events.append(("begin", (name, filename)))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.events.append(("data", data[start:end]))
+
+    def on_part_end(self):
+        self.events.append(("end", None))
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+
+def _write_chunk(f: BinaryIO, hasher, data: bytes):
+    hasher.update(data)
+    f.write(data)
+
+
+def _open_temp_file(directory: str) -> Tuple[BinaryIO, str]:
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    return os.fdopen(fd, "wb"), temp_path
+
+
+def _discard_temp_file(f: BinaryIO, temp_path: str):
+    f.close()
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+
+
 class FileService:
     """文件服务"""
     
     @staticmethod
-    async def save_upload_file(file: UploadFile) -> str:
-        """保存上传的文件"""
-        # 确保上传目录存在
+    async def receive_upload(request: Request, field_name: str = "file", suffix: str = ".pdf") -> UploadResult:
+        """
+        流式接收 multipart 上传：按块写入磁盘并同时计算 SHA-256，文件 I/O 在线程池中执行。
+        超过 MAX_UPLOAD_SIZE 时立即中止，不等待请求体传输完成。
+        """
+        max_size = settings.MAX_UPLOAD_SIZE
+        # multipart 边界与头部的额外开销
+        max_body = max_size + 64 * 1024
+
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body:
+            raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+
+        _, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise InvalidUploadError("Missing boundary in multipart request")
+
         os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-        
-        # 生成文件路径
-        file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-        
-        # 保存文件
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
-            
-        return file_path
-    
+        collector = _MultipartEvents()
+        parser = MultipartParser(boundary, collector.callbacks())
+        hasher = hashlib.sha256()
+        buffer = bytearray()
+        f, temp_path = None, None
+        filename, size, body_size, receiving, finished = None, 0, 0, False, False
+
+        try:
+            async for chunk in request.stream():
+                body_size += len(chunk)
+                if body_size > max_body:
+                    raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                parser.write(chunk)
+
+                for kind, payload in collector.events:
+                    if kind == "begin":
+                        name, part_filename = payload
+                        receiving = name == field_name and part_filename is not None and not finished
+                        if receiving:
+                            filename = os.path.basename(part_filename)
+                            if not filename.lower().endswith(suffix):
+                                raise InvalidUploadError("Only PDF files are supported")
+                            f, temp_path = await asyncio.to_thread(_open_temp_file, settings.UPLOAD_DIR)
+                    elif kind == "data" and receiving:
+                        size += len(payload)
+                        if size > max_size:
+                            raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                        buffer.extend(payload)
+                        if len(buffer) >= settings.UPLOAD_CHUNK_SIZE:
+                            await asyncio.to_thread(_write_chunk, f, hasher, bytes(buffer))
+                            buffer.clear()
+                    elif kind == "end" and receiving:
+                        if buffer:
+                            await asyncio.to_thread(_write_chunk, f, hasher, bytes(buffer))
+                            buffer.clear()
+                        await asyncio.to_thread(f.close)
+                        receiving, finished = False, True
+                collector.events.clear()
+
+            parser.finalize()
+            if not finished:
+                raise InvalidUploadError(f"Missing file field '{field_name}'")
+
+            file_path = os.path.join(settings.UPLOAD_DIR, filename)
+            await asyncio.to_thread(os.replace, temp_path, file_path)
+            return UploadResult(filename, file_path, hasher.hexdigest(), size)
+        except BaseException:
+            if f is not None:
+                await asyncio.to_thread(_discard_temp_file, f, temp_path)
+            raise
+
     @staticmethod
-    async def extract_pdf_text(file: UploadFile) -> Optional[str]:
-        """从PDF文件中提取文本"""
+    def extract_pdf_pages(file_path: str) -> Optional[List[str]]:
+        """从PDF文件中按页串行提取文本"""
         try:
-            content = await file.read()
-            
-            # 创建临时文件
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            # 从临时文件读取PDF
-            pdf_reader = PyPDF2.PdfReader(temp_file_path)
-            
-            # 提取所有页面的文本
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-                
-            # 删除临时文件
-            os.unlink(temp_file_path)
-                
-            return text.strip()
+            pdf_reader = PyPDF2.PdfReader(file_path)
+            return [page.extract_text() or "" for page in pdf_reader.pages]
         except Exception as e:
             print(f"Error extracting PDF text: {str(e)}")
             return None
-        finally:
-            await file.seek(0)  # 重置文件指针
+
+    @staticmethod
+    async def extract_pdf_pages_cached(
+        file_path: str,
+        sha256: str,
+        on_progress: Optional[Callable[[int, int], Any]] = None
+    ) -> Tuple[Optional[ExtractionResult], bool]:
+        """
+        按内容哈希查询提取缓存，未命中时在进程池中并行解析PDF并写入缓存。
+
+        :return: (提取结果, 是否命中缓存)，解析失败时提取结果为 None
+        """
+        cache = get_extraction_cache()
+        pages = await asyncio.to_thread(cache.get, sha256)
+        if pages is not None:
+            if on_progress:
+                on_progress(len(pages), len(pages))
+            return ExtractionResult(pages), True
+
+        try:
+            result = await get_extraction_pool().extract(file_path, on_progress)
+        except Exception as e:
+            print(f"Error extracting PDF text: {str(e)}")
+            return None, False
+        await asyncio.to_thread(cache.put, sha256, result.pages)
+        return result, False
+
+    @staticmethod
+    def join_pages(pages: List[str]) -> str:
+        """将分页文本合并为全文"""
+        return "\n".join(pages).strip()
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from backend.config.settings import get_settings
+from backend.services.document_store import get_document_store
+from backend.services.file_service import FileService, UploadResult
+from backend.services.retrieval_service import get_retrieval_service
+from backend.utils.metrics import metrics_registry
+from backend.utils.pdf_extractor import compute_page_offsets
+from backend.utils.text_processor import TextProcessor
+
+settings = get_settings()
+
+
+class IngestJob:
+    """文档入库任务"""
+
+    def __init__(self, upload: UploadResult):
+        self.job_id = uuid.uuid4().hex
+        self.document_id = upload.sha256
+        self.filename = upload.filename
+        self.file_path = upload.file_path
+        self.size = upload.size
+        self.state = "queued"  # queued / extracting / cleaning / indexing / done / failed
+        self.cached = False
+        self.pages_total = 0
+        self.pages_extracted = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.pages: List[str] = []
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "state": self.state,
+            "cached": self.cached,
+            "pages_total": self.pages_total,
+            "pages_extracted": self.pages_extracted,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class IngestService:
+    """
+    后台文档入库服务。
+    提取、清洗、分块建索引三个阶段各自拥有队列和 worker，不同文档可在不同阶段并行推进。
+    任务状态在阶段切换时写入 INGEST_JOB_DIR，其他 worker 也能查询进度。
+    """
+
+    def __init__(self, job_dir: str, workers_per_stage: int = 2, max_jobs: int = 1000):
+        self.job_dir = job_dir
+        self.workers_per_stage = workers_per_stage
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._stages: List[tuple] = [
+            ("extracting", self._extract),
+            ("cleaning", self._clean),
+            ("indexing", self._index),
+        ]
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        os.makedirs(job_dir, exist_ok=True)
+
+    def _ensure_started(self):
+        """首次提交任务时在当前事件循环中启动各阶段 worker"""
+        if self._workers:
+            return
+        self._queues = [asyncio.Queue() for _ in self._stages]
+        for stage_index in range(len(self._stages)):
+            for _ in range(self.workers_per_stage):
+                self._workers.append(asyncio.create_task(self._worker(stage_index)))
+
+    def submit(self, upload: UploadResult) -> IngestJob:
+        """提交入库任务，立即返回"""
+        self._ensure_started()
+        job = IngestJob(upload)
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            _, expired = self._jobs.popitem(last=False)
+            if os.path.exists(self._job_path(expired.job_id)):
+                os.unlink(self._job_path(expired.job_id))
+        self._persist(job)
+        self._queues[0].put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务进度：优先读取本进程任务，其次读取持久化状态"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    async def wait_for_document(self, filename: str, timeout: float) -> bool:
+        """等待本进程内该文件名最新的入库任务完成，返回是否等到了完成"""
+        jobs = [job for job in self._jobs.values() if job.filename == filename]
+        if not jobs or jobs[-1].finished:
+            return False
+        try:
+            await asyncio.wait_for(jobs[-1].done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _worker(self, stage_index: int):
+        state, handler = self._stages[stage_index]
+        queue = self._queues[stage_index]
+        while True:
+            job = await queue.get()
+            try:
+                self._set_state(job, state)
+                await handler(job)
+                if stage_index + 1 < len(self._stages):
+                    self._queues[stage_index + 1].put_nowait(job)
+                else:
+                    self._finish(job, "done")
+            except Exception as e:
+                print(f"Error ingesting {job.filename}: {str(e)}")
+                job.error = str(e)
+                self._finish(job, "failed")
+            finally:
+                queue.task_done()
+
+    async def _extract(self, job: IngestJob):
+        def on_progress(done: int, total: int):
+            job.pages_extracted, job.pages_total = done, total
+            job.updated_at = time.time()
+
+        result, job.cached = await FileService.extract_pdf_pages_cached(
+            job.file_path, job.document_id, on_progress
+        )
+        if result is None or not FileService.join_pages(result.pages):
+            raise ValueError("Failed to extract text from PDF")
+        job.pages = result.pages
+
+    async def _clean(self, job: IngestJob):
+        job.pages = await asyncio.to_thread(lambda: [TextProcessor.normalize_text(page) for page in job.pages])
+
+    async def _index(self, job: IngestJob):
+        meta = await asyncio.to_thread(
+            get_document_store().put,
+            job.filename, job.pages, job.file_path,
+            sha256=job.document_id, page_offsets=compute_page_offsets(job.pages)
+        )
+
+        def on_progress(done: int, total: int):
+            job.chunks_embedded, job.chunks_total = done, total
+            job.updated_at = time.time()
+
+        job.chunks_total = await get_retrieval_service().index_document(
+            job.filename, job.pages, meta['timestamp'], on_progress
+        )
+
+    def _set_state(self, job: IngestJob, state: str):
+        job.state = state
+        job.updated_at = time.time()
+        self._persist(job)
+
+    def _finish(self, job: IngestJob, state: str):
+        job.pages = []
+        self._set_state(job, state)
+        job.done.set()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{os.path.basename(job_id)}.json")
+
+    def _persist(self, job: IngestJob):
+        fd, temp_path = tempfile.mkstemp(dir=self.job_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, self._job_path(job.job_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """入库流水线指标"""
+        states: Dict[str, int] = {}
+        for job in self._jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "jobs": states,
+            "queue_depths": {
+                state: queue.qsize() for (state, _), queue in zip(self._stages, self._queues)
+            },
+        }
+
+    async def shutdown(self):
+        """停止各阶段 worker"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+@lru_cache()
+def get_ingest_service() -> IngestService:
+    """获取入库服务单例"""
+    service = IngestService(settings.INGEST_JOB_DIR, settings.INGEST_WORKERS_PER_STAGE)
+    metrics_registry.register("ingest", service.stats)
+    return service
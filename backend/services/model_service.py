@@ -1,8 +1,8 @@
-import yaml
-import os
 from typing import List
 from backend.schemas.model import ModelInfo
+from backend.config.registry import get_config_registry
 from backend.config.settings import get_settings
+from backend.models.ollama_manager import get_ollama_manager
 
 settings = get_settings()
 
@@ -10,18 +10,20 @@ class ModelService:
     """模型服务"""
     
     def __init__(self):
-        """初始化模型服务"""
-        config_path = os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml")
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        """初始化模型服务：使用配置注册表中的当前快照，不再逐请求读取 config.yaml"""
+        self.config = get_config_registry().snapshot().models
     
-    def get_models(self) -> List[ModelInfo]:
-        """获取所有可用模型"""
+    async def get_models(self) -> List[ModelInfo]:
+        """获取所有可用模型；Ollama 模型取自本机已安装的模型"""
         models = []
+        ollama = get_ollama_manager()
         
         # 遍历所有厂商和其模型
         for manufacturer, config in self.config['models'].items():
-            for model_name in config.get('models', []):
+            model_names = config.get('models', [])
+            if manufacturer == 'ollama':
+                model_names = await ollama.list_models()
+            for model_name in model_names:
                 is_default = (
                     manufacturer == settings.DEFAULT_MODEL_MANUFACTURER and
                     model_name == settings.DEFAULT_MODEL_NAME
@@ -33,8 +35,19 @@ class ModelService:
                     name=model_name,
                     manufacturer=manufacturer,
                     description=description,
-                    default=is_default
+                    default=is_default,
+                    loaded=ollama.is_resident(model_name) if manufacturer == 'ollama' else None
                 ))
+
+        # 路由别名：按后备链请求，首个 token 超时时对冲到下一个上游
+        for alias, route in self.config.get('routes', {}).items():
+            chain = " → ".join(f"{target['manufacturer']}/{target['model']}" for target in route['chain'])
+            models.append(ModelInfo(
+                name=alias,
+                manufacturer="route",
+                description=f"路由 {alias}：{chain}",
+                default=False
+            ))
         
         return models
     
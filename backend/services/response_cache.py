@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional
+from backend.config.settings import get_settings
+from backend.models.chat import ChatMessage
+from backend.utils.metrics import metrics_registry
+
+settings = get_settings()
+
+
+class CachedResponse:
+    """一次完整的流式响应：各数据块及其相对首块的到达时间（秒）"""
+
+    __slots__ = ("chunks", "offsets", "created_at", "size")
+
+    def __init__(self, chunks: List[str], offsets: List[float], created_at: Optional[float] = None):
+        self.chunks = chunks
+        self.offsets = offsets
+        self.created_at = created_at or time.time()
+        self.size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"chunks": self.chunks, "offsets": self.offsets, "created_at": self.created_at}
+
+
+class ResponseRecorder:
+    """在转发上游流的同时记录数据块与到达时间"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.offsets: List[float] = []
+        self._began: Optional[float] = None
+
+    def record(self, chunk: str):
+        now = time.perf_counter()
+        if self._began is None:
+            self._began = now
+        self.chunks.append(chunk)
+        self.offsets.append(round(now - self._began, 4))
+
+
+class ResponseCache:
+    """
+    精确匹配的响应缓存，键为 (厂商, 模型, 渲染后的消息) 的规范化哈希。
+    内存层按 LRU + TTL 淘汰并受条目数与字节预算限制；可选磁盘层在内存淘汰或重启后继续命中。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(manufacturer: str, model_name: str, messages: List[ChatMessage]) -> str:
+        """生成规范化缓存键"""
+        payload = json.dumps(
+            {
+                "manufacturer": manufacturer.lower(),
+                "model": model_name,
+                "messages": [message.model_dump() for message in messages],
+            },
+            sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _expired(self, entry: CachedResponse) -> bool:
+        return self.ttl > 0 and time.time() - entry.created_at > self.ttl
+
+    async def lookup(self, key: str) -> Optional[CachedResponse]:
+        """查找缓存：先查内存，再查磁盘（命中后提升到内存）"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not self._expired(entry):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._remove(key)
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._insert(key, entry)
+                self._hits += 1
+                self._disk_hits += 1
+                return entry
+
+        self._misses += 1
+        return None
+
+    async def store(self, key: str, chunks: List[str], offsets: List[float]):
+        """写入一次完整响应"""
+        entry = CachedResponse(chunks, offsets)
+        if not chunks or entry.size > self.max_bytes:
+            return
+        self._insert(key, entry)
+        self._stores += 1
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, entry)
+            except OSError as e:
+                print(f"Error writing response cache: {str(e)}")
+
+    @staticmethod
+    async def replay(entry: CachedResponse, timing: bool = False) -> AsyncGenerator[str, None]:
+        """回放缓存的响应；timing 为 True 时按原始到达间隔输出"""
+        began = time.perf_counter()
+        for chunk, offset in zip(entry.chunks, entry.offsets):
+            if timing:
+                delay = offset - (time.perf_counter() - began)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield chunk
+
+    def _insert(self, key: str, entry: CachedResponse):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entry = CachedResponse(data['chunks'], data['offsets'], data['created_at'])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        if self._expired(entry):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: CachedResponse):
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry.to_dict(), f, ensure_ascii=False)
+            os.replace(temp_path, self._disk_path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存指标"""
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "stores": self._stores,
+            "evictions": self._evictions,
+        }
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    """获取响应缓存单例"""
+    cache = ResponseCache(
+        settings.RESPONSE_CACHE_MAX_ENTRIES,
+        settings.RESPONSE_CACHE_MAX_BYTES,
+        settings.RESPONSE_CACHE_TTL,
+        settings.RESPONSE_CACHE_DIR
+    )
+    metrics_registry.register("response_cache", cache.stats)
+    return cache
@@ -0,0 +1,152 @@
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from backend.config.settings import get_settings
+from backend.models.chat_models import ModelConfig
+from backend.utils.embedding import HashingEmbedder, OllamaEmbedder
+from backend.utils.faiss_utils import FaissUtils
+from backend.utils.text_processor import TextProcessor
+
+settings = get_settings()
+
+
+class DocumentIndex:
+    """单个文档的分块向量索引"""
+
+    def __init__(self, chunks: List[Tuple[int, str]], faiss_utils: Optional[FaissUtils], version: Optional[str] = None):
+        self.chunks = chunks  # [(页码, 文本块)]，按文档顺序排列
+        self.faiss_utils = faiss_utils
+        self.version = version
+
+
+class RetrievalService:
+    """
+    文档检索服务：分块、向量化并按查询返回最相关的文本块。
+    内存中最多保留 max_indexes 个文档索引（LRU），被淘汰的文档下次检索时从文档存储重建。
+    """
+
+    EMBED_BATCH_SIZE = 64
+
+    def __init__(self, max_indexes: int = 32):
+        self.max_indexes = max(1, max_indexes)
+        if settings.EMBEDDING_BACKEND == "ollama":
+            base_url = ModelConfig.get_model_config('ollama')['api_url']
+            self.embedder = OllamaEmbedder(base_url, settings.EMBEDDING_MODEL)
+        else:
+            self.embedder = HashingEmbedder(settings.EMBEDDING_DIM)
+        self._indexes: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        # 正在建立索引的文档 -> (锁, 使用者数)，没有使用者时移除
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @staticmethod
+    def chunk_pages(pages: List[str], max_length: int) -> List[Tuple[int, str]]:
+        """按页分块，返回 (页码, 文本块) 列表，页码从 1 开始"""
+        chunks = []
+        for page_no, page_text in enumerate(pages, start=1):
+            for chunk in TextProcessor.split_text(page_text, max_length):
+                chunks.append((page_no, chunk))
+        return chunks
+
+    def has_index(self, doc_id: str, version: Optional[str] = None) -> bool:
+        """文档是否已建立索引；指定 version 时要求索引版本一致"""
+        index = self._indexes.get(doc_id)
+        if index is None:
+            return False
+        self._indexes.move_to_end(doc_id)
+        return version is None or index.version == version
+
+    def drop_index(self, doc_id: str):
+        """删除文档索引"""
+        self._indexes.pop(doc_id, None)
+
+    async def index_document(
+        self,
+        doc_id: str,
+        pages: List[str],
+        version: Optional[str] = None,
+        on_progress: Optional[Callable[[int, int], Any]] = None
+    ) -> int:
+        """
+        为文档建立索引，返回文本块数量。
+
+        :param on_progress: 进度回调 (已向量化块数, 总块数)
+        """
+        lock, users = self._locks.get(doc_id, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[doc_id] = (lock, users + 1)
+        try:
+            async with lock:
+                return await self._build_index(doc_id, pages, version, on_progress)
+        finally:
+            lock, users = self._locks[doc_id]
+            if users > 1:
+                self._locks[doc_id] = (lock, users - 1)
+            else:
+                del self._locks[doc_id]
+
+    async def _build_index(
+        self,
+        doc_id: str,
+        pages: List[str],
+        version: Optional[str],
+        on_progress: Optional[Callable[[int, int], Any]]
+    ) -> int:
+        chunks = await asyncio.to_thread(self.chunk_pages, pages, settings.RETRIEVAL_CHUNK_SIZE)
+        faiss_utils = None
+        texts = [chunk for _, chunk in chunks]
+        for start in range(0, len(texts), self.EMBED_BATCH_SIZE):
+            batch = texts[start:start + self.EMBED_BATCH_SIZE]
+            if isinstance(self.embedder, HashingEmbedder):
+                vectors = await asyncio.to_thread(self.embedder.embed_sync, batch)
+            else:
+                vectors = await self.embedder.embed(batch)
+            if faiss_utils is None:
+                faiss_utils = FaissUtils(vectors.shape[1])
+            faiss_utils.add_vectors_with_texts(vectors, list(range(start, start + len(batch))))
+            if on_progress:
+                on_progress(start + len(batch), len(texts))
+        self._indexes[doc_id] = DocumentIndex(chunks, faiss_utils, version)
+        self._indexes.move_to_end(doc_id)
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return len(chunks)
+
+    async def retrieve(
+        self,
+        doc_id: str,
+        query: str,
+        top_k: Optional[int] = None,
+        page_ranges: Optional[List[Tuple[int, int]]] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        检索与查询最相关的文本块，按文档顺序返回 (页码, 文本块)。
+
+        :param page_ranges: 仅在这些页码闭区间内检索
+        """
+        index = self._indexes.get(doc_id)
+        if not index or not index.faiss_utils:
+            return []
+        self._indexes.move_to_end(doc_id)
+
+        ids = None
+        if page_ranges is not None:
+            ids = [
+                position for position, (page_no, _) in enumerate(index.chunks)
+                if any(start <= page_no <= end for start, end in page_ranges)
+            ]
+        vector = await self.embedder.embed([query])
+        hits = index.faiss_utils.search_texts(vector, top_k or settings.RETRIEVAL_TOP_K, ids)
+        positions = sorted(position for _, _, position in hits)
+        return [index.chunks[position] for position in positions]
+
+    @staticmethod
+    def format_chunks(chunks: List[Tuple[int, str]]) -> str:
+        """将检索结果格式化为带页码标记的上下文文本"""
+        return "\n\n".join(f"[第{page_no}页] {chunk}" for page_no, chunk in chunks)
+
+
+@lru_cache()
+def get_retrieval_service() -> RetrievalService:
+    """获取检索服务单例"""
+    return RetrievalService(settings.RETRIEVAL_MAX_INDEXES)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from backend.config.settings import get_settings
+from backend.services.response_cache import CachedResponse
+from backend.services.retrieval_service import get_retrieval_service
+from backend.utils.faiss_utils import FaissUtils
+from backend.utils.metrics import metrics_registry
+
+settings = get_settings()
+
+
+class SemanticCache:
+    """
+    语义近似查询缓存：相同文档、相同模型下，问题措辞不同但语义相近时复用已有回答。
+    每个作用域（文档指纹 + 模型 + 提示词类型等）拥有独立的 FaissUtils 索引，
+    查询向量与缓存向量的余弦相似度不低于 threshold 时命中。
+    条目全局按 LRU + TTL 淘汰，淘汰时同步移除 FAISS 向量与 text_map 中的查询文本。
+    """
+
+    def __init__(self, embedder, threshold: float, max_entries: int, ttl: float):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes: Dict[str, FaissUtils] = {}
+        # 条目 id -> (作用域, 响应)，按访问顺序排列
+        self._entries: "OrderedDict[int, Tuple[str, CachedResponse]]" = OrderedDict()
+        self._next_id = 0
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_scope(document_fingerprint: str, manufacturer: str, model_name: str, **options: Any) -> str:
+        """作用域键：文档指纹、模型以及会影响回答的其他请求参数"""
+        payload = json.dumps(
+            [document_fingerprint, manufacturer.lower(), model_name, options],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def embed(self, query: str) -> np.ndarray:
+        """计算查询向量（L2 归一化，距离可直接换算为余弦相似度）"""
+        vector = np.asarray(await self.embedder.embed([query]), dtype='float32')
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope: str, vector: np.ndarray) -> Optional[Tuple[CachedResponse, float, str]]:
+        """返回 (响应, 相似度, 命中的原始问题)；未命中返回 None"""
+        index = self._indexes.get(scope)
+        if index is not None:
+            for entry_id, distance, query in index.search_texts(vector, 1):
+                similarity = 1.0 - distance / 2
+                _, response = self._entries[entry_id]
+                if self.ttl > 0 and time.time() - response.created_at > self.ttl:
+                    self._remove(entry_id)
+                    break
+                if similarity >= self.threshold:
+                    self._entries.move_to_end(entry_id)
+                    self._hits += 1
+                    return response, similarity, query
+        self._misses += 1
+        return None
+
+    def store(self, scope: str, query: str, vector: np.ndarray, response: CachedResponse):
+        """写入缓存"""
+        index = self._indexes.get(scope)
+        if index is None:
+            index = self._indexes[scope] = FaissUtils(vector.shape[1], with_ids=True)
+        entry_id = self._next_id
+        self._next_id += 1
+        index.add_with_ids(vector, [entry_id], [query])
+        self._entries[entry_id] = (scope, response)
+        self._stores += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _remove(self, entry_id: int):
+        scope, _ = self._entries.pop(entry_id)
+        index = self._indexes[scope]
+        index.remove_ids([entry_id])
+        if index.index.ntotal == 0:
+            del self._indexes[scope]
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存指标"""
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "scopes": len(self._indexes),
+            "threshold": self.threshold,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "stores": self._stores,
+            "evictions": self._evictions,
+        }
+
+
+@lru_cache()
+def get_semantic_cache() -> SemanticCache:
+    """获取语义缓存单例（与文档检索共用向量化后端）"""
+    cache = SemanticCache(
+        get_retrieval_service().embedder,
+        settings.SEMANTIC_CACHE_THRESHOLD,
+        settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        settings.RESPONSE_CACHE_TTL
+    )
+    metrics_registry.register("semantic_cache", cache.stats)
+    return cache
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config.settings import get_settings
+from backend.models.chat import ChatMessage
+from backend.utils.metrics import metrics_registry
+from backend.utils.token_counter import TokenCounter
+
+settings = get_settings()
+
+_SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class Session:
+    """
+    一个会话的已加载轮次，以及与轮次一一对应的缓存：
+    各计数器的每条消息 token 数与每条消息渲染到提示词中的文本，新轮次只需计算一次。
+    """
+
+    __slots__ = ("session_id", "turns", "updated_at", "lock", "log_state", "costs", "rendered")
+
+    def __init__(self, session_id: str, turns: List[ChatMessage], updated_at: Optional[float] = None,
+                 log_state: Optional[Tuple[int, int]] = None):
+        self.session_id = session_id
+        self.turns = turns
+        self.updated_at = updated_at or time.time()
+        self.lock = asyncio.Lock()
+        self.log_state = log_state  # 与内存一致的日志 (字节数, mtime_ns)，日志不存在时为 None
+        self.costs: Dict[str, List[int]] = {}
+        self.rendered: List[str] = []
+
+    def trim(self, max_turns: int):
+        dropped = len(self.turns) - max_turns
+        if dropped > 0:
+            del self.turns[:dropped]
+            del self.rendered[:dropped]
+            for costs in self.costs.values():
+                del costs[:dropped]
+
+    def context(self, counter: Optional[TokenCounter]) -> Tuple[List[ChatMessage], Optional[List[int]], List[str]]:
+        """(轮次, 每条消息的 token 数, 每条消息的渲染文本)，只为新增轮次计算"""
+        self.rendered.extend(str(message) for message in self.turns[len(self.rendered):])
+        costs = None
+        if counter is not None:
+            costs = self.costs.setdefault(counter.name, [])
+            costs.extend(counter.count_message(message.content) for message in self.turns[len(costs):])
+            costs = list(costs)
+        return list(self.turns), costs, list(self.rendered)
+
+
+class SessionStore:
+    """
+    服务端会话存储：客户端只发送本轮消息，历史由服务端按会话 ID 拼接。
+    每个会话一个只追加的 JSON Lines 日志（每行一条消息），最近使用的会话常驻内存（LRU 热层），
+    热层淘汰或重启后从日志重新加载，内存中只保留最近 max_turns 条消息。
+    多个 worker 共用日志目录时，使用热层条目前先比对日志的大小与修改时间，
+    其他 worker 追加或删除过的会话会从日志重新加载。
+    """
+
+    def __init__(self, log_dir: str, max_hot: int = 1000, max_turns: int = 200):
+        self.log_dir = log_dir
+        self.max_hot = max_hot
+        self.max_turns = max_turns
+        self._hot: "OrderedDict[str, Session]" = OrderedDict()
+        self._hits = 0
+        self._loads = 0
+        self._appends = 0
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def validate_id(session_id: str):
+        """会话 ID 同时用作日志文件名，只允许字母、数字、下划线与连字符"""
+        if not _SESSION_ID_RE.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id}")
+
+    async def get_history(self, session_id: str) -> List[ChatMessage]:
+        """会话历史；会话不存在时返回空列表（首次使用即创建）"""
+        session = await self._get(session_id)
+        return list(session.turns)
+
+    async def get_context(
+        self,
+        session_id: str,
+        counter: Optional[TokenCounter] = None
+    ) -> Tuple[List[ChatMessage], Optional[List[int]], List[str]]:
+        """会话历史及其缓存的每条消息 token 数（counter 为 None 时不计数）与渲染文本"""
+        session = await self._get(session_id)
+        return session.context(counter)
+
+    async def append(self, session_id: str, messages: List[ChatMessage]):
+        """追加一轮对话：先写日志，再更新热层"""
+        session = await self._get(session_id)
+        lines = "".join(
+            json.dumps({**message.model_dump(), "ts": time.time()}, ensure_ascii=False) + "\n"
+            for message in messages
+        )
+        async with session.lock:
+            before, after = await asyncio.to_thread(self._write_log, session_id, lines)
+            session.turns.extend(messages)
+            session.trim(self.max_turns)
+            session.updated_at = time.time()
+            # 写入前日志大小与内存不一致说明其他 worker 也写过，下次使用时重新加载
+            expected = session.log_state[0] if session.log_state else 0
+            session.log_state = after if before == expected else (-1, 0)
+        self._appends += 1
+
+    async def exists(self, session_id: str) -> bool:
+        self.validate_id(session_id)
+        return await asyncio.to_thread(os.path.exists, self._log_path(session_id))
+
+    async def delete(self, session_id: str) -> bool:
+        """删除会话及其日志，返回会话是否存在"""
+        self.validate_id(session_id)
+        existed = self._hot.pop(session_id, None) is not None
+        try:
+            await asyncio.to_thread(os.unlink, self._log_path(session_id))
+            existed = True
+        except FileNotFoundError:
+            pass
+        return existed
+
+    async def _get(self, session_id: str) -> Session:
+        self.validate_id(session_id)
+        log_state = await asyncio.to_thread(self._log_state, session_id)
+        session = self._hot.get(session_id)
+        if session is not None and session.log_state == log_state:
+            self._hot.move_to_end(session_id)
+            self._hits += 1
+            return session
+
+        turns, updated_at, log_state = await asyncio.to_thread(self._read_log, session_id)
+        current = self._hot.get(session_id)
+        if current is not None and current.log_state == log_state:
+            # 读取日志期间其他请求已经加载了同一版本
+            session = current
+        else:
+            session = self._hot[session_id] = Session(session_id, turns, updated_at, log_state)
+            self._loads += 1
+            while len(self._hot) > self.max_hot:
+                self._hot.popitem(last=False)
+        self._hot.move_to_end(session_id)
+        return session
+
+    def _log_state(self, session_id: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._log_path(session_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _log_path(self, session_id: str) -> str:
+        return os.path.join(self.log_dir, f"{session_id}.jsonl")
+
+    def _read_log(self, session_id: str):
+        """读取日志中最近 max_turns 条消息；不完整的末行（写入中断）被忽略"""
+        turns: List[ChatMessage] = []
+        updated_at = None
+        log_state = None
+        try:
+            with open(self._log_path(session_id), 'r', encoding='utf-8') as f:
+                stat = os.fstat(f.fileno())
+                log_state = (stat.st_size, stat.st_mtime_ns)
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        updated_at = record.pop("ts", updated_at)
+                        turns.append(ChatMessage(**record))
+                    except (json.JSONDecodeError, TypeError, ValueError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return turns[-self.max_turns:], updated_at, log_state
+
+    def _write_log(self, session_id: str, lines: str) -> Tuple[int, Tuple[int, int]]:
+        """追加写入，返回 (写入前的字节数, 写入后的 (字节数, mtime_ns))"""
+        with open(self._log_path(session_id), 'a', encoding='utf-8') as f:
+            before = os.fstat(f.fileno()).st_size
+            f.write(lines)
+            f.flush()
+            stat = os.fstat(f.fileno())
+        return before, (stat.st_size, stat.st_mtime_ns)
+
+    def stats(self) -> Dict[str, Any]:
+        """会话存储指标"""
+        return {
+            "hot_sessions": len(self._hot),
+            "hot_turns": sum(len(session.turns) for session in self._hot.values()),
+            "hot_hits": self._hits,
+            "log_loads": self._loads,
+            "appends": self._appends,
+        }
+
+
+@lru_cache()
+def get_session_store() -> SessionStore:
+    """获取会话存储单例"""
+    store = SessionStore(
+        settings.SESSION_LOG_DIR,
+        settings.SESSION_HOT_MAX,
+        settings.SESSION_MAX_TURNS
+    )
+    metrics_registry.register("sessions", store.stats)
+    return store
@@ -0,0 +1,123 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+from backend.utils.metrics import metrics_registry
+
+
+class Flight:
+    """
+    一次正在进行的上游流。
+    上游数据块追加到共享历史中，每个订阅者维护自己的读取位置，
+    生产者只追加并唤醒，从不等待任何订阅者，慢速或已断开的订阅者不会拖慢其他人。
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        # 替换事件而不是 clear，已唤醒的订阅者不会错过后续通知
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def read(self) -> AsyncGenerator[str, None]:
+        """从头读取本次上游流（中途加入的订阅者先补齐已产生的内容）"""
+        cursor = 0
+        while True:
+            changed = self._changed
+            if cursor < len(self.chunks):
+                chunk = self.chunks[cursor]
+                cursor += 1
+                yield chunk
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    相同请求的并发合并：键相同的请求共享同一个上游流，结果分发给所有订阅者。
+    上游流结束（或所有订阅者都已断开）后移除，之后的相同请求重新发起。
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._started = 0
+        self._joined = 0
+        self._cancelled = 0
+        self._max_subscribers = 0
+
+    async def run(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """订阅键为 key 的上游流，不存在时调用 factory 发起"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight(key)
+            flight.task = asyncio.create_task(self._produce(flight, factory))
+            self._started += 1
+        else:
+            self._joined += 1
+
+        flight.subscribers += 1
+        self._max_subscribers = max(self._max_subscribers, flight.subscribers)
+        try:
+            async for chunk in flight.read():
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 所有订阅者都已断开，取消上游请求
+                flight.task.cancel()
+                self._cancelled += 1
+                self._discard(flight)
+
+    async def _produce(self, flight: Flight, factory: Callable[[], AsyncIterator[str]]):
+        try:
+            async for chunk in factory():
+                flight.publish(chunk)
+            flight.finish()
+        except asyncio.CancelledError:
+            flight.finish(asyncio.CancelledError())
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            self._discard(flight)
+
+    def _discard(self, flight: Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def stats(self) -> Dict[str, Any]:
+        """并发合并指标"""
+        return {
+            "in_flight": len(self._flights),
+            "subscribers": sum(flight.subscribers for flight in self._flights.values()),
+            "flights_started": self._started,
+            "requests_joined": self._joined,
+            "flights_cancelled": self._cancelled,
+            "max_subscribers": self._max_subscribers,
+        }
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    """获取并发合并单例"""
+    single_flight = SingleFlight()
+    metrics_registry.register("single_flight", single_flight.stats)
+    return single_flight
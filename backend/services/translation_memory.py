@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from backend.config.settings import get_settings
+from backend.utils.metrics import metrics_registry
+
+settings = get_settings()
+
+# MinHash 使用的梅森素数，(a * x + b) 在 uint64 内不会溢出
+_MERSENNE_PRIME = (1 << 31) - 1
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+
+
+def normalize_segment(text: str) -> str:
+    """精确匹配键：NFKC 归一化（全角/半角统一）并合并空白"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def shingles(text: str) -> Set[str]:
+    """
+    字符 n-gram 集合，无需分词即可用于中日韩文本：
+    以中日韩字符为主的文本取 2-gram，其余取 3-gram；比较时忽略大小写与空白。
+    """
+    text = re.sub(r'\s+', ' ', normalize_segment(text).lower())
+    n = 2 if len(_CJK_RE.findall(text)) * 3 >= len(text) else 3
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TranslationMemory:
+    """
+    翻译记忆库：按 (目标语言, 规范化原文片段) 保存既有译文。
+    精确命中直接复用译文，不调用模型；未精确命中时通过 MinHash + LSH 分桶查找相似片段，
+    其译文作为参考提供给提示词。条目追加写入 JSON Lines 文件，启动时重放恢复，后写覆盖先写。
+    """
+
+    def __init__(self, path: str, num_perm: int = 96, bands: int = 32,
+                 threshold: float = 0.5, max_references: int = 2):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_references = max_references
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        # (目标语言, 规范化原文) -> 条目 id
+        self._keys: Dict[Tuple[str, str], int] = {}
+        # 条目 id -> (原文, 译文, 签名)
+        self._entries: List[Tuple[str, str, np.ndarray]] = []
+        # (目标语言, 分带序号, 分带哈希) -> 条目 id 集合
+        self._buckets: Dict[Tuple[str, int, bytes], Set[int]] = defaultdict(set)
+        self._documents: Dict[str, Dict[str, int]] = {}
+        self._exact_hits = 0
+        self._fuzzy_hits = 0
+        self._misses = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _language(target_language: str) -> str:
+        return target_language.strip().lower()
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash 签名：num_perm 个哈希函数在 n-gram 集合上的最小值"""
+        grams = shingles(text)
+        if not grams:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        # crc32 在进程间稳定（内置 hash() 每次启动随机化），签名可跨重启比较
+        values = np.fromiter(
+            (zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams)
+        ) % np.uint64(_MERSENNE_PRIME)
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return hashed.min(axis=1)
+
+    def _bands(self, language: str, signature: np.ndarray) -> Iterable[Tuple[str, int, bytes]]:
+        for band in range(self.bands):
+            yield language, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _insert(self, language: str, source: str, target: str):
+        """写入内存索引；同一原文再次写入时替换旧译文"""
+        key = (language, normalize_segment(source))
+        signature = self.signature(source)
+        with self._lock:
+            entry_id = self._keys.get(key)
+            if entry_id is not None:
+                _, _, old = self._entries[entry_id]
+                self._entries[entry_id] = (source, target, old)
+                return
+            entry_id = len(self._entries)
+            self._entries.append((source, target, signature))
+            self._keys[key] = entry_id
+            for bucket in self._bands(language, signature):
+                self._buckets[bucket].add(entry_id)
+
+    def lookup(self, source: str, target_language: str) -> Optional[str]:
+        """精确命中返回既有译文"""
+        with self._lock:
+            entry_id = self._keys.get((self._language(target_language), normalize_segment(source)))
+            return None if entry_id is None else self._entries[entry_id][1]
+
+    def similar(self, source: str, target_language: str,
+                limit: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """相似片段：返回按估计 Jaccard 相似度降序的 (原文, 译文, 相似度)，不低于 threshold"""
+        language = self._language(target_language)
+        signature = self.signature(source)
+        normalized = normalize_segment(source)
+        with self._lock:
+            candidates: Set[int] = set()
+            for bucket in self._bands(language, signature):
+                candidates.update(self._buckets.get(bucket, ()))
+            matches = []
+            for entry_id in candidates:
+                other_source, target, other = self._entries[entry_id]
+                if normalize_segment(other_source) == normalized:
+                    continue
+                score = float(np.mean(signature == other))
+                if score >= self.threshold:
+                    matches.append((other_source, target, score))
+        matches.sort(key=lambda match: match[2], reverse=True)
+        return matches[:self.max_references if limit is None else limit]
+
+    def add(self, source: str, target_language: str, target: str, origin: Optional[str] = None):
+        """保存一条译文"""
+        self.add_many([(source, target)], target_language, origin)
+
+    def add_many(self, pairs: Iterable[Tuple[str, str]], target_language: str,
+                 origin: Optional[str] = None) -> int:
+        """批量导入 (原文, 译文)，一次追加写入；返回写入条数"""
+        language = self._language(target_language)
+        lines = []
+        for source, target in pairs:
+            if not normalize_segment(source) or not target.strip():
+                continue
+            self._insert(language, source, target)
+            lines.append(json.dumps(
+                {"source": source, "target_language": language, "target": target, "origin": origin},
+                ensure_ascii=False
+            ) + "\n")
+        if lines:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+        return len(lines)
+
+    def _load(self):
+        """重放记忆库文件（忽略写入中断的末行）"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._insert(record["target_language"], record["source"], record["target"])
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def record(self, document: str, outcome: str):
+        """记录一次查询结果：exact / fuzzy / miss，按文档统计命中率"""
+        counts = self._documents.setdefault(document, {"exact": 0, "fuzzy": 0, "miss": 0})
+        counts[outcome] += 1
+        if outcome == "exact":
+            self._exact_hits += 1
+        elif outcome == "fuzzy":
+            self._fuzzy_hits += 1
+        else:
+            self._misses += 1
+
+    @staticmethod
+    def _rates(exact: int, fuzzy: int, miss: int) -> Dict[str, Any]:
+        total = exact + fuzzy + miss
+        return {
+            "exact": exact,
+            "fuzzy": fuzzy,
+            "miss": miss,
+            "exact_rate": round(exact / total, 4) if total else 0.0,
+            "fuzzy_rate": round(fuzzy / total, 4) if total else 0.0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """翻译记忆库指标"""
+        return {
+            "entries": len(self._entries),
+            "languages": sorted({language for language, _ in self._keys}),
+            **self._rates(self._exact_hits, self._fuzzy_hits, self._misses),
+            "documents": {
+                document: self._rates(counts["exact"], counts["fuzzy"], counts["miss"])
+                for document, counts in self._documents.items()
+            },
+        }
+
+
+@lru_cache()
+def get_translation_memory() -> TranslationMemory:
+    """获取翻译记忆库单例"""
+    memory = TranslationMemory(
+        settings.TRANSLATION_MEMORY_PATH,
+        threshold=settings.TRANSLATION_MEMORY_FUZZY_THRESHOLD,
+        max_references=settings.TRANSLATION_MEMORY_REFERENCES
+    )
+    metrics_registry.register("translation_memory", memory.stats)
+    return memory
@@ -0,0 +1,520 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from backend.config.settings import get_settings
+from backend.models.CausalPromptFactory import CausalPromptFactory
+from backend.models.chat import ModelChoice, TranslationRequest
+from backend.models.model_registry import get_model_registry
+from backend.models.model_router import ROUTE_MANUFACTURER, get_model_router
+from backend.services.document_store import get_document_store
+from backend.services.ingest_service import get_ingest_service
+from backend.services.translation_memory import get_translation_memory
+from backend.utils.metrics import metrics_registry
+from backend.utils.page_range import parse_page_range
+from backend.utils.scheduler import QueueTicket
+from backend.utils.text_processor import TextProcessor
+
+settings = get_settings()
+
+# 仍需继续执行的任务状态（进程重启后自动恢复）
+ACTIVE_STATES = ("queued", "translating")
+
+
+class TranslationJob:
+    """整篇文档翻译任务"""
+
+    def __init__(
+        self,
+        filename: str,
+        target_language: str,
+        model_choice: ModelChoice,
+        pages: Optional[str] = None,
+        workers: int = 4,
+        job_id: Optional[str] = None
+    ):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.target_language = target_language
+        self.model_choice = model_choice
+        self.pages = pages
+        self.workers = workers
+        self.state = "queued"  # queued / translating / done / failed
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.segments: List[Tuple[str, str]] = []  # (原文片段, 其后的分隔符)
+        self.results: Dict[int, str] = {}
+        self.prefix_done = 0  # 已按顺序完成的片段数
+        self.memory_hits = {"exact": 0, "fuzzy": 0, "miss": 0}  # 翻译记忆库查询结果
+        self.task: Optional[asyncio.Task] = None
+        self.lease: Optional[str] = None  # 本进程持有的租约文件
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def complete(self, index: int, text: str):
+        self.results[index] = text
+        while self.prefix_done in self.results:
+            self.prefix_done += 1
+        self.updated_at = time.time()
+        self.notify()
+
+    def notify(self):
+        # 替换事件而不是 clear，已唤醒的读取方不会错过后续通知
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "target_language": self.target_language,
+            "model_choice": self.model_choice.model_dump(),
+            "pages": self.pages,
+            "workers": self.workers,
+            "state": self.state,
+            "segments_total": len(self.segments),
+            "segments_done": len(self.results),
+            "prefix_done": self.prefix_done,
+            "memory_hits": dict(self.memory_hits),
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TranslationJob":
+        job = cls(
+            data["filename"], data["target_language"], ModelChoice(**data["model_choice"]),
+            data.get("pages"), data.get("workers", 4), data["job_id"]
+        )
+        job.state = data["state"]
+        job.error = data.get("error")
+        job.memory_hits.update(data.get("memory_hits", {}))
+        job.created_at = data["created_at"]
+        job.updated_at = data["updated_at"]
+        return job
+
+
+class TranslationService:
+    """
+    整篇文档翻译。
+    文本按段落 / 句子边界切分为片段，由 workers 个协程并发翻译（经由厂商调度器，以 batch 优先级排队），
+    已完成的有序前缀可立即流式输出。每个完成的片段追加写入 parts 日志，
+    进程崩溃或重启后从日志恢复，只翻译尚未完成的片段；全部完成后写出译文文件。
+    启用翻译记忆库时，精确命中的段落直接复用既有译文，相似片段的译文作为参考写入提示词。
+    多个 worker 共用任务目录时，执行任务前须取得租约（<任务>.lease.<代数> 文件，独占创建），
+    执行期间定期续约；持有者崩溃、租约过期后，其他 worker 创建下一代租约接管，同一代只有一个 worker 能创建成功。
+    """
+
+    def __init__(self, job_dir: str, workers: int = 4, segment_chars: int = 1500, retries: int = 2,
+                 lease_ttl: float = 60.0, max_jobs: int = 200):
+        self.job_dir = job_dir
+        self.workers = workers
+        self.segment_chars = segment_chars
+        self.retries = retries
+        self.lease_ttl = lease_ttl
+        self.max_jobs = max_jobs
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.prompt_factory = CausalPromptFactory()
+        self.models = get_model_registry()
+        self.router = get_model_router()
+        self.memory = get_translation_memory() if settings.TRANSLATION_MEMORY_ENABLED else None
+        self._jobs: "OrderedDict[str, TranslationJob]" = OrderedDict()
+        self._segments_translated = 0
+        self._segment_failures = 0
+        os.makedirs(job_dir, exist_ok=True)
+
+    async def submit(self, request: TranslationRequest) -> TranslationJob:
+        """创建翻译任务并在后台开始执行"""
+        documents = get_document_store()
+        await get_ingest_service().wait_for_document(request.filename, settings.INGEST_WAIT_TIMEOUT)
+        document = await asyncio.to_thread(documents.get_meta, request.filename)
+        if document is None:
+            raise FileNotFoundError(f"Document '{request.filename}' not found")
+        if request.pages:
+            pages = []
+            for start, end in parse_page_range(request.pages, document['page_count']):
+                rows = await asyncio.to_thread(documents.get_page_range, request.filename, start, end)
+                pages.extend(text for _, text in rows)
+            text = "\n".join(pages).strip()
+        else:
+            text = await asyncio.to_thread(documents.get_text, request.filename) or ""
+
+        job = TranslationJob(
+            request.filename, request.target_language, request.model_choice,
+            request.pages, request.workers or self.workers
+        )
+        job.segments = TextProcessor.split_segments(text, self.segment_chars)
+        await asyncio.to_thread(self._write_segments, job)
+        self._persist(job)
+        self._acquire_lease(job)
+        self._start(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[TranslationJob]:
+        """获取任务：优先本进程中的任务，其次从磁盘加载"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+            if job is not None:
+                self._remember_job(job)
+        else:
+            self._jobs.move_to_end(job_id)
+        return job
+
+    def resume(self, job_id: str) -> Optional[TranslationJob]:
+        """继续执行失败或中断的任务，已完成的片段不会重新翻译；任务由其他 worker 执行时不重复启动"""
+        job = self.get(job_id)
+        if job is not None and job.state != "done" and (job.task is None or job.task.done()):
+            if not self._acquire_lease(job):
+                return job
+            # 取得租约后重新加载，包含上一持有者已完成的片段
+            reloaded = self._load(job_id)
+            if reloaded is not None:
+                reloaded.lease, job = job.lease, reloaded
+            job.state, job.error = "queued", None
+            self._persist(job)
+            self._start(job)
+        return job
+
+    def resume_all(self):
+        """启动时恢复上次未完成的任务（已被其他 worker 租用的任务跳过）"""
+        for name in os.listdir(self.job_dir):
+            if not name.endswith(".json") or name.endswith(".segments.json"):
+                continue
+            job = self.get(name[:-len(".json")])
+            if job is not None and job.state in ACTIVE_STATES:
+                self.resume(job.job_id)
+
+    async def stream(self, job: TranslationJob) -> AsyncGenerator[str, None]:
+        """按原文顺序输出译文：每个片段在其之前的片段全部完成后立即输出"""
+        index = 0
+        while index < len(job.segments):
+            changed = job._changed
+            if index < job.prefix_done:
+                translated = job.results[index]
+                yield translated + job.segments[index][1]
+                index += 1
+                continue
+            if job.finished or job.task is None:
+                if job.state == "failed":
+                    yield f"\n翻译出错: {job.error}"
+                return
+            await changed.wait()
+
+    def output_path(self, job: TranslationJob) -> str:
+        return os.path.join(self.job_dir, f"{job.job_id}.txt")
+
+    def _start(self, job: TranslationJob):
+        job.task = asyncio.create_task(self._run(job))
+        self._remember_job(job)
+
+    def _remember_job(self, job: TranslationJob):
+        """登记任务；超出 max_jobs 时淘汰最早的空闲任务（执行中的任务保留，之后可从磁盘重新加载）"""
+        self._jobs[job.job_id] = job
+        self._jobs.move_to_end(job.job_id)
+        idle = [job_id for job_id, other in self._jobs.items()
+                if other is not job and (other.task is None or other.task.done())]
+        for job_id in idle[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _lease_generations(self, job_id: str) -> List[int]:
+        prefix = f"{os.path.basename(job_id)}.lease."
+        return sorted(int(name[len(prefix):]) for name in os.listdir(self.job_dir)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def _acquire_lease(self, job: TranslationJob) -> bool:
+        """
+        取得任务租约：没有租约时创建第 0 代；最新一代已过期时创建下一代接管。
+        O_EXCL 保证同一代只有一个 worker 创建成功；返回是否取得租约。
+        """
+        generations = self._lease_generations(job.job_id)
+        generation = 0
+        if generations:
+            latest = self._job_path(job.job_id, f".lease.{generations[-1]}")
+            try:
+                if time.time() - os.path.getmtime(latest) < self.lease_ttl:
+                    return False
+            except FileNotFoundError:
+                pass
+            generation = generations[-1] + 1
+        path = self._job_path(job.job_id, f".lease.{generation}")
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.owner)
+        for old in generations:
+            try:
+                os.unlink(self._job_path(job.job_id, f".lease.{old}"))
+            except FileNotFoundError:
+                pass
+        job.lease = path
+        return True
+
+    def _renew_lease(self, job: TranslationJob) -> bool:
+        """续约；租约文件已不存在或出现更新的一代（过期后被接管）时返回 False"""
+        try:
+            os.utime(job.lease)
+        except (FileNotFoundError, TypeError):
+            return False
+        latest = self._lease_generations(job.job_id)
+        return bool(latest) and job.lease == self._job_path(job.job_id, f".lease.{latest[-1]}")
+
+    def _release_lease(self, job: TranslationJob):
+        if job.lease is not None:
+            try:
+                os.unlink(job.lease)
+            except FileNotFoundError:
+                pass
+            job.lease = None
+
+    async def _keep_lease(self, job: TranslationJob):
+        """执行期间按 lease_ttl / 3 续约；租约被接管时停止本进程中的任务"""
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not await asyncio.to_thread(self._renew_lease, job):
+                print(f"Error translating {job.filename}: lease for job {job.job_id} was lost")
+                job.task.cancel()
+                return
+
+    async def _run(self, job: TranslationJob):
+        heartbeat = asyncio.create_task(self._keep_lease(job))
+        try:
+            await self._translate_job(job)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            await asyncio.to_thread(self._release_lease, job)
+            self._remember_job(job)
+
+    async def _translate_job(self, job: TranslationJob):
+        pending: asyncio.Queue = asyncio.Queue()
+        for index in range(len(job.segments)):
+            if index not in job.results:
+                pending.put_nowait(index)
+
+        job.state = "translating"
+        self._persist(job)
+        workers = [asyncio.create_task(self._worker(job, pending))
+                   for _ in range(max(1, min(job.workers, pending.qsize())))]
+        try:
+            await asyncio.gather(*workers)
+            output = "".join(job.results[index] + separator for index, (_, separator) in enumerate(job.segments))
+            await asyncio.to_thread(self._write_output, job, output)
+            job.state = "done"
+        except asyncio.CancelledError:
+            # 关闭时保持 translating 状态，下次启动继续
+            for worker in workers:
+                worker.cancel()
+            raise
+        except Exception as e:
+            print(f"Error translating {job.filename}: {str(e)}")
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            job.state, job.error = "failed", str(e)
+        job.updated_at = time.time()
+        self._persist(job)
+        job.notify()
+
+    async def _worker(self, job: TranslationJob, pending: asyncio.Queue):
+        while not pending.empty():
+            index = pending.get_nowait()
+            source = job.segments[index][0]
+            translated = await self._translate(job, source) if source.strip() else source
+            await asyncio.to_thread(self._append_part, job, index, translated)
+            job.complete(index, translated)
+            self._segments_translated += 1
+
+    @staticmethod
+    def _keep_whitespace(source: str, translated: str) -> str:
+        """保留原文片段首尾的空白，拼接后段落结构不变"""
+        core = source.strip()
+        start = source.index(core)
+        return source[:start] + translated.strip() + source[start + len(core):]
+
+    @staticmethod
+    def _format_references(references: List[Tuple[str, str, float]]) -> str:
+        if not references:
+            return ""
+        lines = ["以下是相似片段的既有译文，请在术语与句式上保持一致：", ""]
+        for source, target, _ in references:
+            lines.extend([f"原文：{source.strip()}", f"译文：{target.strip()}", ""])
+        return "\n".join(lines) + "\n"
+
+    def _recall(self, job: TranslationJob, paragraphs: List[str]) -> List[Optional[str]]:
+        """逐段落查询翻译记忆库的精确命中；空白段落原样保留"""
+        translations: List[Optional[str]] = []
+        for paragraph in paragraphs:
+            if not paragraph.strip():
+                translations.append(paragraph)
+                continue
+            translated = self.memory.lookup(paragraph, job.target_language) if self.memory else None
+            if translated is not None:
+                self._record_memory(job, "exact")
+            translations.append(translated)
+        return translations
+
+    def _references(self, job: TranslationJob, paragraphs: List[str]) -> str:
+        """未命中段落的相似片段，按相似度取前若干条作为提示词参考"""
+        if self.memory is None:
+            return ""
+        found: Dict[str, Tuple[str, str, float]] = {}
+        for paragraph in paragraphs:
+            matches = self.memory.similar(paragraph, job.target_language)
+            self._record_memory(job, "fuzzy" if matches else "miss")
+            for match in matches:
+                if match[0] not in found or found[match[0]][2] < match[2]:
+                    found[match[0]] = match
+        references = sorted(found.values(), key=lambda match: match[2], reverse=True)
+        return self._format_references(references[:self.memory.max_references])
+
+    def _record_memory(self, job: TranslationJob, outcome: str):
+        job.memory_hits[outcome] += 1
+        self.memory.record(job.filename, outcome)
+
+    async def _remember(self, job: TranslationJob, pairs: List[Tuple[str, str]]):
+        if self.memory is not None and pairs:
+            await asyncio.to_thread(self.memory.add_many, pairs, job.target_language, job.filename)
+
+    async def _translate(self, job: TranslationJob, source: str) -> str:
+        """
+        翻译单个片段。片段由若干段落组成，先逐段落查询翻译记忆库，只把未命中的段落发给模型：
+        多个段落按 "[编号] 段落" 发送并按编号拆回，译文逐段落写回记忆库；编号缺失的段落单独翻译。
+        """
+        core = source.strip()
+        if self.memory is None:
+            translated = await self._complete(job, {'prompt_type': 'translation', 'text': core})
+            return self._keep_whitespace(source, translated)
+        parts = re.split(r'(\n+)', core)
+        paragraphs, separators = parts[0::2], parts[1::2] + [""]
+        translations = self._recall(job, paragraphs)
+        pending = [index for index, translated in enumerate(translations) if translated is None]
+        if pending:
+            texts = [paragraphs[index] for index in pending]
+            references = self._references(job, texts)
+            if len(texts) == 1:
+                results: List[Optional[str]] = [await self._complete(job, {
+                    'prompt_type': 'translation', 'text': texts[0], 'references': references
+                })]
+            else:
+                results = TextProcessor.parse_numbered(await self._complete(job, {
+                    'prompt_type': 'batch_translation',
+                    'items': TextProcessor.number_lines(texts),
+                    'count': len(texts),
+                    'references': references,
+                }), len(texts))
+            for position, text in enumerate(texts):
+                if results[position] is None:
+                    results[position] = await self._complete(job, {'prompt_type': 'translation', 'text': text})
+            for index, result in zip(pending, results):
+                translations[index] = result
+            await self._remember(job, list(zip(texts, results)))
+        return self._keep_whitespace(source, "".join(map("".join, zip(translations, separators))))
+
+    async def _complete(self, job: TranslationJob, prompt: Dict[str, Any]) -> str:
+        """调用模型完成一次翻译提示词，失败时重试"""
+        messages = await self.prompt_factory.build_prompt({**prompt, 'target_language': job.target_language})
+        for attempt in range(self.retries + 1):
+            try:
+                model_choice = job.model_choice
+                if model_choice.manufacturer == ROUTE_MANUFACTURER:
+                    stream = self.router.stream(model_choice.model, messages, ticket=QueueTicket("batch"))
+                else:
+                    model = self.models.get(model_choice.manufacturer, model_choice.model)
+                    stream = model.stream_chat(messages, QueueTicket("batch"))
+                return "".join([chunk async for chunk in stream]).strip()
+            except Exception:
+                self._segment_failures += 1
+                if attempt == self.retries:
+                    raise
+
+    def _job_path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.job_dir, f"{os.path.basename(job_id)}{suffix}")
+
+    def _persist(self, job: TranslationJob):
+        fd, temp_path = tempfile.mkstemp(dir=self.job_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, self._job_path(job.job_id))
+
+    def _write_segments(self, job: TranslationJob):
+        with open(self._job_path(job.job_id, ".segments.json"), 'w', encoding='utf-8') as f:
+            json.dump(job.segments, f, ensure_ascii=False)
+
+    def _append_part(self, job: TranslationJob, index: int, text: str):
+        with open(self._job_path(job.job_id, ".parts.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"index": index, "text": text}, ensure_ascii=False) + "\n")
+
+    def _write_output(self, job: TranslationJob, output: str):
+        fd, temp_path = tempfile.mkstemp(dir=self.job_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(output)
+        os.replace(temp_path, self.output_path(job))
+
+    def _load(self, job_id: str) -> Optional[TranslationJob]:
+        """从磁盘恢复任务：元数据、片段与已完成的译文（忽略写入中断的末行）"""
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                job = TranslationJob.from_dict(json.load(f))
+            with open(self._job_path(job_id, ".segments.json"), 'r', encoding='utf-8') as f:
+                job.segments = [tuple(segment) for segment in json.load(f)]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        try:
+            with open(self._job_path(job_id, ".parts.jsonl"), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        part = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    job.complete(part["index"], part["text"])
+        except FileNotFoundError:
+            pass
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """翻译任务指标"""
+        states: Dict[str, int] = {}
+        for job in self._jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "jobs": states,
+            "segments_translated": self._segments_translated,
+            "segment_failures": self._segment_failures,
+        }
+
+    async def shutdown(self):
+        """停止执行中的任务（状态保留为 translating，下次启动时恢复）"""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@lru_cache()
+def get_translation_service() -> TranslationService:
+    """获取翻译服务单例"""
+    service = TranslationService(
+        settings.TRANSLATION_JOB_DIR,
+        settings.TRANSLATION_WORKERS,
+        settings.TRANSLATION_SEGMENT_CHARS,
+        settings.TRANSLATION_RETRIES,
+        settings.TRANSLATION_LEASE_TTL,
+        settings.TRANSLATION_MAX_JOBS
+    )
+    metrics_registry.register("translation", service.stats)
+    return service
@@ -0,0 +1,91 @@
+"""
+短文本微批量翻译基准：模拟阅读模式下多个客户端并发提交短句，
+对比逐条调用（窗口为 0、每批 1 条）与微批量打包的上游调用次数与总耗时。
+模拟模型最多 4 路并发（相当于厂商调度器的并发槽），每次调用有固定开销，
+并以一定概率漏掉批量结果的最后一条，以验证逐条回退。
+
+用法：python -m backend.test.bench_batch_translation [客户端数] [每客户端条数] [单次调用开销毫秒] [解析失败概率]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from backend.models.chat import ModelChoice
+from backend.services.batch_translation import BatchTranslator
+from backend.utils.text_processor import TextProcessor
+
+
+class FakeModel:
+    def __init__(self, overhead: float, broken: float):
+        self.overhead = overhead
+        self.broken = broken
+        self.calls = 0
+        self.slots = asyncio.Semaphore(4)
+
+    async def stream_chat(self, messages, ticket=None):
+        self.calls += 1
+        async with self.slots:
+            await asyncio.sleep(self.overhead)
+        prompt = messages[-1].content
+        if "[1] " not in prompt:
+            yield "译:" + prompt.rsplit("\n\n", 1)[1].strip()
+            return
+        lines = [line for line in prompt.splitlines() if line.startswith("[")]
+        if random.random() < self.broken:
+            lines = lines[:-1]  # 模型漏掉最后一条
+        for line in lines:
+            number, text = line.split("] ", 1)
+            yield f"{number}] 译:{text}\n"
+
+
+class FakeRegistry:
+    def __init__(self, model: FakeModel):
+        self.model = model
+
+    def get(self, manufacturer, model_name):
+        return self.model
+
+
+async def run(clients: int, per_client: int, overhead: float, broken: float, batched: bool):
+    model = FakeModel(overhead, broken)
+    translator = BatchTranslator(window=0.02 if batched else 0.0, max_items=20 if batched else 1)
+    translator.models = FakeRegistry(model)
+    translator.memory = None
+    choice = ModelChoice(manufacturer="fake", model="fake")
+
+    async def client(n: int):
+        segments = [f"Sentence {n}-{i} of the reader page." for i in range(per_client)]
+        results = {}
+        async for index, text, error in translator.translate(segments, "中文", choice):
+            results[index] = text
+        assert all(results[i] == "译:" + segments[i] for i in range(per_client)), "mismatched result"
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - began
+    stats = translator.stats()
+    label = "micro-batch" if batched else "per-segment"
+    print(f"{label:12s} upstream calls {model.calls:5d}  elapsed {elapsed * 1000:8.1f} ms  "
+          f"avg batch {stats['avg_batch_size']:5.2f}  parse failures {stats['parse_failures']}  "
+          f"fallback items {stats['fallback_items']}")
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    overhead = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    broken = float(sys.argv[4]) if len(sys.argv) > 4 else 0.1
+
+    assert TextProcessor.parse_numbered("[1] a\n[2] b\ncontinued", 2) == ["a", "b\ncontinued"]
+    assert TextProcessor.parse_numbered("[1] a\n[1] b", 2) == [None, None]
+    assert TextProcessor.parse_numbered("Sure:\n[1] a", 1) == [None]
+
+    print(f"{clients} clients x {per_client} segments, {overhead * 1000:.0f} ms per call, "
+          f"{broken:.0%} broken batches")
+    asyncio.run(run(clients, per_client, overhead, broken, batched=False))
+    asyncio.run(run(clients, per_client, overhead, broken, batched=True))
+
+
+if __name__ == '__main__':
+    main()
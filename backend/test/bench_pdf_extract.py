@@ -0,0 +1,72 @@
+"""
+PDF 文本提取基准：对比串行提取与进程池并行提取。
+
+用法：python -m backend.test.bench_pdf_extract [pdf路径] [进程数]
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from backend.services.file_service import FileService
+from backend.utils.pdf_extractor import PdfExtractionPool
+
+ROOT_RESOURCE = os.path.join(os.path.dirname(__file__), 'resource')
+
+
+def fresh_copies(path: str, count: int, directory: str):
+    """每轮使用新的文件副本，模拟每次上传都是新文档（避免子进程复用已解析的文档）"""
+    copies = []
+    for i in range(count):
+        target = os.path.join(directory, f"round_{i}.pdf")
+        shutil.copyfile(path, target)
+        copies.append(target)
+    return copies
+
+
+def bench_serial(paths):
+    timings = []
+    for path in paths:
+        began = time.perf_counter()
+        pages = FileService.extract_pdf_pages(path)
+        timings.append(time.perf_counter() - began)
+    return pages, timings
+
+
+async def bench_pool(warmup_path: str, paths, workers: int):
+    pool = PdfExtractionPool(workers)
+    try:
+        # 预热：启动子进程
+        await pool.extract(warmup_path)
+        timings = []
+        for path in paths:
+            began = time.perf_counter()
+            result = await pool.extract(path)
+            timings.append(time.perf_counter() - began)
+        return result.pages, timings, pool.stats()
+    finally:
+        pool.shutdown()
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT_RESOURCE, 'doc.pdf')
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(1, (os.cpu_count() or 2) - 1)
+    rounds = 3
+
+    with tempfile.TemporaryDirectory() as directory:
+        serial_pages, serial_timings = bench_serial(fresh_copies(path, rounds, directory))
+        copies = fresh_copies(path, rounds + 1, directory)
+        pool_pages, pool_timings, stats = asyncio.run(bench_pool(copies[0], copies[1:], workers))
+
+    assert serial_pages == pool_pages, "并行提取结果与串行提取不一致"
+    serial_best, pool_best = min(serial_timings), min(pool_timings)
+    print(f"pages: {len(serial_pages)}, workers: {workers}, cpus: {os.cpu_count()}")
+    print(f"serial: {serial_best * 1000:.1f} ms")
+    print(f"pool:   {pool_best * 1000:.1f} ms  (x{serial_best / pool_best:.2f})")
+    print(f"stats:  {stats}")
+
+
+if __name__ == '__main__':
+    main()
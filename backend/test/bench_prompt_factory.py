@@ -0,0 +1,83 @@
+"""
+提示词构建微基准：对比逐键 str.replace 的旧实现与预编译渲染计划。
+
+用法：python -m backend.test.bench_prompt_factory [循环次数]
+"""
+import asyncio
+import re
+import sys
+import time
+
+from backend.config.registry import get_config_registry
+from backend.models.CausalPromptFactory import CausalPromptFactory
+from backend.models.chat import ChatMessage
+
+CATEGORIES = ["prompts", "academic", "writer"]
+
+
+class LegacyPromptFactory(CausalPromptFactory):
+    """旧实现：每次调用重新提取占位符、逐键替换，并线性扫描角色配置"""
+
+    @staticmethod
+    def _legacy_role_name(node_name: str):
+        for value in get_config_registry().snapshot().roles['roles'].values():
+            if value["nodename"] == node_name:
+                return value["name"]
+        return None
+
+    async def build_prompt(self, params):
+        messages = []
+        prompt_type = params.get('prompt_type', 'prompts')
+        self.need_prefix = False
+        for node in self.config.get_prompt_nodes(prompt_type):
+            role = self._legacy_role_name(node) or "assistant"
+            if self._is_deepseek_model() and node == "system":
+                role = "user"
+            template = self.config.get_prompt(node, prompt_type)
+            if not template:
+                continue
+            keys = re.findall(r'\{(.*?)\}', template)
+            content = template
+            for key in keys:
+                value = params.get(key, "")
+                if isinstance(value, list):
+                    value = "\n".join(map(str, value))
+                content = content.replace(f"{{{key}}}", str(value))
+            messages.append(ChatMessage(role=role, content=content, prefix=False))
+        return self._enforce_message_order(messages)
+
+
+def make_params(prompt_type: str):
+    return {
+        'query': '请将这段文字翻译成英文',
+        'text': '人工智能正在改变我们的生活方式。' * 200,
+        'prompt_type': prompt_type,
+        'history': [ChatMessage(role='user', content='你好', prefix=False)] * 5,
+    }
+
+
+def bench(factory, params, loops: int) -> float:
+    async def run():
+        began = time.perf_counter()
+        for _ in range(loops):
+            await factory.build_prompt(params)
+        return time.perf_counter() - began
+    return asyncio.run(run())
+
+
+def main():
+    loops = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    legacy, compiled = LegacyPromptFactory("qwen2.5"), CausalPromptFactory("qwen2.5")
+    for category in CATEGORIES:
+        params = make_params(category)
+        legacy_messages = asyncio.run(legacy.build_prompt(params))
+        compiled_messages = asyncio.run(compiled.build_prompt(params))
+        assert legacy_messages == compiled_messages, f"{category}: 渲染结果不一致"
+
+        before = bench(legacy, params, loops) / loops * 1e6
+        after = bench(compiled, params, loops) / loops * 1e6
+        print(f"{category:10s} before: {before:7.2f} us/call  after: {after:7.2f} us/call  (x{before / after:.2f})")
+
+
+if __name__ == '__main__':
+    main()
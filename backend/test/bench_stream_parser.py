@@ -0,0 +1,91 @@
+"""
+流式响应解析微基准：对比逐行 json.loads 的旧实现与增量字节解析器，单位 tokens/s。
+
+用法：python -m backend.test.bench_stream_parser [token数] [分块字节数]
+"""
+import codecs
+import json
+import sys
+import time
+
+from backend.test.stream_samples import make_tokens, ndjson_stream, sse_stream
+from backend.utils import stream_parser
+from backend.utils.stream_parser import CONTENT, StreamParser
+
+
+def legacy_extract(chunk):
+    if "message" in chunk:
+        if "content" in chunk["message"]:
+            return chunk["message"]["content"]
+        elif "reasoning_content" in chunk["message"]:
+            return chunk["message"]["reasoning_content"]
+    elif "choices" in chunk:
+        delta = chunk["choices"][0].get("delta", {})
+        if "content" in delta:
+            return delta["content"]
+        elif "refusal" in delta:
+            return delta["refusal"]
+    return ""
+
+
+def legacy_parse(chunks):
+    """旧实现：按行增量解码为 str（同 aiter_lines），非 data: 行会被解析两次"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    out = []
+    buffer = ""
+    for data in chunks:
+        buffer += decoder.decode(data)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line = line.strip()
+            if line.startswith(": keep-alive") or not line:
+                continue
+            if not line.startswith("data: "):
+                out.append(legacy_extract(json.loads(line)))
+            try:
+                out.append(legacy_extract(json.loads(line[6:])))
+            except json.JSONDecodeError:
+                continue
+    return out
+
+
+def new_parse(chunks):
+    parser = StreamParser()
+    out = []
+    for data in chunks:
+        out.extend(event.text for event in parser.feed(data) if event.type == CONTENT)
+        if parser.finished:
+            break
+    out.extend(event.text for event in parser.close() if event.type == CONTENT)
+    return out
+
+
+def split(payload: bytes, size: int):
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+def rate(fn, chunks, tokens: int, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        began = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - began)
+    return tokens / best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    tokens = make_tokens(count)
+    print(f"decoder: {'orjson' if stream_parser.orjson else 'json'}, {count} tokens, {size} byte chunks")
+    # 旧实现遇到 choices 为空的 usage 块会抛出 IndexError，对照流中不包含 usage
+    for name, payload in (("sse", sse_stream(tokens, with_usage=False)), ("ndjson", ndjson_stream(tokens))):
+        chunks = split(payload, size)
+        assert "".join(new_parse(chunks)) == "".join(tokens)
+        before = rate(legacy_parse, chunks, count)
+        after = rate(new_parse, chunks, count)
+        print(f"{name:7s} before: {before:12,.0f} tok/s  after: {after:12,.0f} tok/s  (x{after / before:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+流式解析模糊测试：随机切分、CRLF、keep-alive 注释、截断与垃圾行下，
+解析结果必须与整段输入一致且不抛出异常。
+
+用法：python -m backend.test.fuzz_stream_parser [轮数] [随机种子]
+"""
+import random
+import sys
+
+from backend.test.stream_samples import make_tokens, ndjson_stream, sse_stream
+from backend.utils.stream_parser import CONTENT, FINISH, REASONING, USAGE, StreamParser
+
+
+def random_split(payload: bytes, rng: random.Random):
+    """随机切分字节流，包括 1 字节切片与多字节 UTF-8 字符中间的切点"""
+    chunks, position = [], 0
+    while position < len(payload):
+        size = rng.choice([1, 2, 3, rng.randint(1, 64), rng.randint(1, 4096)])
+        chunks.append(payload[position:position + size])
+        position += size
+    return chunks
+
+
+def mutate(payload: bytes, rng: random.Random, sse: bool) -> bytes:
+    """不改变语义的变换：CRLF 换行、插入 keep-alive 注释、[DONE] 之后追加垃圾数据"""
+    if rng.random() < 0.5:
+        payload = payload.replace(b"\n", b"\r\n")
+    if sse and rng.random() < 0.5:
+        lines = payload.split(b"\n\n")
+        for _ in range(rng.randint(1, 5)):
+            lines.insert(rng.randint(0, len(lines) - 1), b": keep-alive")
+        payload = b"\n\n".join(lines)
+    if payload.endswith(b"\n") and rng.random() < 0.3:
+        payload += b"data: {\"choices\":[{\"delta\":{\"content\":\"AFTER-DONE\"}}]}\n"
+    return payload
+
+
+def run(chunks):
+    parser = StreamParser()
+    events = []
+    for data in chunks:
+        events.extend(parser.feed(data))
+    events.extend(parser.close())
+    return events, parser
+
+
+def texts(events, kind):
+    return "".join(event.text for event in events if event.type == kind)
+
+
+def check_full(rng: random.Random):
+    tokens = make_tokens(rng.randint(0, 300))
+    sse = rng.random() < 0.5
+    reasoning = sse and rng.random() < 0.5
+    payload = sse_stream(tokens, with_reasoning=reasoning) if sse else ndjson_stream(tokens)
+    if not sse and rng.random() < 0.5:
+        payload = payload.rstrip(b"\n")  # 最后一行没有换行结尾
+    payload = mutate(payload, rng, sse)
+    expected, _ = run([payload])
+    events, parser = run(random_split(payload, rng))
+
+    assert events == expected, "切分后的事件序列与整段解析不一致"
+    assert parser.finished and parser.malformed == 0
+    want_content = "".join(t for i, t in enumerate(tokens) if not (reasoning and i % 4 == 0))
+    assert texts(events, CONTENT) == want_content
+    if reasoning:
+        assert texts(events, REASONING) == "".join(tokens[::4])
+    assert "AFTER-DONE" not in texts(events, CONTENT)
+    assert any(event.type == USAGE for event in events)
+    assert events[-1].type == FINISH
+
+
+def check_partial(rng: random.Random):
+    """截断的流与混入的垃圾行：不抛异常，已解析内容是完整内容的前缀"""
+    tokens = make_tokens(rng.randint(1, 100))
+    payload = sse_stream(tokens) if rng.random() < 0.5 else ndjson_stream(tokens)
+    full = texts(run([payload])[0], CONTENT)
+    truncated = payload[:rng.randint(0, len(payload))]
+    if rng.random() < 0.5:
+        garbage = bytes(rng.randint(0, 255) for _ in range(rng.randint(1, 40))).replace(b"\n", b"")
+        truncated += b"\n" + garbage + b"\n"
+    events, _ = run(random_split(truncated, rng))
+    assert full.startswith(texts(events, CONTENT))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+    for i in range(rounds):
+        try:
+            check_full(rng)
+            check_partial(rng)
+        except AssertionError as e:
+            print(f"round {i} (seed {seed}) failed: {e}")
+            raise
+    print(f"{rounds} rounds passed (seed {seed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+本地 Ollama 替身：实现 /api/tags、/api/ps、/api/generate（预加载 / 卸载）与 /api/chat（NDJSON 流），
+冷模型的首次请求会等待 load_delay 秒，用于在没有 Ollama 的环境中验证模型发现、预加载与驻留优先调度。
+
+用法：
+    python -m backend.test.ollama_stub serve [端口] [加载秒数]   # 仅启动替身服务
+    python -m backend.test.ollama_stub [加载秒数]                 # 启动替身并运行冷/热模型首 token 对比
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.models.ollama_manager import parse_keep_alive
+from backend.test.stream_samples import make_tokens
+
+INSTALLED = ["qwen2.5:7b", "qwen2.5:latest", "deepseek-r1:8b", "llama3.2:3b"]
+
+
+class OllamaStub:
+    """替身服务的模型状态：已安装模型与已加载模型（模型 -> 到期时间，None 为常驻）"""
+
+    def __init__(self, load_delay: float = 2.0, installed=None):
+        self.load_delay = load_delay
+        self.installed = list(installed or INSTALLED)
+        self.loaded = {}
+        self.loads = 0
+        self.lock = threading.Lock()
+
+    def ensure_loaded(self, model: str, keep_alive) -> bool:
+        """加载模型（冷模型等待 load_delay），返回是否发生了加载"""
+        with self.lock:
+            expires = self.loaded.get(model, 0)
+            cold = model not in self.loaded or (expires is not None and expires < time.time())
+        if cold:
+            time.sleep(self.load_delay)
+        seconds = parse_keep_alive(keep_alive)
+        with self.lock:
+            if cold:
+                self.loads += 1
+            if seconds == 0:
+                self.loaded.pop(model, None)
+            else:
+                self.loaded[model] = None if seconds is None else time.time() + seconds
+        return cold
+
+    def resident(self):
+        now = time.time()
+        with self.lock:
+            return [(model, expires) for model, expires in self.loaded.items() if expires is None or expires > now]
+
+
+def make_handler(stub: OllamaStub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json({"models": [{"name": name, "model": name} for name in stub.installed]})
+            elif self.path == "/api/ps":
+                far = datetime.now(timezone.utc) + timedelta(days=3650)
+                self._json({"models": [
+                    {"name": name, "model": name,
+                     "expires_at": (far if expires is None
+                                    else datetime.fromtimestamp(expires, timezone.utc)).isoformat()}
+                    for name, expires in stub.resident()
+                ]})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            request = self._read_json()
+            model = request.get("model")
+            if model not in stub.installed:
+                self._json({"error": f"model '{model}' not found"}, 404)
+                return
+            if self.path == "/api/generate":
+                stub.ensure_loaded(model, request.get("keep_alive"))
+                reason = "unload" if request.get("keep_alive") == 0 else "load"
+                self._json({"model": model, "response": "", "done": True, "done_reason": reason})
+            elif self.path == "/api/chat":
+                stub.ensure_loaded(model, request.get("keep_alive"))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                tokens = make_tokens(20)
+                for token in tokens:
+                    self._chunk({"model": model, "message": {"role": "assistant", "content": token}, "done": False})
+                self._chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                             "prompt_eval_count": 12, "eval_count": len(tokens)})
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def _chunk(self, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(port: int = 11435, load_delay: float = 2.0) -> ThreadingHTTPServer:
+    """在后台线程启动替身服务"""
+    stub = OllamaStub(load_delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    server.stub = stub
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def demo(load_delay: float):
+    from backend.models.chat import ChatMessage
+    from backend.models.chat_models import OllamaModel
+    from backend.models.ollama_manager import OllamaManager
+
+    server = serve(0, load_delay)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    manager = OllamaManager(base_url)
+    print("installed:", await manager.list_models())
+
+    await manager.preload("qwen2.5:7b")
+    print("resident after preload:", await manager.refresh_resident(force=True))
+
+    messages = [ChatMessage(role="user", content="hi", prefix=False)]
+    for model_name in ("qwen2.5:7b", "llama3.2:3b", "llama3.2:3b"):
+        model = OllamaModel(base_url, model_name)
+        began = time.perf_counter()
+        stream = model.stream_chat(messages)
+        await stream.__anext__()
+        first = time.perf_counter() - began
+        async for _ in stream:
+            pass
+        print(f"{model_name:12s} first token {first * 1000:7.1f} ms")
+    print("stub loads:", server.stub.loads)
+    server.shutdown()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 11435
+        load_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+        server = serve(port, load_delay)
+        print(f"Ollama stub listening on http://127.0.0.1:{port}/api (load delay {load_delay}s)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+    asyncio.run(demo(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0))
+
+
+if __name__ == '__main__':
+    main()
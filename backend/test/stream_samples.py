@@ -0,0 +1,37 @@
+"""流式解析基准与模糊测试共用的样本构造"""
+import json
+from typing import List
+
+
+def sse_stream(tokens: List[str], with_reasoning: bool = False, with_usage: bool = True) -> bytes:
+    """OpenAI / DeepSeek 风格的 SSE 字节流"""
+    lines = [b": keep-alive\n\n"]
+    for i, token in enumerate(tokens):
+        delta = {"content": token}
+        if with_reasoning and i % 4 == 0:
+            delta = {"content": None, "reasoning_content": token}
+        chunk = {"id": "chatcmpl-1", "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        lines.append(b"data: " + json.dumps(chunk, ensure_ascii=False).encode() + b"\n\n")
+    lines.append(b'data: {"choices":[{"index":0,"delta":{},"finish_reason":"stop"}]}\n\n')
+    if with_usage:
+        lines.append(b'data: {"choices":[],"usage":{"prompt_tokens":12,"completion_tokens":%d}}\n\n' % len(tokens))
+    lines.append(b"data: [DONE]\n\n")
+    return b"".join(lines)
+
+
+def ndjson_stream(tokens: List[str]) -> bytes:
+    """Ollama 风格的 NDJSON 字节流"""
+    lines = []
+    for token in tokens:
+        chunk = {"model": "qwen2.5", "message": {"role": "assistant", "content": token}, "done": False}
+        lines.append(json.dumps(chunk, ensure_ascii=False).encode() + b"\n")
+    done = {"model": "qwen2.5", "message": {"role": "assistant", "content": ""}, "done": True,
+            "done_reason": "stop", "prompt_eval_count": 12, "eval_count": len(tokens)}
+    lines.append(json.dumps(done).encode() + b"\n")
+    return b"".join(lines)
+
+
+def make_tokens(count: int) -> List[str]:
+    words = ["The", " quick", " 狐狸", " jumps", " over", " the", " lazy", " 狗", ".", "\n", " émoji 🚀"]
+    return [words[i % len(words)] for i in range(count)]
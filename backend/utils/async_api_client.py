@@ -1,129 +1,141 @@
 import json
+import time
+from email.utils import parsedate_to_datetime
 import httpx
-from typing import Dict, AsyncGenerator, Optional
+from typing import Any, Dict, AsyncGenerator, Optional
+from .connection_pool import get_connection_pools
+from .stream_parser import CONTENT, ERROR, StreamEvent, StreamParser
+
+
+class APIError(Exception):
+    """上游返回的错误，保留状态码与 Retry-After（秒）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @classmethod
+    async def from_response(cls, response: httpx.Response) -> "APIError":
+        error_msg = await response.aread()
+        return cls(f"API error: {error_msg}", response.status_code, _parse_retry_after(response))
+
+
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 头（秒数形式；HTTP 日期形式按到期时间换算）"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
 
 
 class AsyncAPIClient:
     """
     通用异步 API 客户端，封装 httpx.AsyncClient 提供 HTTP 请求能力。
     支持流式请求（streaming）和非流式请求，兼容 DeepSeek 和 OpenAI 的响应格式。
+    同一上游（scheme://host:port）且连接参数相同的客户端共享一个连接池，不同上游互不影响。
     """
 
-    _client: Optional[httpx.AsyncClient] = None  # 共享 HTTPX AsyncClient 连接池
-
-    def __init__(self, base_url: str, timeout: int = 30):
+    def __init__(self, base_url: str, timeout: int = 30, pool_options: Optional[Dict[str, Any]] = None):
         """
         初始化异步 API 客户端。
 
         :param base_url: API 根 URL
-        :param timeout: 请求超时时间（秒），默认 30 秒
+        :param timeout: 非流式请求超时时间（秒），默认 30 秒
+        :param pool_options: 该上游的连接池参数（见 config.yaml 的 connection 段）
         """
         self.base_url = base_url
         self.timeout = timeout
-
-        if not AsyncAPIClient._client:
-            AsyncAPIClient._client = self._create_client()
-        self.client = AsyncAPIClient._client
-
-    @classmethod
-    def _create_client(cls) -> httpx.AsyncClient:
-        """
-        创建全局 HTTPX AsyncClient 实例（使用 `AsyncHTTPTransport` 以支持异步请求）。
-
-        :return: httpx.AsyncClient 实例
-        """
-        transport = httpx.AsyncHTTPTransport(
-            limits=httpx.Limits(
-                max_keepalive_connections=10,
-                max_connections=100,
-            )
-        )
-        return httpx.AsyncClient(transport=transport, follow_redirects=True)
+        self.pool_options = pool_options or {}
+        self.pool = get_connection_pools().get_pool(base_url, self.pool_options, user=self)
+        self.client = self.pool.client
 
     async def close(self):
         """
-        关闭全局 HTTPX AsyncClient 实例，释放资源。
+        关闭全部上游连接池，释放资源。
         """
-        if AsyncAPIClient._client:
-            await AsyncAPIClient._client.aclose()
-            AsyncAPIClient._client = None
+        await AsyncAPIClient.close_shared()
 
-    async def async_request(self, method: str, endpoint: str, **kwargs) -> Dict:
+    @classmethod
+    async def close_shared(cls):
+        """关闭共享连接池（应用退出时调用）"""
+        await get_connection_pools().close()
+
+    def build_url(self, endpoint: str) -> str:
+        """拼接完整 URL；已是完整 URL 时原样返回"""
+        if endpoint.startswith(("http://", "https://")):
+            return endpoint
+        return f"{self.base_url}/{endpoint.strip('/')}"
+
+    async def async_request(self, method: str, endpoint: str, timeout: Optional[float] = None, **kwargs) -> Dict:
         """
         发送非流式请求，返回完整的 JSON 响应。
 
         :param method: HTTP 方法（如 "GET", "POST"）
         :param endpoint: API 端点路径
+        :param timeout: 本次请求的超时（秒），省略时使用客户端的 timeout
         :param kwargs: 其他请求参数（如 headers, json, params 等）
         :return: 解析后的 JSON 响应
         :raises Exception: 如果请求失败或响应状态码非 200
         """
-        url = f"{self.base_url}/{endpoint.strip('/')}"
+        url = self.build_url(endpoint)
         try:
             response = await self.client.request(
-                method, url, timeout=self.timeout, **kwargs
+                method, url, timeout=self.pool.request_timeout(timeout or self.timeout), **kwargs
             )
             response.raise_for_status()  # 如果状态码非 2xx，抛出异常
             return response.json()
         except httpx.HTTPStatusError as e:
-            error_msg = await e.response.aread()
-            raise Exception(f"API error: {error_msg}")
+            raise await APIError.from_response(e.response)
         except json.JSONDecodeError:
             raise Exception("Failed to decode JSON response")
 
-    async def async_stream_request(self, endpoint: str, **kwargs) -> AsyncGenerator[str, None]:
+    async def async_stream_events(self, endpoint: str, **kwargs) -> AsyncGenerator[StreamEvent, None]:
         """
-        发送流式请求（streaming），并逐步解析返回的 JSON 数据。
-        兼容 DeepSeek 和 OpenAI 的不同格式。
+        发送流式请求（streaming），按字节增量解析 SSE / NDJSON 分帧，逐个返回类型化事件
+        （content / reasoning / usage / finish / error）。
 
         :param endpoint: API 端点路径
         :param kwargs: 其他请求参数（如 headers, json, params 等）
-        :return: 异步生成器，逐步返回解析后的内容
-        :raises Exception: 如果请求失败或响应状态码非 200
+        :return: 异步生成器，逐步返回 StreamEvent
+        :raises Exception: 如果请求失败、响应状态码非 200 或流中返回错误
         """
-        url = f"{self.base_url}/{endpoint.strip('/')}"
+        url = self.build_url(endpoint)
+        parser = StreamParser()
 
-        async with self.client.stream("POST", url, timeout=self.timeout, **kwargs) as response:
+        # 流式请求使用池配置的分段超时：连接快速失败，读取按数据块间隔计时
+        async with self.client.stream("POST", url, timeout=self.pool.stream_timeout, **kwargs) as response:
             if response.status_code != 200:
-                error_msg = await response.aread()
-                raise Exception(f"API error: {error_msg}")
-
-            async for line in response.aiter_lines():
-                line = line.strip()
-                if line.startswith(": keep-alive"):
-                    continue
-                if not line:
-                    continue
-                if not line or not line.startswith("data: "):
-                    chunk = json.loads(line)  # 解析 JSON，去掉 "data: " 前缀
-                    yield self._extract_content(chunk)  # 提取内容
-
-                try:
-                    chunk = json.loads(line[6:])  # 解析 JSON，去掉 "data: " 前缀
-                    yield self._extract_content(chunk)  # 提取内容
-                except json.JSONDecodeError:
-                    continue  # 跳过解析失败的 JSON 数据
-
-    def _extract_content(self, chunk: Dict) -> str:
+                raise await APIError.from_response(response)
+
+            async for data in response.aiter_bytes():
+                for event in parser.feed(data):
+                    if event.type == ERROR:
+                        raise APIError(f"API error: {event.text}")
+                    yield event
+                if parser.finished:
+                    return  # 终止事件之后不再读取
+            for event in parser.close():
+                if event.type == ERROR:
+                    raise APIError(f"API error: {event.text}")
+                yield event
+
+    async def async_stream_request(self, endpoint: str, **kwargs) -> AsyncGenerator[str, None]:
         """
-        从 JSON 数据块中提取内容，兼容 DeepSeek 和 OpenAI 格式。
+        发送流式请求（streaming），只返回正文内容。
+        兼容 DeepSeek 和 OpenAI 的不同格式。
 
-        :param chunk: JSON 数据块
-        :return: 提取的内容
+        :param endpoint: API 端点路径
+        :param kwargs: 其他请求参数（如 headers, json, params 等）
+        :return: 异步生成器，逐步返回解析后的内容
+        :raises Exception: 如果请求失败或响应状态码非 200
         """
-        # 处理 DeepSeek 格式
-        if "message" in chunk:
-            if "content" in chunk["message"]:
-                return chunk["message"]["content"]
-            elif "reasoning_content" in chunk["message"]:
-                return chunk["message"]["reasoning_content"]
-
-        # 处理 OpenAI 格式
-        elif "choices" in chunk:
-            delta = chunk["choices"][0].get("delta", {})
-            if "content" in delta:
-                return delta["content"]
-            elif "refusal" in delta:
-                return delta["refusal"]
-
-        return ""  # 如果没有匹配的内容，返回空字符串
\ No newline at end of file
+        async for event in self.async_stream_events(endpoint, **kwargs):
+            if event.type == CONTENT:
+                yield event.text
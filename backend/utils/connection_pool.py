@@ -0,0 +1,171 @@
+import asyncio
+import importlib.util
+import weakref
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from .metrics import metrics_registry
+
+# 未在 config.yaml 的 connection 段中指定时使用的连接参数
+DEFAULT_POOL_OPTIONS: Dict[str, Any] = {
+    "http2": False,
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "connect_timeout": 5.0,
+    "read_timeout": 120.0,  # 流式响应两个数据块之间的最长等待
+    "write_timeout": 30.0,
+    "pool_timeout": 10.0,
+    "prewarm": False,
+}
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def get_origin(base_url: str) -> str:
+    """取 scheme://host[:port] 作为连接池键，同一上游的不同路径共享连接"""
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class UpstreamPool:
+    """单个上游的 httpx 连接池"""
+
+    def __init__(self, origin: str, options: Dict[str, Any]):
+        self.origin = origin
+        self.options = options
+        self.users: "weakref.WeakSet" = weakref.WeakSet()  # 使用该池的客户端
+        self.http2 = bool(options["http2"]) and HTTP2_AVAILABLE
+        if options["http2"] and not HTTP2_AVAILABLE:
+            print(f"HTTP/2 requested for {origin} but h2 is not installed, falling back to HTTP/1.1")
+        self.stream_timeout = httpx.Timeout(
+            connect=options["connect_timeout"],
+            read=options["read_timeout"],
+            write=options["write_timeout"],
+            pool=options["pool_timeout"],
+        )
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=options["max_connections"],
+                max_keepalive_connections=options["max_keepalive_connections"],
+                keepalive_expiry=options["keepalive_expiry"],
+            )
+        )
+        self.client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=self.stream_timeout,
+            follow_redirects=True
+        )
+        self.prewarmed = False
+
+    def request_timeout(self, total: float) -> httpx.Timeout:
+        """非流式请求超时：整体时限沿用调用方设置，连接阶段使用池配置"""
+        return httpx.Timeout(total, connect=min(total, self.options["connect_timeout"]))
+
+    async def prewarm(self):
+        """提前完成 DNS 解析与 TCP/TLS 握手，连接保留在池中供后续请求复用"""
+        try:
+            await self.client.request(
+                "HEAD", self.origin, timeout=httpx.Timeout(self.options["connect_timeout"])
+            )
+            self.prewarmed = True
+        except httpx.HTTPError as e:
+            print(f"Error prewarming {self.origin}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池占用情况"""
+        connections = getattr(getattr(self._transport, "_pool", None), "connections", [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "prewarmed": self.prewarmed,
+            "max_connections": self.options["max_connections"],
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class ConnectionPoolManager:
+    """
+    按上游（scheme://host:port）与连接参数划分的连接池管理器。
+    各上游拥有独立的连接上限、keep-alive 与超时设置，可选 HTTP/2 与启动预热；
+    同一上游参数不同的客户端各用一个池。池只被客户端弱引用：配置变化后旧客户端被替换、
+    其上进行中的流结束（流持有客户端引用）后，不再有客户端使用的池即被关闭。
+    """
+
+    def __init__(self):
+        self._pools: Dict[Tuple[str, Tuple], UpstreamPool] = {}
+        self._retired: List[UpstreamPool] = []
+        self._closing: set = set()
+        self._prewarm_task: Optional[asyncio.Task] = None
+
+    def get_pool(self, base_url: str, options: Optional[Dict[str, Any]] = None,
+                 user: Optional[object] = None) -> UpstreamPool:
+        """获取上游连接池，不存在时创建；user 为使用该池的客户端，所有使用者释放后池被关闭"""
+        self._close_unused()
+        origin = get_origin(base_url)
+        options = {**DEFAULT_POOL_OPTIONS, **(options or {})}
+        key = (origin, tuple(sorted(options.items())))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = UpstreamPool(origin, options)
+        if user is not None:
+            pool.users.add(user)
+        return pool
+
+    def _close_unused(self):
+        """关闭已没有客户端使用的池；没有运行中的事件循环时留到 close() 关闭"""
+        for key, pool in list(self._pools.items()):
+            if len(pool.users) == 0:
+                del self._pools[key]
+                try:
+                    task = asyncio.get_running_loop().create_task(pool.aclose())
+                except RuntimeError:
+                    self._retired.append(pool)
+                    continue
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    def start_prewarm(self):
+        """在后台预热所有标记了 prewarm 的连接池，不阻塞启动"""
+        pools = [pool for pool in self._pools.values() if pool.options["prewarm"]]
+        if pools:
+            self._prewarm_task = asyncio.ensure_future(
+                asyncio.gather(*(pool.prewarm() for pool in pools))
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """各上游连接池指标；同一上游有多个池时按创建顺序编号"""
+        stats: Dict[str, Any] = {}
+        for origin, _ in self._pools:
+            pools = [pool for (other, _), pool in self._pools.items() if other == origin]
+            if len(pools) == 1:
+                stats[origin] = pools[0].stats()
+            else:
+                for number, pool in enumerate(pools, start=1):
+                    stats[f"{origin}#{number}"] = pool.stats()
+        return stats
+
+    async def close(self):
+        """关闭全部连接池"""
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            await asyncio.gather(self._prewarm_task, return_exceptions=True)
+            self._prewarm_task = None
+        pools = list(self._pools.values()) + self._retired
+        self._pools, self._retired = {}, []
+        await asyncio.gather(*(pool.aclose() for pool in pools), *self._closing, return_exceptions=True)
+
+
+@lru_cache()
+def get_connection_pools() -> ConnectionPoolManager:
+    """获取连接池管理器单例"""
+    manager = ConnectionPoolManager()
+    metrics_registry.register("connection_pools", manager.stats)
+    return manager
@@ -0,0 +1,65 @@
+import re
+import zlib
+import numpy as np
+from typing import List
+from .async_api_client import AsyncAPIClient
+
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+_TOKEN_RE = re.compile(r'[\u4e00-\u9fff]|[^\W\u4e00-\u9fff]+')
+
+
+class HashingEmbedder:
+    """
+    基于特征哈希的轻量文本向量化，无需下载模型。
+    英文按单词、中文按单字和相邻双字构造特征，使用 crc32 保证多进程间结果一致。
+    """
+
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = list(tokens)
+        for prev, cur in zip(tokens, tokens[1:]):
+            if _CJK_RE.match(prev) and _CJK_RE.match(cur):
+                features.append(prev + cur)
+        return features
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """同步计算向量，返回 L2 归一化后的 float32 矩阵"""
+        vectors = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dimension] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """计算文本向量"""
+        return self.embed_sync(texts)
+
+
+class OllamaEmbedder(AsyncAPIClient):
+    """调用 Ollama `/embed` 接口计算文本向量"""
+
+    def __init__(self, base_url: str, model_name: str, batch_size: int = 32):
+        super().__init__(base_url)
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """计算文本向量，返回 L2 归一化后的 float32 矩阵"""
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = await self.async_request(
+                "POST", "/embed",
+                json={"model": self.model_name, "input": texts[start:start + self.batch_size]}
+            )
+            rows.extend(response.get("embeddings", []))
+        vectors = np.asarray(rows, dtype='float32')
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
@@ -2,8 +2,15 @@ import faiss
 import numpy as np
 
 class FaissUtils:
-    def __init__(self, dimension: int):
+    def __init__(self, dimension: int, with_ids: bool = False):
+        """
+        with_ids=True uses an IndexIDMap2 so vectors keep caller-assigned ids across removals
+        (see add_with_ids / remove_ids); otherwise ids are positions in a flat index.
+        """
+        self.with_ids = with_ids
         self.index = faiss.IndexFlatL2(dimension)
+        if with_ids:
+            self.index = faiss.IndexIDMap2(self.index)
         self.text_map = {}
 
     def add_vector(self, vector: np.ndarray):
@@ -23,6 +30,13 @@ class FaissUtils:
     def delete_vector(self, index: int):
         """Delete a vector from the index."""
         self.index.remove_ids(faiss.IDSelectorBatch([index]))
+        if self.with_ids:
+            self.text_map.pop(index, None)
+        else:
+            # A flat index shifts later vectors down by one; keep text_map aligned
+            self.text_map = {
+                (i - 1 if i > index else i): text for i, text in self.text_map.items() if i != index
+            }
     
     def get_vector(self, index: int):
         """Retrieve a vector from the index by its ID."""
@@ -42,5 +56,44 @@ class FaissUtils:
         self.index.add(vector)
         self.text_map[len(self.text_map)] = text
     
+    def add_vectors_with_texts(self, vectors: np.ndarray, texts: list):
+        """Add a batch of vectors and keep their texts keyed by index position."""
+        start = self.index.ntotal
+        self.index.add(vectors)
+        for offset, text in enumerate(texts):
+            self.text_map[start + offset] = text
+
+    def add_with_ids(self, vectors: np.ndarray, ids: list, texts: list):
+        """Add vectors under explicit ids (requires with_ids=True)."""
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+        for i, text in zip(ids, texts):
+            self.text_map[int(i)] = text
+
+    def remove_ids(self, ids: list) -> int:
+        """Remove vectors and their texts by id, returning how many were removed."""
+        removed = self.index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype='int64')))
+        for i in ids:
+            self.text_map.pop(int(i), None)
+        return int(removed)
+
+    def search_texts(self, vector: np.ndarray, k: int = 1, ids: list = None):
+        """
+        Search for the nearest vectors and return (index, distance, text) tuples.
+        When ids is given, only those vector ids are considered.
+        """
+        k = min(k, self.index.ntotal if ids is None else len(ids))
+        if k <= 0:
+            return []
+        if ids is None:
+            distances, indices = self.index.search(vector, k)
+        else:
+            selector = faiss.IDSelectorBatch(np.asarray(ids, dtype='int64'))
+            distances, indices = self.index.search(vector, k, params=faiss.SearchParameters(sel=selector))
+        return [
+            (int(i), float(d), self.text_map.get(int(i)))
+            for d, i in zip(distances[0], indices[0])
+            if i != -1
+        ]
+
     def get_text_by_index(self, index):
         return self.text_map.get(index, "未知文本")
\ No newline at end of file
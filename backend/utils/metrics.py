@@ -0,0 +1,29 @@
+from typing import Any, Callable, Dict
+
+
+class MetricsRegistry:
+    """运行时指标注册表，各组件注册一个返回指标字典的函数"""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """注册指标来源，同名来源会被覆盖"""
+        self._sources[name] = source
+
+    def unregister(self, name: str):
+        """移除指标来源"""
+        self._sources.pop(name, None)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """收集所有指标"""
+        result = {}
+        for name, source in list(self._sources.items()):
+            try:
+                result[name] = source()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,50 @@
+from typing import List, Optional, Tuple
+
+
+def parse_page_range(spec: str, page_count: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    解析页码范围表达式，返回合并后的闭区间列表（页码从 1 开始）。
+
+    支持 "10-20"、"5"、"3-"（到末页）、"1-3,7,10-12" 等写法；
+    指定 page_count 时结果会截断到文档页数内。
+
+    :raises ValueError: 表达式格式错误
+    """
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                start_text, end_text = part.split("-", 1)
+                start = int(start_text) if start_text else 1
+                if end_text:
+                    end = int(end_text)
+                elif page_count is not None:
+                    end = page_count
+                else:
+                    raise ValueError(f"Open page range '{part}' requires a known page count")
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range '{part}'")
+        if page_count is not None:
+            end = min(end, page_count)
+            if start > end:
+                continue
+        ranges.append((start, end))
+
+    if not ranges:
+        raise ValueError(f"Invalid page range '{spec}'")
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
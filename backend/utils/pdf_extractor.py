@@ -0,0 +1,164 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import PyPDF2
+
+
+# 子进程内缓存最近打开的 PdfReader，同一文档的多个任务无需重复解析页面树
+_readers: "OrderedDict[Tuple[str, float], PyPDF2.PdfReader]" = OrderedDict()
+_MAX_CACHED_READERS = 2
+
+
+def _get_reader(file_path: str) -> PyPDF2.PdfReader:
+    key = (file_path, os.path.getmtime(file_path))
+    reader = _readers.get(key)
+    if reader is None:
+        reader = PyPDF2.PdfReader(file_path)
+        _readers[key] = reader
+        while len(_readers) > _MAX_CACHED_READERS:
+            _readers.popitem(last=False)
+    else:
+        _readers.move_to_end(key)
+    return reader
+
+
+def _count_pages(file_path: str) -> int:
+    return len(_get_reader(file_path).pages)
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> Tuple[List[str], float]:
+    """在子进程中提取 [start, end) 范围内的页面文本，返回 (文本列表, 耗时秒数)"""
+    began = time.perf_counter()
+    reader = _get_reader(file_path)
+    pages = [reader.pages[i].extract_text() or "" for i in range(start, end)]
+    return pages, time.perf_counter() - began
+
+
+def compute_page_offsets(pages: List[str]) -> List[int]:
+    """计算每页在全文（"\\n".join(pages).strip()）中的起始字符偏移"""
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page) + 1
+    joined = "\n".join(pages)
+    lead = len(joined) - len(joined.lstrip())
+    return [max(0, offset - lead) for offset in offsets]
+
+
+class ExtractionResult:
+    """PDF 提取结果"""
+
+    def __init__(self, pages: List[str]):
+        self.pages = pages
+        self.offsets = compute_page_offsets(pages)
+
+
+class PdfExtractionPool:
+    """
+    PDF 并行文本提取进程池。
+    将页码范围切分为若干任务分发到子进程，按页序重新组装，并记录排队深度与耗时指标。
+    """
+
+    def __init__(self, max_workers: int, pages_per_task: int = 32):
+        self.max_workers = max(1, max_workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending_tasks = 0
+        self._active_jobs = 0
+        self._jobs = 0
+        self._tasks = 0
+        self._pages = 0
+        self._job_seconds = 0.0
+        self._task_seconds = 0.0
+        self._last_job_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 使用 spawn 避免在事件循环线程存在时 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def split_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """按 pages_per_task 切分页码范围，保证每个 worker 至少分到一个任务"""
+        size = min(self.pages_per_task, max(1, -(-page_count // self.max_workers)))
+        return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+    async def _submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self._pending_tasks += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending_tasks -= 1
+
+    async def extract(
+        self,
+        file_path: str,
+        on_progress: Optional[Callable[[int, int], Any]] = None
+    ) -> ExtractionResult:
+        """
+        并行提取 PDF 全部页面文本。
+
+        :param file_path: PDF 文件路径
+        :param on_progress: 进度回调 (已完成页数, 总页数)
+        """
+        began = time.perf_counter()
+        self._active_jobs += 1
+        try:
+            page_count = await self._submit(_count_pages, file_path)
+            ranges = self.split_ranges(page_count)
+            if on_progress:
+                on_progress(0, page_count)
+            pages: List[Optional[List[str]]] = [None] * len(ranges)
+            done_pages = 0
+
+            async def run(slot: int, start: int, end: int):
+                nonlocal done_pages
+                texts, seconds = await self._submit(_extract_page_range, file_path, start, end)
+                pages[slot] = texts
+                self._tasks += 1
+                self._task_seconds += seconds
+                done_pages += end - start
+                if on_progress:
+                    on_progress(done_pages, page_count)
+
+            await asyncio.gather(*(run(slot, start, end) for slot, (start, end) in enumerate(ranges)))
+            result = ExtractionResult([text for texts in pages for text in texts])
+
+            elapsed = time.perf_counter() - began
+            self._jobs += 1
+            self._pages += page_count
+            self._job_seconds += elapsed
+            self._last_job_seconds = elapsed
+            return result
+        finally:
+            self._active_jobs -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """进程池指标"""
+        return {
+            "max_workers": self.max_workers,
+            "pages_per_task": self.pages_per_task,
+            "active_jobs": self._active_jobs,
+            "pending_tasks": self._pending_tasks,
+            "queue_depth": max(0, self._pending_tasks - self.max_workers),
+            "jobs_completed": self._jobs,
+            "tasks_completed": self._tasks,
+            "pages_extracted": self._pages,
+            "avg_job_ms": round(self._job_seconds / self._jobs * 1000, 2) if self._jobs else 0.0,
+            "avg_task_ms": round(self._task_seconds / self._tasks * 1000, 2) if self._tasks else 0.0,
+            "last_job_ms": round(self._last_job_seconds * 1000, 2),
+        }
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,77 @@
+import hashlib
+import inspect
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Union
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 比较（弱比较：忽略 W/ 前缀，支持列表与 *）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+class PrecomputedResponse:
+    """
+    按版本键预先序列化的 JSON 响应。
+    版本键不变时直接返回缓存的字节与强 ETag，If-None-Match 命中时返回 304；
+    版本键变化（如配置热加载）时调用 build 重新生成。
+    """
+
+    def __init__(self, max_age: int = 60):
+        self.max_age = max_age
+        self._key: Optional[Hashable] = None
+        self._body = b""
+        self._etag = ""
+        self._builds = 0
+        self._served = 0
+        self._not_modified = 0
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        build: Callable[[], Union[Any, Awaitable[Any]]]
+    ) -> Response:
+        if self._builds == 0 or key != self._key:
+            payload = build()
+            if inspect.isawaitable(payload):
+                payload = await payload
+            self._set(key, payload)
+
+        headers = {
+            "ETag": self._etag,
+            "Cache-Control": f"public, max-age={self.max_age}, stale-while-revalidate={self.max_age * 5}",
+        }
+        if etag_matches(request.headers.get("if-none-match"), self._etag):
+            self._not_modified += 1
+            return Response(status_code=304, headers=headers)
+        self._served += 1
+        return Response(content=self._body, media_type="application/json", headers=headers)
+
+    def _set(self, key: Hashable, payload: Any):
+        if isinstance(payload, bytes):
+            body = payload
+        else:
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        self._key = key
+        self._body = body
+        self._etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._builds += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "etag": self._etag,
+            "bytes": len(self._body),
+            "builds": self._builds,
+            "served": self._served,
+            "not_modified": self._not_modified,
+        }
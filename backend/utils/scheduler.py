@@ -0,0 +1,252 @@
+import asyncio
+import heapq
+import itertools
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .metrics import metrics_registry
+
+# 未在 config.yaml 的 scheduler 段中指定时使用的调度参数
+DEFAULT_SCHEDULER_OPTIONS: Dict[str, Any] = {
+    "max_concurrency": 16,     # 并发流上限（AIMD 增长的上限）
+    "min_concurrency": 1,
+    "queue_size": 100,         # 等待队列长度上限，超出时直接拒绝
+    "retries": 1,              # 首个 token 之前遇到 429/503 时的重试次数
+    "max_retry_after": 30.0,   # Retry-After 的最长服从时间（秒）
+    "preference_wait": 5.0,    # 不受偏好的请求最多因偏好多等待的秒数，超过后按到达顺序放行
+}
+
+# 优先级：数值越小越先获得并发槽
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# 触发并发收缩的上游状态码
+THROTTLE_STATUS = (429, 503)
+
+
+class SchedulerFullError(Exception):
+    """等待队列已满"""
+
+    status_code = 503
+    retry_after: Optional[float] = None
+
+
+class QueueTicket:
+    """一次请求的排队状态，用于向客户端报告排队位置与等待时间"""
+
+    def __init__(self, priority: str = "interactive"):
+        self.priority = priority
+        self.provider: Optional[str] = None
+        self.model: Optional[str] = None
+        self.enqueued_at: Optional[float] = None
+        self.waited = 0.0
+        self.completed = False  # 上游流是否以结束事件（[DONE] / finish_reason / done）结束
+        self.attempts: List["QueueTicket"] = []  # 路由对冲 / 切换时每次尝试各自的票据
+        self._scheduler: Optional["ProviderScheduler"] = None
+
+    def for_attempt(self) -> "QueueTicket":
+        """为路由的一次尝试创建独立票据（复制优先级）；本票据的排队状态汇总各次尝试"""
+        attempt = QueueTicket(self.priority)
+        self.attempts.append(attempt)
+        return attempt
+
+    @property
+    def waiting(self) -> bool:
+        return self._scheduler is not None or any(attempt.waiting for attempt in self.attempts)
+
+    def status(self) -> Dict[str, Any]:
+        if self.attempts:
+            # 报告仍在排队的尝试中最靠前的一个，全部已获得槽时报告最近一次尝试
+            queued = [attempt for attempt in self.attempts if attempt.waiting]
+            if queued:
+                return min(queued, key=lambda attempt: attempt.status()["position"]).status()
+            return self.attempts[-1].status()
+        waited = time.monotonic() - self.enqueued_at if self.waiting else self.waited
+        return {
+            "provider": self.provider,
+            "priority": self.priority,
+            "position": self._scheduler.position(self) if self.waiting else 0,
+            "waited_ms": int(waited * 1000),
+        }
+
+
+class ProviderScheduler:
+    """
+    单个上游厂商的并发调度。
+    并发槽上限按 AIMD 调整：每个正常结束的流使上限增加 1/上限（约每轮 +1），
+    遇到 429/503 时上限减半（1 秒内只减一次），带 Retry-After 时在该时间内暂停发放新槽。
+    拿不到槽的请求按 (优先级, 到达顺序) 进入有界等待队列；
+    设置了 prefer 时，同优先级中 prefer 为真的请求（如模型已驻留内存）先放行，其余请求最多多等 preference_wait 秒。
+    """
+
+    def __init__(self, name: str, options: Dict[str, Any]):
+        self.name = name
+        self.limit = float(options["max_concurrency"])
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future, QueueTicket]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+        self.prefer: Optional[Callable[[QueueTicket], bool]] = None
+        self._granted = 0
+        self._rejected = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self.configure(options)
+
+    def configure(self, options: Dict[str, Any]):
+        """应用（热加载后的）调度参数，保留当前的并发状态"""
+        self.options = options
+        self.max_concurrency = options["max_concurrency"]
+        self.min_concurrency = max(1, options["min_concurrency"])
+        self.limit = min(max(self.limit, self.min_concurrency), self.max_concurrency)
+
+    def is_full(self) -> bool:
+        """等待队列已满：新的请求拿不到槽时会被拒绝"""
+        return not self._can_grant() and len(self._waiters) >= self.options["queue_size"]
+
+    def _can_grant(self) -> bool:
+        return self.active < int(self.limit) and time.monotonic() >= self._paused_until
+
+    async def acquire(self, ticket: QueueTicket):
+        """获取一个并发槽，必要时排队等待"""
+        ticket.provider = self.name
+        if not self._waiters and self._can_grant():
+            self._grant(ticket, 0.0)
+            return
+        if len(self._waiters) >= self.options["queue_size"]:
+            self._rejected += 1
+            raise SchedulerFullError(f"{self.name} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(ticket.priority, 0), next(self._sequence), future, ticket)
+        heapq.heappush(self._waiters, entry)
+        ticket.enqueued_at = time.monotonic()
+        ticket._scheduler = self
+        self._schedule_resume()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分到槽但调用方被取消，归还
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            ticket._scheduler = None
+
+    def _grant(self, ticket: QueueTicket, waited: float):
+        self.active += 1
+        self._granted += 1
+        self._total_wait += waited
+        ticket.waited = waited
+
+    def release(self):
+        """归还并发槽"""
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters and self._can_grant():
+            _, _, future, ticket = self._next_waiter()
+            if future.done():
+                continue
+            self._grant(ticket, time.monotonic() - ticket.enqueued_at)
+            future.set_result(None)
+        self._schedule_resume()
+
+    def _next_waiter(self) -> Tuple[int, int, asyncio.Future, QueueTicket]:
+        if self.prefer is None:
+            return heapq.heappop(self._waiters)
+        now = time.monotonic()
+
+        def key(entry):
+            ticket = entry[3]
+            favoured = self.prefer(ticket) or now - ticket.enqueued_at >= self.options["preference_wait"]
+            return entry[0], 0 if favoured else 1, entry[1]
+
+        entry = min(self._waiters, key=key)
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        return entry
+
+    def _schedule_resume(self):
+        """Retry-After 暂停期间有等待者时，到期后再发放"""
+        delay = self._paused_until - time.monotonic()
+        if self._waiters and delay > 0 and self._resume_handle is None:
+            def resume():
+                self._resume_handle = None
+                self._dispatch()
+            self._resume_handle = asyncio.get_running_loop().call_later(delay, resume)
+
+    def position(self, ticket: QueueTicket) -> int:
+        """在等待队列中的位置（从 1 开始）"""
+        for entry in self._waiters:
+            if entry[3] is ticket:
+                return sum(1 for other in self._waiters if other[:2] < entry[:2]) + 1
+        return 0
+
+    def on_success(self):
+        """加性增长"""
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """乘性减少；带 Retry-After 时暂停发放"""
+        now = time.monotonic()
+        self._throttled += 1
+        if now - self._last_decrease >= 1.0:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self._last_decrease = now
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + min(retry_after, self.options["max_retry_after"]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "granted": self._granted,
+            "rejected": self._rejected,
+            "throttled": self._throttled,
+            "avg_wait_ms": round(self._total_wait / self._granted * 1000, 1) if self._granted else 0.0,
+        }
+
+
+class SchedulerRegistry:
+    """按厂商名管理调度器；配置变化时原地更新参数"""
+
+    def __init__(self):
+        self._schedulers: Dict[str, ProviderScheduler] = {}
+        self._preferences: Dict[str, Callable[[QueueTicket], bool]] = {}
+
+    def get(self, name: str, options: Optional[Dict[str, Any]] = None) -> ProviderScheduler:
+        options = {**DEFAULT_SCHEDULER_OPTIONS, **(options or {})}
+        scheduler = self._schedulers.get(name)
+        if scheduler is None:
+            scheduler = self._schedulers[name] = ProviderScheduler(name, options)
+            scheduler.prefer = self._preferences.get(name)
+        elif scheduler.options != options:
+            scheduler.configure(options)
+        return scheduler
+
+    def set_preference(self, name: str, prefer: Callable[[QueueTicket], bool]):
+        """设置厂商调度器的放行偏好（调度器尚未创建时在创建时应用）"""
+        self._preferences[name] = prefer
+        if name in self._schedulers:
+            self._schedulers[name].prefer = prefer
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: scheduler.stats() for name, scheduler in self._schedulers.items()}
+
+
+@lru_cache()
+def get_schedulers() -> SchedulerRegistry:
+    """获取调度器注册表单例"""
+    registry = SchedulerRegistry()
+    metrics_registry.register("scheduler", registry.stats)
+    return registry
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, List, Optional
+
+
+class CoalescerStats:
+    """输出合并指标：帧数、字节数与每帧包含的增量数"""
+
+    def __init__(self):
+        self.streams = 0
+        self.passthrough_streams = 0
+        self.deltas = 0
+        self.frames = 0
+        self.bytes = 0
+        self.size_flushes = 0
+        self.time_flushes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "passthrough_streams": self.passthrough_streams,
+            "deltas": self.deltas,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "avg_frame_bytes": round(self.bytes / self.frames, 2) if self.frames else 0.0,
+            "avg_deltas_per_frame": round(self.deltas / self.frames, 2) if self.frames else 0.0,
+            "size_flushes": self.size_flushes,
+            "time_flushes": self.time_flushes,
+        }
+
+
+class StreamCoalescer:
+    """
+    流式输出合并器：把上游的细碎增量按时间窗口和字节数合并为较大的帧。
+    首个增量到达后开始计时，窗口到期或累计字节数达到上限时输出一帧，二者先到者为准；
+    window_ms 为 0 时逐个增量原样输出。
+    """
+
+    def __init__(self, window_ms: float, max_bytes: int, stats: Optional[CoalescerStats] = None):
+        self.window = max(0.0, window_ms) / 1000
+        self.max_bytes = max(1, max_bytes)
+        self.stats = stats or CoalescerStats()
+
+    async def coalesce(self, source: AsyncIterable[str]) -> AsyncGenerator[str, None]:
+        self.stats.streams += 1
+        iterator = source.__aiter__()
+        if self.window <= 0:
+            self.stats.passthrough_streams += 1
+            try:
+                async for chunk in iterator:
+                    self._count(chunk, 1)
+                    yield chunk
+            finally:
+                await iterator.aclose()
+            return
+
+        loop = asyncio.get_running_loop()
+        pending: Optional[asyncio.Future] = None
+        buffer: List[str] = []
+        size = 0
+        deadline = 0.0
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                # 缓冲区为空时无需计时；等待超时不会取消上游读取，下一轮继续等待同一个 future
+                timeout = max(0.0, deadline - loop.time()) if buffer else None
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    self.stats.time_flushes += 1
+                    yield self._flush(buffer)
+                    buffer, size = [], 0
+                    continue
+
+                future, pending = pending, None
+                try:
+                    chunk = future.result()
+                except StopAsyncIteration:
+                    break
+                if not chunk:
+                    continue
+                if not buffer:
+                    deadline = loop.time() + self.window
+                buffer.append(chunk)
+                size += len(chunk.encode('utf-8'))
+                if size >= self.max_bytes:
+                    self.stats.size_flushes += 1
+                    yield self._flush(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield self._flush(buffer)
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            # 客户端断开时立即关闭上游（释放调度槽位与连接），不等垃圾回收
+            await iterator.aclose()
+
+    def _flush(self, buffer: List[str]) -> str:
+        frame = "".join(buffer)
+        self._count(frame, len(buffer))
+        return frame
+
+    def _count(self, frame: str, deltas: int):
+        self.stats.deltas += deltas
+        self.stats.frames += 1
+        self.stats.bytes += len(frame.encode('utf-8'))
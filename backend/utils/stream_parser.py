@@ -0,0 +1,146 @@
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import orjson
+    _loads: Callable[[bytes], Any] = orjson.loads
+    _DECODE_ERRORS: tuple = (orjson.JSONDecodeError, UnicodeDecodeError)
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+# 事件类型
+CONTENT = "content"
+REASONING = "reasoning"
+USAGE = "usage"
+FINISH = "finish"
+ERROR = "error"
+
+
+class StreamEvent(NamedTuple):
+    """流式响应中解析出的事件"""
+    type: str
+    text: str = ""
+    data: Optional[Dict[str, Any]] = None
+
+
+class StreamParser:
+    """
+    增量字节流解析器，兼容 SSE（OpenAI / DeepSeek，`data: {...}`）与 NDJSON（Ollama）两种分帧。
+    feed() 接收任意切分的字节块，只对完整的行做一次 JSON 解码；
+    遇到 `data: [DONE]` 或 Ollama 的 `"done": true` 后标记 finished，之后的数据被忽略。
+    """
+
+    __slots__ = ("_buffer", "finished", "malformed")
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.finished = False
+        self.malformed = 0  # 无法解码的行数
+
+    def feed(self, data: bytes) -> List[StreamEvent]:
+        """输入一段字节，返回其中完整行产生的事件"""
+        if self.finished:
+            return []
+        buffer = self._buffer
+        # 只在新到达的数据中查找换行，缓冲区中的残行无需重复扫描
+        end = data.rfind(b"\n")
+        if end < 0:
+            buffer += data
+            return []
+        buffer += data[:end]
+        events: List[StreamEvent] = []
+        for line in bytes(buffer).split(b"\n"):
+            if len(line) > 1:  # 跳过 SSE 事件之间的空行（含单独的 \r）
+                self._parse_line(line, events)
+                if self.finished:
+                    break
+        self._buffer = bytearray() if self.finished else bytearray(data[end + 1:])
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        """流结束时处理缓冲区中没有换行结尾的最后一行"""
+        events: List[StreamEvent] = []
+        if self._buffer and not self.finished:
+            self._parse_line(bytes(self._buffer), events)
+        self._buffer = bytearray()
+        return events
+
+    def _parse_line(self, line: bytes, events: List[StreamEvent]):
+        line = line.strip()
+        if not line or line[0] == 58:  # 空行或 ":" 开头的 SSE 注释（keep-alive）
+            return
+        if line.startswith(b"data:"):
+            payload = line[5:].lstrip()
+            if payload == b"[DONE]":
+                self.finished = True
+                events.append(StreamEvent(FINISH, "", {"reason": "done"}))
+                return
+        elif line.startswith((b"event:", b"id:", b"retry:")):
+            return
+        else:
+            payload = line  # NDJSON
+        try:
+            chunk = _loads(payload)
+        except _DECODE_ERRORS:
+            self.malformed += 1
+            return
+        if isinstance(chunk, dict):
+            self._extract(chunk, events)
+
+    def _extract(self, chunk: Dict[str, Any], events: List[StreamEvent]):
+        """从 JSON 数据块中提取事件，兼容 OpenAI 与 Ollama 格式"""
+        # OpenAI / DeepSeek 格式（最常见，放在最前）
+        choices = chunk.get("choices")
+        if choices:
+            choice = choices[0]
+            delta = choice.get("delta")
+            if delta:
+                content = delta.get("content")
+                if content:
+                    events.append(StreamEvent(CONTENT, content))
+                else:
+                    reasoning = delta.get("reasoning_content")
+                    if reasoning:
+                        events.append(StreamEvent(REASONING, reasoning))
+                    refusal = delta.get("refusal")
+                    if refusal:
+                        events.append(StreamEvent(CONTENT, refusal))
+            if choice.get("finish_reason"):
+                events.append(StreamEvent(FINISH, "", {"reason": choice["finish_reason"]}))
+            if chunk.get("usage"):
+                events.append(StreamEvent(USAGE, "", chunk["usage"]))
+            return
+
+        # Ollama 消息格式
+        message = chunk.get("message")
+        if isinstance(message, dict):
+            content = message.get("content")
+            if content:
+                events.append(StreamEvent(CONTENT, content))
+            else:
+                reasoning = message.get("reasoning_content") or message.get("thinking")
+                if reasoning:
+                    events.append(StreamEvent(REASONING, reasoning))
+            if chunk.get("done"):
+                if "eval_count" in chunk or "prompt_eval_count" in chunk:
+                    events.append(StreamEvent(USAGE, "", {
+                        "prompt_tokens": chunk.get("prompt_eval_count", 0),
+                        "completion_tokens": chunk.get("eval_count", 0),
+                    }))
+                events.append(StreamEvent(FINISH, "", {"reason": chunk.get("done_reason", "stop")}))
+                self.finished = True
+            return
+
+        error = chunk.get("error")
+        if error:
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            events.append(StreamEvent(ERROR, message, chunk))
+            self.finished = True
+            return
+
+        # 单独的 usage 块（choices 为空）
+        if chunk.get("usage"):
+            events.append(StreamEvent(USAGE, "", chunk["usage"]))
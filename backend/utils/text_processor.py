@@ -1,5 +1,9 @@
 import re
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+# 编号条目的前缀，如 "[3] ..."
+_NUMBERED_RE = re.compile(r'^\s*\[(\d+)\]\s?(.*)$')
+
 
 class TextProcessor:
     """文本处理工具类"""
@@ -13,27 +17,107 @@ class TextProcessor:
         text = re.sub(r'[^\w\s\u4e00-\u9fff]', '', text)
         return text.strip()
     
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """规范化提取文本：去除控制字符、合并多余空白，保留换行结构"""
+        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+        text = re.sub(r'[ \t\u3000]+', ' ', text)
+        text = re.sub(r' *\n *', '\n', text)
+        text = re.sub(r'\n{3,}', '\n\n', text)
+        return text.strip()
+    
     @staticmethod
     def split_text(text: str, max_length: int = 1000) -> List[str]:
         """将文本分割成小块"""
-        # 按句子分割
-        sentences = re.split(r'[。！？.!?]', text)
+        # 按句子分割，保留句末标点
+        sentences = re.split(r'(?<=[。！？.!?])', text)
         chunks = []
         current_chunk = ""
         
         for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
+            if not sentence.strip():
                 continue
                 
             if len(current_chunk) + len(sentence) > max_length:
-                if current_chunk:
-                    chunks.append(current_chunk)
+                if current_chunk.strip():
+                    chunks.append(current_chunk.strip())
                 current_chunk = sentence
             else:
                 current_chunk += sentence
                 
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_chunk.strip():
+            chunks.append(current_chunk.strip())
             
         return chunks
+
+    @staticmethod
+    def split_segments(text: str, max_length: int = 1500) -> List[Tuple[str, str]]:
+        """
+        将待翻译文本切分为片段：相邻段落合并到 max_length 以内，只在换行处切分；
+        超长段落按句子切分，单句仍超长时按长度硬切。
+        返回 (片段, 其后的分隔符) 列表，按顺序拼接 片段 + 分隔符 可还原原文。
+        """
+        units: List[Tuple[str, str]] = []
+        parts = re.split(r'(\n+)', text)
+        for i in range(0, len(parts), 2):
+            paragraph, separator = parts[i], parts[i + 1] if i + 1 < len(parts) else ""
+            if len(paragraph) <= max_length:
+                units.append((paragraph, separator))
+                continue
+            # 句子与其后的空白交替出现
+            sentences = re.split(r'(?<=[。！？.!?])(\s*)', paragraph)
+            pieces = []
+            for j in range(0, len(sentences), 2):
+                sentence, space = sentences[j], sentences[j + 1] if j + 1 < len(sentences) else ""
+                while len(sentence) > max_length:
+                    pieces.append((sentence[:max_length], ""))
+                    sentence = sentence[max_length:]
+                pieces.append((sentence, space))
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + separator)
+            units.extend(pieces)
+
+        segments: List[Tuple[str, str]] = []
+        current, current_separator = "", ""
+        for unit, separator in units:
+            if (current or current_separator) and len(current) + len(current_separator) + len(unit) > max_length:
+                segments.append((current, current_separator))
+                current, current_separator = unit, separator
+            else:
+                current += current_separator + unit
+                current_separator = separator
+        if current or current_separator:
+            segments.append((current, current_separator))
+        return segments
+
+    @staticmethod
+    def number_lines(items: List[str]) -> str:
+        """把多条文本排成 "[编号] 文本" 的行，供模型逐条处理"""
+        return "\n".join(f"[{number}] {item}" for number, item in enumerate(items, 1))
+
+    @staticmethod
+    def parse_numbered(output: str, count: int) -> List[Optional[str]]:
+        """
+        把 "[编号] 文本" 格式的输出拆回 count 条，无编号的行并入上一条。
+        缺失、重复或为空的编号对应 None；出现越界编号或编号前有多余文本时整体无法解析，全部为 None。
+        """
+        items: Dict[int, List[str]] = {}
+        duplicated = set()
+        current: Optional[int] = None
+        for line in output.strip().splitlines():
+            match = _NUMBERED_RE.match(line)
+            if match:
+                current = int(match.group(1))
+                if not 1 <= current <= count:
+                    return [None] * count
+                if current in items:
+                    duplicated.add(current)
+                items[current] = [match.group(2)]
+            elif current is not None:
+                items[current].append(line)
+            elif line.strip():
+                return [None] * count
+        texts = []
+        for number in range(1, count + 1):
+            text = "\n".join(items.get(number, [])).strip()
+            texts.append(text if text and number not in duplicated else None)
+        return texts
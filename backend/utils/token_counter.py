@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 为可选依赖，缺失时使用估算
+    tiktoken = None
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+# 模型家族 -> (每个中日韩字符的 token 数, 其他字符每 token 的字符数)，按各家分词器实测取偏保守的值
+_HEURISTICS = {
+    "openai": (1.2, 4.0),
+    "deepseek": (0.7, 3.5),
+    "qwen": (0.8, 3.8),
+    "llama": (1.5, 3.6),
+    "default": (1.2, 3.5),
+}
+
+# 每条消息的格式开销（角色标记、分隔符等）
+MESSAGE_OVERHEAD = 4
+
+# OpenAI 模型使用的分词表
+TIKTOKEN_ENCODINGS = ("cl100k_base", "o200k_base")
+
+# 已加载的分词器；只在启动时由 preload_encoders 在线程中加载，请求路径上不会读取或下载分词表
+_ENCODERS: Dict[str, object] = {}
+
+
+def model_family(manufacturer: str, model_name: str) -> str:
+    """根据厂商与模型名判断分词器家族"""
+    name = model_name.lower()
+    if manufacturer.lower() == "openai":
+        return "openai"
+    for family in ("deepseek", "qwen", "llama"):
+        if family in name:
+            return family
+    return manufacturer.lower() if manufacturer.lower() in _HEURISTICS else "default"
+
+
+def _tiktoken_encoding(model_name: str) -> str:
+    name = model_name.lower()
+    return "o200k_base" if "4o" in name or "o1" in name or "o3" in name else "cl100k_base"
+
+
+def preload_encoders(cache_dir: str = "") -> Dict[str, bool]:
+    """
+    加载 OpenAI 分词表（阻塞调用，应放在线程中执行）。
+    cache_dir 指向随部署分发的 tiktoken 缓存目录时从本地读取，不访问网络；
+    加载失败的分词表对应的模型按字符比例估算。
+    """
+    if tiktoken is None:
+        return {}
+    if cache_dir:
+        os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+    loaded = {}
+    for encoding in TIKTOKEN_ENCODINGS:
+        if encoding not in _ENCODERS:
+            try:
+                _ENCODERS[encoding] = tiktoken.get_encoding(encoding)
+            except Exception as e:  # 本地没有分词表且无法下载时退回估算
+                print(f"Error loading tokenizer {encoding}: {str(e)}")
+        loaded[encoding] = encoding in _ENCODERS
+    return loaded
+
+
+class TokenCounter:
+    """
+    按模型家族计数 token。
+    OpenAI 模型在启动时已加载分词表的情况下使用 tiktoken，其余模型按家族的字符比例估算；
+    计数结果按文本摘要缓存（不持有文本本身），多轮对话中历史消息与同一文档只需计数一次。
+    """
+
+    def __init__(self, manufacturer: str, model_name: str, cache_size: int = 8192):
+        self.family = model_family(manufacturer, model_name)
+        encoder = None
+        if self.family == "openai":
+            encoding = _tiktoken_encoding(model_name)
+            encoder = _ENCODERS.get(encoding)
+        if encoder is not None:
+            self.name = f"tiktoken:{encoding}"
+            self._count: Callable[[str], int] = lambda text: len(encoder.encode(text, disallowed_special=()))
+        else:
+            self.name = f"heuristic:{self.family}"
+            cjk_ratio, chars_per_token = _HEURISTICS[self.family]
+            self._count = lambda text: self._estimate(text, cjk_ratio, chars_per_token)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[bytes, int], int]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _estimate(text: str, cjk_ratio: float, chars_per_token: float) -> int:
+        cjk = len(_CJK_RE.findall(text))
+        return int(cjk * cjk_ratio + (len(text) - cjk) / chars_per_token + 0.999)
+
+    def count(self, text: str) -> int:
+        """文本的 token 数（按 blake2b 摘要缓存，长文档不会被缓存固定在内存中）"""
+        if not text:
+            return 0
+        key = (hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest(), len(text))
+        tokens = self._cache.get(key)
+        if tokens is not None:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return tokens
+        self._misses += 1
+        tokens = self._cache[key] = self._count(text)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_message(self, content: str) -> int:
+        """一条消息的 token 数，含格式开销"""
+        return self.count(content) + MESSAGE_OVERHEAD
+
+    def cache_info(self) -> Tuple[int, int]:
+        return self._hits, self._misses
+
+
+@lru_cache(maxsize=64)
+def get_token_counter(manufacturer: str, model_name: str) -> TokenCounter:
+    """获取模型对应的计数器（按模型复用，保留计数缓存）"""
+    return TokenCounter(manufacturer, model_name)